@@ -1,19 +1,38 @@
+from bisect import bisect_right
+from functools import lru_cache
+from multiprocessing import Pool
+import os
+import re
+from xml.etree import ElementTree
+
 from nltk.corpus.reader.api import SyntaxCorpusReader
 from nltk.corpus.reader import xmldocs
 from nltk import tree
 from nltk.util import LazyMap, LazyConcatenation
+from nltk.collections import AbstractLazySequence
 from nltk.corpus.reader.util import concat
 
+from corpus.ancora_cache import AncoraCache, cache_filename
+
+
+def simple_tag(tag):
+    """Simplified POS tag: the first three characters of the AnCora tag.
+
+    tag -- the AnCora tag.
+    """
+    return tag[:3]
+
 
-def parsed(element):
+def parsed(element, tag_map=None):
     """Converts a 'sentence' XML element (xml.etree.ElementTree.Element) to
     an NLTK tree.
 
     element -- the XML sentence element (or a subelement)
+    tag_map -- function to apply to the POS tags (optional).
     """
     if element:
         # element viewed as a list is non-empty (it has subelements)
-        subtrees = map(parsed, element)  # recursive call here!
+        subtrees = [parsed(e, tag_map) for e in element]  # recursive call!
         subtrees = [t for t in subtrees if t is not None]
         return tree.Tree(element.tag, subtrees)
     else:
@@ -21,25 +40,39 @@ def parsed(element):
         if element.get('elliptic') == 'yes' and not element.get('wd'):
             return None
         else:
-            return tree.Tree(element.get('pos') or element.get('ne') or 'unk',
-                             [element.get('wd')])
+            tag = element.get('pos') or element.get('ne') or 'unk'
+            if tag_map:
+                tag = tag_map(tag)
+            return tree.Tree(tag, [element.get('wd')])
+
+
+def leaves(element):
+    """Iterates over the terminal XML elements of a 'sentence' element, in
+    document order, without building any tree. Elliptic terminals with no
+    word are skipped, as in parsed().
+
+    element -- the XML sentence element (or a subelement)
+    """
+    for e in element.iter():
+        if len(e) == 0 and not (e.get('elliptic') == 'yes' and
+                                not e.get('wd')):
+            yield e
 
 
-def tagged(element):
+def tagged(element, tag_map=None):
     """Converts a 'sentence' XML element (xml.etree.ElementTree.Element) to
     a tagged sentence.
 
     element -- the XML sentence element (or a subelement)
+    tag_map -- function to apply to the POS tags (optional).
     """
-    # http://www.w3schools.com/xpath/xpath_syntax.asp
-    # XXX: XPath '//*[@wd]' not working
-    # return [(x.get('wd'), x.get('pos') or x.get('ne'))
-    #         for x in element.findall('*//*[@wd]')] + [('.', 'fp')]
-
-    # convert to tree and get the tagged sent
-    pos = parsed(element).pos()
-    # filter None words (may return an emtpy list)
-    return list(filter(lambda x: x[0] is not None, pos))
+    # walk the terminals directly, no tree is built (same result as
+    # parsed().pos() without the None words).
+    result = [(e.get('wd'), e.get('pos') or e.get('ne') or 'unk')
+              for e in leaves(element) if e.get('wd') is not None]
+    if tag_map:
+        result = [(w, tag_map(t)) for w, t in result]
+    return result
 
 
 def untagged(element):
@@ -48,42 +81,223 @@ def untagged(element):
 
     element -- the XML sentence element (or a subelement)
     """
-    # http://www.w3schools.com/xpath/xpath_syntax.asp
-    # XXX: XPath '//*[@wd]' not working
-    # return [x.get('wd') for x in element.findall('*//*[@wd]')] + [('.', 'fp')]
+    # same as parsed().leaves() without the None words.
+    return [e.get('wd') for e in leaves(element) if e.get('wd') is not None]
+
+
+def encoded(args):
+    """Parses an AnCora XML file into a one-file AncoraCache, a compact and
+    picklable representation of its sentences. Used by the worker processes
+    of AncoraCorpusReader.
+
+    args -- pair (path, fileid) with the corpus root and the file to parse.
+    """
+    path, fileid = args
+
+    def elements(f):
+        return ElementTree.parse(os.path.join(path, f)).getroot()
+    return AncoraCache.build(path, [fileid], elements)
+
+
+class SentenceIndex(AbstractLazySequence):
+    """The sentence XML elements of some AnCora files, with random access.
+
+    The byte offsets of the sentences of each file are found with a scan of
+    the raw file, without XML parsing. Accessing a sentence then seeks to it
+    and parses only that sentence.
+    """
 
-    # convert to tree and get the sent
-    sent = parsed(element).leaves()
-    # filter None words (may return an emtpy list)
-    return list(filter(lambda x: x is not None, sent))
+    SENTENCE = re.compile(rb'<sentence[\s>]|</sentence\s*>')
+    ENCODING = re.compile(rb'<\?xml[^>]*encoding=["\']([\w.-]+)["\']')
+
+    def __init__(self, path, fileids):
+        """
+        path -- the corpus root directory.
+        fileids -- the list of file ids.
+        """
+        self.path = path
+        self.fileids = fileids
+        # built on first use (see _index()).
+        self._offsets = None
+        self._encodings = None
+        self._starts = None
+
+    def _index(self):
+        if self._offsets is not None:
+            return
+        offsets, encodings, starts = [], [], [0]
+        for f in self.fileids:
+            with open(os.path.join(self.path, f), 'rb') as fp:
+                data = fp.read()
+            m = self.ENCODING.match(data)
+            encodings.append(m.group(1).decode('ascii') if m else 'utf-8')
+            # pairs (start, end) of each sentence.
+            file_offsets, start = [], None
+            for m in self.SENTENCE.finditer(data):
+                if m.group().startswith(b'</'):
+                    file_offsets.append((start, m.end()))
+                else:
+                    start = m.start()
+            offsets.append(file_offsets)
+            starts.append(starts[-1] + len(file_offsets))
+        self._offsets, self._encodings, self._starts = \
+            offsets, encodings, starts
+
+    def __len__(self):
+        self._index()
+        return self._starts[-1]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return super().__getitem__(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('index out of range')
+        return next(self.iterate_from(i))
+
+    def iterate_from(self, start):
+        self._index()
+        k = bisect_right(self._starts, start) - 1
+        while k < len(self.fileids):
+            filename = os.path.join(self.path, self.fileids[k])
+            encoding = self._encodings[k]
+            offsets = self._offsets[k][start - self._starts[k]:]
+            with open(filename, 'rb') as fp:
+                for i, j in offsets:
+                    fp.seek(i)
+                    xml = fp.read(j - i).decode(encoding)
+                    yield ElementTree.fromstring(xml)
+            start = self._starts[k + 1]
+            k += 1
 
 
 class AncoraCorpusReader(SyntaxCorpusReader):
 
-    def __init__(self, path, files=None):
+    def __init__(self, path, files=None, cache=True, processes=None,
+                 tag_map=None):
+        """
+        path -- the corpus root directory.
+        files -- regexp for the files to read (default: all the .tbf.xml).
+        cache -- binary cache file used instead of the XML when it is fresh
+            (default: True, the default cache file of the corpus root).
+            Use False to always read the XML.
+        processes -- number of worker processes to parse the XML files with.
+            The sentences are then loaded all at once into lists, in corpus
+            order (default: None, parse lazily in this process).
+        tag_map -- function to apply to the POS tags while reading (optional).
+            It is memoized, so it is called once for each different tag.
+        """
         if files is None:
             files = '.*\.tbf\.xml'
+        self.path = path
+        self.processes = processes
+        self.tag_map = tag_map and lru_cache(maxsize=None)(tag_map)
         self.xmlreader = xmldocs.XMLCorpusReader(path, files)
+        if cache is True:
+            cache = cache_filename(path)
+        self.cache_file = cache or None
+        self._cache = None
+        # tagged sentences with random access (see _random_access()).
+        self._tagged_index = None
+        if self.cache_file and os.path.exists(self.cache_file):
+            try:
+                cache = AncoraCache.load(self.cache_file)
+            except ValueError:
+                # a cache of another version, rebuilt by build_cache().
+                cache = None
+            if cache and cache.fresh(path, self.xmlreader.fileids()):
+                self._cache = cache
+
+    def build_cache(self, filename=None):
+        """Convert all the files of the reader to a binary cache, and use it
+        from now on.
+
+        filename -- the cache file (default: the reader cache file).
+        """
+        filename = filename or self.cache_file or cache_filename(self.path)
+        fileids = self.xmlreader.fileids()
+        cache = AncoraCache.build(self.path, fileids, self.xmlreader.xml)
+        cache.save(filename)
+        self.cache_file, self._cache = filename, cache
+        self._tagged_index = None
 
     def parsed_sents(self, fileids=None):
-        return LazyMap(parsed, self.elements(fileids))
+        tag_map = self.tag_map
+        if self._cache is not None:
+            return self._cached(
+                lambda c, i: c.parsed_sent(i, tag_map), fileids)
+        if self.processes:
+            return self._parallel(
+                lambda c, i: c.parsed_sent(i, tag_map), fileids)
+        return LazyMap(lambda e: parsed(e, tag_map), self.elements(fileids))
 
     def tagged_sents(self, fileids=None):
-        return LazyMap(tagged, self.elements(fileids))
+        tag_map = self.tag_map
+        if self._cache is not None:
+            return self._cached(
+                lambda c, i: c.tagged_sent(i, tag_map), fileids)
+        if self.processes:
+            return self._parallel(
+                lambda c, i: c.tagged_sent(i, tag_map), fileids)
+        return LazyMap(lambda e: tagged(e, tag_map), self.elements(fileids))
 
     def sents(self, fileids=None):
+        if self._cache is not None:
+            return self._cached(AncoraCache.sent, fileids)
+        if self.processes:
+            return self._parallel(AncoraCache.sent, fileids)
         return LazyMap(untagged, self.elements(fileids))
 
+    def _fileids(self, fileids=None):
+        if not fileids:
+            return self.xmlreader.fileids()
+        elif isinstance(fileids, str):
+            return [fileids]
+        return fileids
+
+    def _cached(self, decode, fileids=None):
+        cache = self._cache
+        indices = cache.indices(self._fileids(fileids))
+        return LazyMap(lambda i: decode(cache, i), indices)
+
+    def _parallel(self, decode, fileids=None):
+        # each worker sends back the compact encoding of a whole file.
+        args = [(self.path, f) for f in self._fileids(fileids)]
+        with Pool(self.processes) as pool:
+            caches = pool.map(encoded, args)
+        return [decode(c, i) for c in caches for i in range(len(c))]
+
     def elements(self, fileids=None):
         # FIXME: skip sentence elements that will result in empty sentences!
-        if not fileids:
-            fileids = self.xmlreader.fileids()
-        # xml() returns a top element that is also a list of sentence elements
-        return LazyConcatenation(self.xmlreader.xml(f) for f in fileids)
+        return SentenceIndex(self.path, self._fileids(fileids))
 
     def tagged_words(self, fileids=None):
         return LazyConcatenation(self.tagged_sents(fileids))
 
+    def _random_access(self):
+        # the tagged sentences from the cache or the sentence index, built
+        # once. never with the worker processes, that parse all the corpus.
+        if self._tagged_index is None:
+            tag_map = self.tag_map
+            if self._cache is not None:
+                self._tagged_index = self._cached(
+                    lambda c, i: c.tagged_sent(i, tag_map))
+            else:
+                self._tagged_index = LazyMap(lambda e: tagged(e, tag_map),
+                                             self.elements())
+        return self._tagged_index
+
+    def __len__(self):
+        return len(self._random_access())
+
+    def __getitem__(self, i):
+        """The i-th tagged sentence (or a slice of them) of the corpus.
+
+        i -- the sentence index or slice.
+        """
+        return self._random_access()[i]
+
     def __repr__(self):
         return '<AncoraCorpusReader>'
 
@@ -92,19 +306,6 @@ class SimpleAncoraCorpusReader(AncoraCorpusReader):
     """Ancora corpus with simplified POS tagset.
     """
 
-    def __init__(self, path, files=None):
-        super().__init__(path, files)
-
-    def tagged_sents(self, fileids=None):
-        f = lambda s: [(w, t[:3]) for w, t in s]
-        return LazyMap(f, super().tagged_sents(fileids))
-
-    def parsed_sents(self, fileids=None):
-        def f(t):
-            for p in t.treepositions('leaves'):
-                if len(p) > 1:
-                    tag = t[p[:-1]].label()
-                    t[p[:-1]].set_label(tag[:3])
-            return t
-
-        return LazyMap(f, super().parsed_sents(fileids))
+    def __init__(self, path, files=None, cache=True, processes=None,
+                 tag_map=simple_tag):
+        super().__init__(path, files, cache, processes, tag_map)
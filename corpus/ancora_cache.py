@@ -0,0 +1,318 @@
+"""Preprocessed binary cache of the AnCora corpus.
+
+Parsing the AnCora XML files takes minutes, so the corpus can be converted
+once into a compact binary file that is loaded in seconds:
+
+- words and labels (POS tags and nonterminals) are integer-encoded,
+- the leaves of each sentence are stored as two aligned arrays of word and
+  tag ids,
+- the structure of each tree is stored in bracketed form as an array of
+  codes: a label id opens a constituent, LEAF takes the next leaf and CLOSE
+  closes the current constituent,
+- sentence and file offsets into these arrays allow decoding any sentence
+  without looking at the rest.
+
+A single cache holds all the files of a corpus root, and readers over any
+subset of them use it. The cache remembers the size and modification time of
+every source file so that stale caches are detected and ignored.
+
+The cache file is a numpy .npz archive of plain integer and byte arrays
+(vocabularies are utf-8 encoded and concatenated), loaded without pickle so
+that a cache found in a data directory cannot run code.
+"""
+from array import array
+import os
+
+from nltk import tree
+import numpy as np
+
+
+# bump this whenever the cache layout changes.
+VERSION = 2
+
+LEAF = -1
+CLOSE = -2
+
+
+def cache_filename(path):
+    """Default cache file of an AnCora corpus.
+
+    path -- the corpus root directory.
+    """
+    return os.path.join(path, '.cache', 'ancora.npz')
+
+
+def stamp(path, fileid):
+    """Size and modification time of a file, used to check freshness.
+
+    path -- the corpus root directory.
+    fileid -- the file id.
+    """
+    st = os.stat(os.path.join(path, fileid))
+    return (st.st_size, st.st_mtime_ns)
+
+
+def encode_strings(strings):
+    """Concatenated utf-8 encodings of strings, and their offsets.
+
+    strings -- the strings.
+    """
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def decode_strings(data, offsets):
+    """Strings encoded by encode_strings().
+
+    data -- the concatenated utf-8 encodings.
+    offsets -- their offsets.
+    """
+    data = data.tobytes()
+    offsets = offsets.tolist()
+    return [data[i:j].decode('utf-8')
+            for i, j in zip(offsets[:-1], offsets[1:])]
+
+
+def to_array(typecode, a):
+    """Copy a numpy array into an array.array, which is faster to index
+    item by item.
+
+    typecode -- the typecode of the array.array.
+    a -- the numpy array.
+    """
+    result = array(typecode)
+    result.frombytes(np.ascontiguousarray(a, dtype=typecode).tobytes())
+    return result
+
+
+class AncoraCache:
+
+    def __init__(self, data):
+        """
+        data -- the dictionary of vocabularies and arrays (see build()).
+        """
+        self.stamps = data['stamps']
+        self.words = data['words']
+        self.labels = data['labels']
+        self.leaf_words = data['leaf_words']
+        self.leaf_tags = data['leaf_tags']
+        self.struct = data['struct']
+        self.leaf_offsets = data['leaf_offsets']
+        self.struct_offsets = data['struct_offsets']
+        self.file_offsets = data['file_offsets']
+        # mapped tag labels for each tag_map (see tag_labels()).
+        self._tag_labels = {}
+
+    @classmethod
+    def build(cls, path, fileids, elements):
+        """Encode a corpus.
+
+        path -- the corpus root directory.
+        fileids -- the list of file ids.
+        elements -- function returning the sentence XML elements of a file.
+        """
+        # word id 0 is the missing word of wordless terminals.
+        words, word_ids = [None], {None: 0}
+        labels, label_ids = [], {}
+        leaf_words, leaf_tags = array('i'), array('i')
+        struct = array('i')
+        leaf_offsets, struct_offsets = array('l', [0]), array('l', [0])
+        file_offsets = {}
+
+        def word_id(w):
+            if w not in word_ids:
+                word_ids[w] = len(words)
+                words.append(w)
+            return word_ids[w]
+
+        def label_id(label):
+            if label not in label_ids:
+                label_ids[label] = len(labels)
+                labels.append(label)
+            return label_ids[label]
+
+        def encode(element):
+            # mirrors corpus.ancora.parsed().
+            if element:
+                struct.append(label_id(element.tag))
+                for e in element:
+                    encode(e)
+                struct.append(CLOSE)
+            elif element.get('elliptic') != 'yes' or element.get('wd'):
+                tag = element.get('pos') or element.get('ne') or 'unk'
+                struct.append(LEAF)
+                leaf_words.append(word_id(element.get('wd')))
+                leaf_tags.append(label_id(tag))
+
+        for f in fileids:
+            start = len(leaf_offsets) - 1
+            for element in elements(f):
+                encode(element)
+                leaf_offsets.append(len(leaf_words))
+                struct_offsets.append(len(struct))
+            file_offsets[f] = (start, len(leaf_offsets) - 1)
+
+        return cls({
+            'stamps': {f: stamp(path, f) for f in fileids},
+            'words': words,
+            'labels': labels,
+            'leaf_words': leaf_words,
+            'leaf_tags': leaf_tags,
+            'struct': struct,
+            'leaf_offsets': leaf_offsets,
+            'struct_offsets': struct_offsets,
+            'file_offsets': file_offsets,
+        })
+
+    @classmethod
+    def load(cls, filename):
+        """Load a cache file.
+
+        filename -- the cache file.
+        """
+        with np.load(filename, allow_pickle=False) as f:
+            version = int(f['version'])
+            if version != VERSION:
+                raise ValueError(
+                    'unsupported cache version {}'.format(version))
+            fileids = decode_strings(f['fileids'], f['fileid_offsets'])
+            stamps = f['stamps'].tolist()
+            file_offsets = f['file_offsets'].tolist()
+            # word id 0 is the missing word (see build()).
+            words = decode_strings(f['words'], f['word_offsets'])
+            words[0] = None
+            return cls({
+                'stamps': {k: tuple(v) for k, v in zip(fileids, stamps)},
+                'words': words,
+                'labels': decode_strings(f['labels'], f['label_offsets']),
+                'leaf_words': to_array('i', f['leaf_words']),
+                'leaf_tags': to_array('i', f['leaf_tags']),
+                'struct': to_array('i', f['struct']),
+                'leaf_offsets': to_array('l', f['leaf_offsets']),
+                'struct_offsets': to_array('l', f['struct_offsets']),
+                'file_offsets': {k: tuple(v)
+                                 for k, v in zip(fileids, file_offsets)},
+            })
+
+    def save(self, filename):
+        """Save the cache to a file.
+
+        filename -- the cache file.
+        """
+        dirname = os.path.dirname(filename)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        fileids = list(self.file_offsets)
+        fileid_data, fileid_offsets = encode_strings(fileids)
+        word_data, word_offsets = encode_strings([''] + self.words[1:])
+        label_data, label_offsets = encode_strings(self.labels)
+        arrays = {
+            'version': np.array(VERSION),
+            'fileids': fileid_data,
+            'fileid_offsets': fileid_offsets,
+            'stamps': np.array([self.stamps[f] for f in fileids],
+                               dtype=np.int64).reshape(-1, 2),
+            'file_offsets': np.array([self.file_offsets[f] for f in fileids],
+                                     dtype=np.int64).reshape(-1, 2),
+            'words': word_data,
+            'word_offsets': word_offsets,
+            'labels': label_data,
+            'label_offsets': label_offsets,
+            'leaf_words': np.frombuffer(self.leaf_words, dtype='i'),
+            'leaf_tags': np.frombuffer(self.leaf_tags, dtype='i'),
+            'struct': np.frombuffer(self.struct, dtype='i'),
+            'leaf_offsets': np.frombuffer(self.leaf_offsets, dtype='l'),
+            'struct_offsets': np.frombuffer(self.struct_offsets, dtype='l'),
+        }
+        # write and rename, so readers never see a half-written cache.
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_filename, filename)
+
+    def fresh(self, path, fileids):
+        """Check that the cache covers these files and that they were not
+        modified since it was built.
+
+        path -- the corpus root directory.
+        fileids -- the list of file ids.
+        """
+        try:
+            return all(self.stamps.get(f) == stamp(path, f) for f in fileids)
+        except OSError:
+            return False
+
+    def __len__(self):
+        return len(self.leaf_offsets) - 1
+
+    def indices(self, fileids):
+        """Sentence indices of some files, in the given order.
+
+        fileids -- the list of file ids.
+        """
+        result = []
+        for f in fileids:
+            result.extend(range(*self.file_offsets[f]))
+        return result
+
+    def tag_labels(self, tag_map=None):
+        """The label vocabulary with a tag mapping applied. It is computed
+        once for each mapping, so tags are mapped once for the whole corpus.
+
+        tag_map -- function to apply to the POS tags (optional).
+        """
+        if not tag_map:
+            return self.labels
+        if tag_map not in self._tag_labels:
+            self._tag_labels[tag_map] = [tag_map(label)
+                                         for label in self.labels]
+        return self._tag_labels[tag_map]
+
+    def tagged_sent(self, i, tag_map=None):
+        """Decode the i-th tagged sentence.
+
+        i -- the sentence index.
+        tag_map -- function to apply to the POS tags (optional).
+        """
+        start, end = self.leaf_offsets[i], self.leaf_offsets[i + 1]
+        words, labels = self.words, self.tag_labels(tag_map)
+        return [(words[w], labels[t])
+                for w, t in zip(self.leaf_words[start:end],
+                                self.leaf_tags[start:end]) if w]
+
+    def sent(self, i):
+        """Decode the i-th sentence.
+
+        i -- the sentence index.
+        """
+        start, end = self.leaf_offsets[i], self.leaf_offsets[i + 1]
+        words = self.words
+        return [words[w] for w in self.leaf_words[start:end] if w]
+
+    def parsed_sent(self, i, tag_map=None):
+        """Decode the i-th parsed sentence.
+
+        i -- the sentence index.
+        tag_map -- function to apply to the POS tags (optional).
+        """
+        words, labels = self.words, self.labels
+        tags = self.tag_labels(tag_map)
+        leaf = self.leaf_offsets[i]
+        start, end = self.struct_offsets[i], self.struct_offsets[i + 1]
+        # stack of (label, children) of the open constituents.
+        stack = [(None, [])]
+        for code in self.struct[start:end]:
+            if code == LEAF:
+                t = tree.Tree(tags[self.leaf_tags[leaf]],
+                              [words[self.leaf_words[leaf]]])
+                stack[-1][1].append(t)
+                leaf += 1
+            elif code == CLOSE:
+                label, children = stack.pop()
+                stack[-1][1].append(tree.Tree(label, children))
+            else:
+                stack.append((labels[code], []))
+        # an elliptic sentence has no tree at all (as in parsed()).
+        return stack[0][1][0] if stack[0][1] else None
@@ -0,0 +1,28 @@
+"""Convert the AnCora corpus to a binary cache.
+
+The corpus readers use the cache instead of the XML files while it is fresh.
+
+Usage:
+  cache.py [-c <file>] [<path>]
+  cache.py -h | --help
+
+Options:
+  <path>        AnCora root directory [default: ancora/ancora-2.0/].
+  -c <file>     Cache file (default: inside the AnCora root directory).
+  -h --help     Show this screen.
+"""
+from docopt import docopt
+
+from corpus.ancora import AncoraCorpusReader
+
+
+if __name__ == '__main__':
+    opts = docopt(__doc__)
+
+    path = opts['<path>'] or 'ancora/ancora-2.0/'
+    corpus = AncoraCorpusReader(path, cache=False)
+
+    print('Converting corpus...')
+    corpus.build_cache(opts['-c'])
+
+    print('Saved to {}'.format(corpus.cache_file))
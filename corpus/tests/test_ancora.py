@@ -0,0 +1,220 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase, mock
+import os
+import pickle
+import shutil
+import tempfile
+from xml.etree import ElementTree
+
+import nltk
+
+from corpus.ancora import (parsed, tagged, untagged, AncoraCorpusReader,
+                           SimpleAncoraCorpusReader)
+from corpus.ancora_cache import cache_filename
+
+
+SENTENCE = """
+<sentence>
+  <sn func="suj">
+    <spec>
+      <d gen="m" num="s" pos="da0ms0" wd="El"/>
+    </spec>
+    <grup.nom>
+      <n gen="m" num="s" pos="ncms000" wd="gato"/>
+    </grup.nom>
+  </sn>
+  <sn elliptic="yes" func="suj"/>
+  <grup.verb>
+    <v mood="indicative" pos="vmip3s0" wd="come"/>
+  </grup.verb>
+  <sn func="cd">
+    <grup.nom>
+      <n ne="organization" wd="Pescados_SA"/>
+    </grup.nom>
+  </sn>
+  <f pos="fp" wd="."/>
+</sentence>
+"""
+
+DOCUMENT = """<?xml version="1.0" encoding="UTF-8"?>
+<article>
+{}
+<sentence>
+  <sn>
+    <grup.nom>
+      <n pos="ncfs000" wd="gata"/>
+    </grup.nom>
+  </sn>
+  <f pos="fp" wd="."/>
+</sentence>
+</article>
+"""
+
+
+class TestAncora(TestCase):
+
+    def setUp(self):
+        self.element = ElementTree.fromstring(SENTENCE)
+
+    def test_tagged(self):
+        tagged_sent = tagged(self.element)
+
+        self.assertEqual(tagged_sent, [
+            ('El', 'da0ms0'),
+            ('gato', 'ncms000'),
+            ('come', 'vmip3s0'),
+            ('Pescados_SA', 'organization'),
+            ('.', 'fp'),
+        ])
+
+    def test_tagged_equals_tree_pos(self):
+        pos = [(w, t) for w, t in parsed(self.element).pos() if w is not None]
+        self.assertEqual(tagged(self.element), pos)
+
+    def test_untagged(self):
+        sent = untagged(self.element)
+
+        self.assertEqual(sent, 'El gato come Pescados_SA .'.split())
+
+
+class TestAncoraCorpusReader(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        # recent NLTK versions only read from authorized data paths
+        nltk.data.path.append(self.path)
+        os.mkdir(os.path.join(self.path, 'CESS-CAST-A'))
+        for name in ['a1.tbf.xml', 'a2.tbf.xml']:
+            filename = os.path.join(self.path, 'CESS-CAST-A', name)
+            with open(filename, 'w') as f:
+                f.write(DOCUMENT.format(SENTENCE))
+
+    def tearDown(self):
+        nltk.data.path.remove(self.path)
+        shutil.rmtree(self.path)
+
+    def test_tagged_sents(self):
+        corpus = AncoraCorpusReader(self.path)
+        sents = list(corpus.tagged_sents())
+
+        self.assertEqual(len(sents), 4)
+        self.assertEqual(sents[1], [('gata', 'ncfs000'), ('.', 'fp')])
+        self.assertEqual(sents[2], sents[0])
+
+    def test_sents(self):
+        corpus = AncoraCorpusReader(self.path)
+        sents = list(corpus.sents())
+
+        self.assertEqual(sents[0], 'El gato come Pescados_SA .'.split())
+        self.assertEqual(sents[3], ['gata', '.'])
+
+    def test_cache(self):
+        corpus = AncoraCorpusReader(self.path)
+        parsed_sents = list(corpus.parsed_sents())
+        tagged_sents = list(corpus.tagged_sents())
+        sents = list(corpus.sents())
+
+        corpus.build_cache()
+
+        corpus = AncoraCorpusReader(self.path)
+        self.assertIsNotNone(corpus._cache)
+        self.assertEqual(list(corpus.parsed_sents()), parsed_sents)
+        self.assertEqual(list(corpus.tagged_sents()), tagged_sents)
+        self.assertEqual(list(corpus.sents()), sents)
+
+        fileid = 'CESS-CAST-A/a2.tbf.xml'
+        self.assertEqual(list(corpus.tagged_sents(fileid)), tagged_sents[2:])
+
+    def test_cache_subset_of_files(self):
+        AncoraCorpusReader(self.path).build_cache()
+
+        corpus = SimpleAncoraCorpusReader(self.path, r'.*a2\.tbf\.xml')
+        self.assertIsNotNone(corpus._cache)
+        self.assertEqual(list(corpus.tagged_sents()), [
+            [('El', 'da0'), ('gato', 'ncm'), ('come', 'vmi'),
+             ('Pescados_SA', 'org'), ('.', 'fp')],
+            [('gata', 'ncf'), ('.', 'fp')],
+        ])
+
+    def test_stale_cache(self):
+        AncoraCorpusReader(self.path).build_cache()
+
+        filename = os.path.join(self.path, 'CESS-CAST-A', 'a2.tbf.xml')
+        with open(filename, 'w') as f:
+            f.write(DOCUMENT.format(''))
+
+        corpus = AncoraCorpusReader(self.path)
+        self.assertIsNone(corpus._cache)
+        self.assertEqual(len(list(corpus.tagged_sents())), 3)
+
+    def test_pickled_cache(self):
+        # a pickle in the data directory is never unpickled.
+        filename = cache_filename(self.path)
+        os.makedirs(os.path.dirname(filename))
+        with open(filename, 'wb') as f:
+            pickle.dump(os.system, f)
+
+        corpus = AncoraCorpusReader(self.path)
+        self.assertIsNone(corpus._cache)
+        self.assertEqual(len(list(corpus.tagged_sents())), 4)
+
+    def test_processes(self):
+        corpus = AncoraCorpusReader(self.path, cache=False)
+        corpus2 = AncoraCorpusReader(self.path, cache=False, processes=2)
+
+        self.assertEqual(corpus2.parsed_sents(), list(corpus.parsed_sents()))
+        self.assertEqual(corpus2.tagged_sents(), list(corpus.tagged_sents()))
+        self.assertEqual(corpus2.sents(), list(corpus.sents()))
+
+    def test_simple_parsed_sents(self):
+        t = nltk.Tree.fromstring("""
+            (sentence
+                (sn (spec (da0 El)) (grup.nom (ncm gato)))
+                (grup.verb (vmi come))
+                (sn (grup.nom (org Pescados_SA)))
+                (fp .))
+            """)
+
+        corpus = SimpleAncoraCorpusReader(self.path, cache=False)
+        self.assertEqual(corpus.parsed_sents()[0], t)
+
+        corpus.build_cache()
+        self.assertEqual(corpus.parsed_sents()[0], t)
+
+    def test_tag_map(self):
+        corpus = AncoraCorpusReader(self.path, tag_map=str.upper)
+        sents = corpus.tagged_sents()
+
+        self.assertEqual(sents[1], [('gata', 'NCFS000'), ('.', 'FP')])
+
+    def test_random_access(self):
+        corpus = SimpleAncoraCorpusReader(self.path, cache=False)
+        sents = list(corpus.tagged_sents())
+
+        self.assertEqual(len(corpus), 4)
+        self.assertEqual(len(corpus.tagged_sents()), 4)
+        for i in [3, 1, 2, 0, -1]:
+            self.assertEqual(corpus[i], sents[i])
+            self.assertEqual(corpus.tagged_sents()[i], sents[i])
+        self.assertEqual(list(corpus[1:3]), sents[1:3])
+        self.assertEqual(list(corpus.parsed_sents()[2:]),
+                         list(corpus.parsed_sents())[2:])
+        self.assertRaises(IndexError, lambda: corpus[4])
+
+        corpus.build_cache()
+        self.assertEqual(len(corpus), 4)
+        self.assertEqual(corpus[3], sents[3])
+        self.assertEqual(list(corpus[1:3]), sents[1:3])
+
+    def test_random_access_processes(self):
+        corpus = SimpleAncoraCorpusReader(self.path, cache=False,
+                                          processes=2)
+        sents = list(SimpleAncoraCorpusReader(self.path,
+                                              cache=False).tagged_sents())
+
+        # indexing parses single sentences, without worker processes.
+        with mock.patch('corpus.ancora.Pool') as pool:
+            self.assertEqual(len(corpus), 4)
+            self.assertEqual(corpus[0], sents[0])
+            self.assertEqual(corpus[-1], sents[-1])
+        pool.assert_not_called()
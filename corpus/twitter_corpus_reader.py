@@ -1,35 +1,53 @@
 from nltk.corpus import PlaintextCorpusReader
 from nltk.tokenize import RegexpTokenizer
 
+# expresión regular de los tokens de un tweet.
+TWEET_PATTERN = r'''(?ix)               # Flag
+                    (?:(?:[Hh][Tt][Tt][Pp][Ss]?:\/\/)|[wW][Ww][Ww])
+                    (?:\/?\.?\d?[a-zA-Z]?)+     # Urls completas.
+                    |(?:[A-Z]\.)+               # Abreviaciones, e.g. U.S.A.
+                    | (?:[Ss]r\.|[Ss]ra\.)      # Sr. Sra. sr. sra.
+                    | (?:[Dd]r\.|[Dd]ra\.)      # Dr. Dra. dr. dra.
+                    | \.\.\.                    # Puntos suspensivos.
+                    | \@\w+(?:-\w+)*            # Nombres de usuario de Twitter.
+                    | \d+(?:[\.\,]\d+)%         # Porcentajes
+                    | \#?\w+(?:-\w+)*           # Palabras/Hashtags.
+                    | \$?\d+(?:[\.\,]\d+)?      # Numeros decimales, precios.
+                    | [][.,;"'?():-_`…]         # Tokens especiales.
+                    '''
+
+
+def tweet_tokenizer():
+    """
+    Tokenizador de palabras de tweets, el mismo que usa TwitterCorpusReader.
+    """
+    return RegexpTokenizer(TWEET_PATTERN)
+
+
 class TwitterCorpusReader(PlaintextCorpusReader):
     """
     Corpus Reader personalizado para el tokenizado de tweets.
     """
 
-    def __init__(self, root, fileids):
+    def __init__(self, root, fileids, sent_tokenizer=None):
         """
         Construye un nuevo corpus reader personalizado para el tokenizado
         correcto de tweets. Tiene en cuenta el uso de hashtags, el formato
         de nombre de usuarios y los links compartidos.
         :param root: directorio donde se encuentra el corpus.
         :param fileids: archivo(s) que forman el corpus.
+        :param sent_tokenizer: tokenizador de oraciones (por defecto, el de
+            PlaintextCorpusReader). Con LineTokenizer, cada línea es un tweet.
         """
 
-        self._pattern = r'''(?ix)               # Flag
-                    (?:(?:[Hh][Tt][Tt][Pp][Ss]?:\/\/)|[wW][Ww][Ww])
-                    (?:\/?\.?\d?[a-zA-Z]?)+     # Urls completas.
-                    |(?:[A-Z]\.)+               # Abreviaciones, e.g. U.S.A.
-                    | (?:[Ss]r\.|[Ss]ra\.)      # Sr. Sra. sr. sra.
-                    | (?:[Dd]r\.|[Dd]ra\.)      # Dr. Dra. dr. dra.
-                    | \.\.\.                    # Puntos suspensivos.
-                    | \@\w+(?:-\w+)*            # Nombres de usuario de Twitter.
-                    | \d+(?:[\.\,]\d+)%         # Porcentajes
-                    | \#?\w+(?:-\w+)*           # Palabras/Hashtags.
-                    | \$?\d+(?:[\.\,]\d+)?      # Numeros decimales, precios.
-                    | [][.,;"'?():-_`…]         # Tokens especiales.
-                    '''
+        self._pattern = TWEET_PATTERN
+        self._tokenizer = tweet_tokenizer()
 
-        self._tokenizer = RegexpTokenizer(self._pattern)
+        kwargs = {}
+        if sent_tokenizer is not None:
+            kwargs['sent_tokenizer'] = sent_tokenizer
 
-        PlaintextCorpusReader.__init__(self, root, fileids, word_tokenizer=self._tokenizer)
+        PlaintextCorpusReader.__init__(self, root, fileids,
+                                       word_tokenizer=self._tokenizer,
+                                       **kwargs)
 
@@ -0,0 +1,179 @@
+from math import log2
+
+from nltk.grammar import is_nonterminal
+from nltk.tree import Tree
+import numpy as np
+
+
+def _ranges(starts, ends):
+    # concatenation of range(s, e) for each pair of starts and ends.
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+class CKYParser:
+    """Viterbi CKY parser for PCFGs in Chomsky normal form.
+
+    The grammar is compiled into integer tables: nonterminals are numbered,
+    binary rules are arrays of parents, left children, right children and
+    log2-probabilities sorted by left child (then right child), and the
+    lexical rules of each word are arrays of nonterminals and
+    log2-probabilities.
+
+    The chart is a dense array of log2-probabilities indexed by the start
+    and end of a span and a nonterminal, with arrays of backpointers (the
+    rule and the split point) of the same shape.
+
+    Each span is filled at once. The rules tried are the ones whose left
+    child is in some left subspan, found by the ranges of rules of each left
+    child, kept only if their right child is in some right subspan. They are
+    scored for all the split points together, and the best split and rule
+    of each parent are kept.
+    """
+
+    def __init__(self, grammar):
+        """
+        grammar -- a binarised NLTK PCFG.
+        """
+        self.grammar = grammar
+        productions = grammar.productions()
+        nonterminals = {grammar.start()}
+        for p in productions:
+            nonterminals.add(p.lhs())
+            nonterminals.update(r for r in p.rhs() if is_nonterminal(r))
+        self._nonterminals = sorted(nonterminals, key=lambda nt: nt.symbol())
+        nt_ids = {nt: i for i, nt in enumerate(self._nonterminals)}
+        self._start = nt_ids[grammar.start()]
+
+        lexical, binary = {}, []
+        for p in productions:
+            rhs, a = p.rhs(), nt_ids[p.lhs()]
+            if len(rhs) == 1 and not is_nonterminal(rhs[0]):
+                lexical.setdefault(rhs[0], []).append((a, log2(p.prob())))
+            elif len(rhs) == 2 and all(is_nonterminal(r) for r in rhs):
+                b, c = nt_ids[rhs[0]], nt_ids[rhs[1]]
+                binary.append((b, c, a, log2(p.prob())))
+            else:
+                raise ValueError(
+                    'not in Chomsky normal form: {}'.format(p))
+
+        self._lexical = {
+            w: (np.array([a for a, _ in rules], dtype=np.intp),
+                np.array([lp for _, lp in rules]))
+            for w, rules in lexical.items()
+        }
+        binary.sort()
+        N = len(self._nonterminals)
+        self._lefts = np.array([r[0] for r in binary], dtype=np.intp)
+        self._rights = np.array([r[1] for r in binary], dtype=np.intp)
+        self._parents = np.array([r[2] for r in binary], dtype=np.intp)
+        self._log_probs = np.array([r[3] for r in binary])
+        # the rules with left child b are offsets[b]:offsets[b + 1].
+        self._offsets = np.searchsorted(self._lefts, np.arange(N + 1))
+        self._chart = None
+
+    def parse(self, sent):
+        """Parse a sequence of terminals. Returns the log2-probability and
+        the tree of the best parse, or (-inf, None) if there is none.
+
+        sent -- the sequence of terminals.
+        """
+        sent = list(sent)
+        n, N = len(sent), len(self._nonterminals)
+        # pi[i, j]: best log2-probability of each nonterminal over the
+        # words i to j (0-based, inclusive).
+        pi = np.full((n, n, N), -np.inf)
+        # rules[i, j] and splits[i, j]: the rule of the best derivation of
+        # each nonterminal (-1 for the lexical rules) and its split point.
+        rules = np.full((n, n, N), -1, dtype=np.intp)
+        splits = np.zeros((n, n, N), dtype=np.intp)
+        empty = (np.zeros(0, dtype=np.intp), np.zeros(0))
+
+        for i, w in enumerate(sent):
+            nts, lps = self._lexical.get(w, empty)
+            pi[i, i, nts] = lps
+        for length in range(1, n):
+            for i in range(n - length):
+                self._fill(pi, rules, splits, i, i + length)
+        self._chart = (sent, pi, rules, splits)
+
+        if n == 0 or pi[0, n - 1, self._start] == -np.inf:
+            return float('-inf'), None
+        return (float(pi[0, n - 1, self._start]),
+                self._tree(0, n - 1, self._start))
+
+    def _fill(self, pi, rules, splits, i, j):
+        # best derivation of each nonterminal over the words i to j.
+        lefts = pi[i, i:j]  # (split, nonterminal) for splits k = i..j-1
+        rights = pi[i + 1:j + 1, j]
+        # the rules with a left child in some left subspan, and a right
+        # child in some right subspan.
+        bs = np.flatnonzero((lefts > -np.inf).any(axis=0))
+        if len(bs) == 0:
+            return
+        r = _ranges(self._offsets[bs], self._offsets[bs + 1])
+        r = r[(rights > -np.inf).any(axis=0)[self._rights[r]]]
+        if len(r) == 0:
+            return
+
+        # scores of the rules at each split point, and the best split. the
+        # rules are rows, as reducing along rows is much faster.
+        lefts = np.ascontiguousarray(lefts.T)[self._lefts[r]]
+        scores = lefts + np.ascontiguousarray(rights.T)[self._rights[r]]
+        ks = scores.argmax(axis=1)
+        scores = scores[np.arange(len(r)), ks] + self._log_probs[r]
+        found = scores > -np.inf
+        r, ks, scores = r[found], ks[found], scores[found]
+        if len(r) == 0:
+            return
+
+        # the best rule of each parent is the first one.
+        parents = self._parents[r]
+        order = np.lexsort((-scores, parents))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = parents[order[1:]] != parents[order[:-1]]
+        best = order[first]
+        a = parents[best]
+        pi[i, j, a] = scores[best]
+        rules[i, j, a] = r[best]
+        splits[i, j, a] = i + ks[best]
+
+    def _tree(self, i, j, a):
+        # tree of the best derivation of nonterminal a over the words i to j.
+        sent, _, rules, splits = self._chart
+        label = self._nonterminals[a].symbol()
+        r = rules[i, j, a]
+        if r < 0:
+            return Tree(label, [sent[i]])
+        k = splits[i, j, a]
+        return Tree(label, [self._tree(i, k, self._lefts[r]),
+                            self._tree(k + 1, j, self._rights[r])])
+
+    @property
+    def _pi(self):
+        """Chart of the last parsed sentence, as a dictionary from spans
+        (i, j) (1-based, inclusive) to dictionaries from the nonterminals
+        with a derivation to their best log2-probability.
+        """
+        _, pi, _, _ = self._chart
+        n, nts = len(pi), self._nonterminals
+        return {
+            (i + 1, j + 1): {nts[a].symbol(): float(pi[i, j, a])
+                             for a in np.flatnonzero(pi[i, j] > -np.inf)}
+            for i in range(n) for j in range(i, n)
+        }
+
+    @property
+    def _bp(self):
+        """Best trees of the chart of the last parsed sentence, as a
+        dictionary from spans to dictionaries from nonterminals to trees
+        (see _pi).
+        """
+        _, pi, _, _ = self._chart
+        n, nts = len(pi), self._nonterminals
+        return {
+            (i + 1, j + 1): {nts[a].symbol(): self._tree(i, j, a)
+                             for a in np.flatnonzero(pi[i, j] > -np.inf)}
+            for i in range(n) for j in range(i, n)
+        }
@@ -37,7 +37,7 @@ if __name__ == '__main__':
     print('Loading corpus...')
     files = '3LB-CAST/.*\.tbf\.xml'
     corpus = SimpleAncoraCorpusReader('ancora/ancora-2.0/', files)
-    parsed_sents = list(corpus.parsed_sents())
+    parsed_sents = corpus.parsed_sents()
 
     print('Parsing...')
     hits, total_gold, total_model = 0, 0, 0
@@ -4,6 +4,7 @@ from math import log2
 
 from nltk.tree import Tree
 from nltk.grammar import PCFG
+from nltk.parse import ViterbiParser
 
 from parsing.cky_parser import CKYParser
 
@@ -99,6 +100,64 @@ class TestCKYParser(TestCase):
         lp2 = log2(1.0 * 0.6 * 1.0 * 0.9 * 1.0 * 1.0 * 0.4 * 0.1 * 1.0)
         self.assertAlmostEqual(lp, lp2)
 
+    def test_ambiguous(self):
+        grammar = PCFG.fromstring(
+            """
+                S -> NP VP              [1.0]
+                NP -> NP PP             [0.2]
+                NP -> Det Noun          [0.8]
+                VP -> Verb NP           [0.6]
+                VP -> VP PP             [0.4]
+                PP -> Prep NP           [1.0]
+                Det -> 'el'             [0.5]
+                Det -> 'un'             [0.5]
+                Noun -> 'gato'          [0.4]
+                Noun -> 'pescado'       [0.3]
+                Noun -> 'tenedor'       [0.3]
+                Verb -> 'come'          [1.0]
+                Prep -> 'con'           [1.0]
+            """)
+        parser = CKYParser(grammar)
+        viterbi = ViterbiParser(grammar)
+
+        sents = [
+            'el gato come un pescado'.split(),
+            'el gato come un pescado con un tenedor'.split(),
+            'el gato con un tenedor come un pescado con el gato'.split(),
+        ]
+        for sent in sents:
+            lp, t = parser.parse(sent)
+            t2 = next(viterbi.parse(sent))
+
+            self.assertEqual(t, Tree.convert(t2))
+            self.assertAlmostEqual(lp, log2(t2.prob()))
+
+    def test_no_parse(self):
+        grammar = PCFG.fromstring(
+            """
+                S -> NP VP              [1.0]
+                NP -> Det Noun          [1.0]
+                VP -> Verb NP           [1.0]
+                Det -> 'el'             [1.0]
+                Noun -> 'gato'          [1.0]
+                Verb -> 'come'          [1.0]
+            """)
+        parser = CKYParser(grammar)
+
+        for sent in ['el gato'.split(), 'el perro come el gato'.split(), []]:
+            self.assertEqual(parser.parse(sent), (float('-inf'), None))
+
+    def test_not_cnf(self):
+        grammar = PCFG.fromstring(
+            """
+                S -> NP Verb            [1.0]
+                NP -> Noun              [1.0]
+                Noun -> 'gato'          [1.0]
+                Verb -> 'come'          [1.0]
+            """)
+
+        self.assertRaises(ValueError, CKYParser, grammar)
+
     def assertEqualPi(self, pi1, pi2):
         self.assertEqual(set(pi1.keys()), set(pi2.keys()))
 
@@ -1,30 +1,145 @@
+import numpy as np
+
+from tagging.model_file import (encode_strings, decode_strings, SortedMap,
+                                sorted_strings, subsections, prefixed)
+from tagging.unknown import UnknownWordModel
 
 
 class BaselineTagger:
+    """Most frequent tag tagger.
+
+    Each known word gets the tag it was most often seen with, and unknown
+    words get the most frequent tag overall (or the most probable tag for
+    their suffix and shape, with an unknown word model). The model is a
+    word index and an array with the best tag id of each word.
+    """
 
-    def __init__(self, tagged_sents):
+    def __init__(self, tagged_sents, unknown_model=False):
         """
         tagged_sents -- training sentences, each one being a list of pairs.
+        unknown_model -- whether to tag unknown words by their suffix and
+            shape (see UnknownWordModel) instead of with the most frequent
+            tag (default: False).
         """
-        pass
+        tagged_sents = list(tagged_sents)
+        word_ids, tag_ids = {}, {}
+        words, tags = [], []
+        for sent in tagged_sents:
+            for w, t in sent:
+                words.append(word_ids.setdefault(w, len(word_ids)))
+                tags.append(tag_ids.setdefault(t, len(tag_ids)))
+
+        # tag ids in alphabetical order, to break ties the same way always.
+        self.tags = sorted(tag_ids)
+        rank = {t: i for i, t in enumerate(self.tags)}
+        order = np.array([rank[t] for t in tag_ids], dtype=int)
+        words = np.array(words, dtype=int)
+        tags = order[np.array(tags, dtype=int)]
+        V, K = len(word_ids), len(self.tags)
+
+        pairs, counts = np.unique(words * K + tags, return_counts=True)
+        # best pair of each word: sort by word, then by decreasing count.
+        pairs = pairs[np.lexsort((-counts, pairs // K))]
+        first = np.ones(len(pairs), dtype=bool)
+        first[1:] = pairs[1:] // K != pairs[:-1] // K
+        best = pairs[first]
+
+        dtype = np.min_scalar_type(max(K - 1, 0))
+        self._best = np.empty(V + 1, dtype=dtype)
+        self._best[best // K] = best % K
+        # the extra last entry is for unknown words.
+        self._best[V] = np.bincount(tags, minlength=K).argmax() if K else 0
+        self._word_ids = word_ids
+
+        self.unknown_model = None
+        if unknown_model:
+            self.unknown_model = UnknownWordModel(tagged_sents, self.tags)
 
     def tag(self, sent):
         """Tag a sentence.
 
         sent -- the sentence.
         """
-        return [self.tag_word(w) for w in sent]
+        return self.tag_sents([sent])[0]
+
+    def tag_sents(self, sents):
+        """Tag a list of sentences at once.
+
+        sents -- the sentences.
+        """
+        sents = [list(sent) for sent in sents]
+        V = len(self._word_ids)
+        words = [w for sent in sents for w in sent]
+        if isinstance(self._word_ids, SortedMap):
+            rows = self._word_ids.lookup(words, V)
+        else:
+            get = self._word_ids.get
+            rows = np.fromiter((get(w, V) for w in words), dtype=int,
+                               count=len(words))
+        tag_ids = self._best[rows].astype(int)
+
+        unknown = self.unknown_model
+        if unknown is not None:
+            for i in np.flatnonzero(rows == V):
+                tag_ids[i] = unknown.best_tag_id(words[i])
+
+        tags = np.array(self.tags, dtype=object)[tag_ids].tolist()
+        result, start = [], 0
+        for sent in sents:
+            result.append(tags[start:start + len(sent)])
+            start += len(sent)
+        return result
 
     def tag_word(self, w):
         """Tag a word.
 
         w -- the word.
         """
-        return 'nc'
+        row = self._word_ids.get(w)
+        if row is None and self.unknown_model is not None:
+            return self.tags[self.unknown_model.best_tag_id(w)]
+        if row is None:
+            row = len(self._word_ids)
+        return self.tags[self._best[row]]
 
     def unknown(self, w):
         """Check if a word is unknown for the model.
 
         w -- the word.
         """
-        return True
+        return w not in self._word_ids
+
+    def to_arrays(self):
+        """Parameters and arrays to save the tagger (see tagging.model_file).
+        """
+        words = sorted(self._word_ids)
+        rows = [self._word_ids[w] for w in words]
+        rows.append(len(self._word_ids))
+        arrays = {
+            'tags': encode_strings(self.tags),
+            'words': sorted_strings(words),
+            'best': self._best[rows],
+        }
+        meta = {}
+        if self.unknown_model is not None:
+            meta['unknown'], unknown = self.unknown_model.to_arrays()
+            arrays.update(prefixed(unknown, 'unknown'))
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """Tagger from saved parameters and arrays. Words are looked up in
+        the arrays, without building a dictionary.
+
+        meta -- the parameters.
+        arrays -- the arrays.
+        """
+        tagger = cls.__new__(cls)
+        tagger.tags = decode_strings(arrays['tags'])
+        tagger._best = arrays['best']
+        tagger._word_ids = SortedMap(arrays['words'])
+        tagger.unknown_model = None
+        if 'unknown' in meta:
+            tagger.unknown_model = UnknownWordModel.from_arrays(
+                meta['unknown'], subsections(arrays, 'unknown'))
+        return tagger
@@ -0,0 +1,168 @@
+"""Accuracy and speed benchmarks of the taggers.
+
+Each tagger is trained on a subset of the training sentences and measured
+for training time, model file size and load time, tagging speed one
+sentence at a time and in a batch, and accuracy (overall and on unknown
+words).
+"""
+from collections import Counter
+import os
+import random
+import tempfile
+import time
+
+from tagging.baseline import BaselineTagger
+from tagging.hmm import MLHMM
+from tagging.memm import MEMM
+from tagging.model_file import load_model, save_model
+
+
+# taggers that can be benchmarked, by name.
+taggers = {
+    'base': lambda sents: BaselineTagger(sents),
+    'base-u': lambda sents: BaselineTagger(sents, unknown_model=True),
+    'mlhmm2': lambda sents: MLHMM(2, sents),
+    'mlhmm2-u': lambda sents: MLHMM(2, sents, unknown_model=True),
+    'mlhmm3': lambda sents: MLHMM(3, sents),
+    'mlhmm3-u': lambda sents: MLHMM(3, sents, unknown_model=True),
+    'memm2': lambda sents: MEMM(2, sents),
+    'memm3': lambda sents: MEMM(3, sents),
+    'memm2-sgd': lambda sents: MEMM(2, sents, 'sgd', epochs=5),
+}
+
+
+def synthetic_corpus(n_sents, n_tags=12, n_words=3000, seed=0):
+    """Random tagged sentences, to benchmark without a real corpus.
+
+    Tags follow a random bigram model, and each tag has its own words,
+    sharing a suffix, plus some words ambiguous between tags, so that
+    both context and suffixes help tagging.
+
+    n_sents -- number of sentences.
+    n_tags -- number of tags.
+    n_words -- number of different words.
+    seed -- random seed.
+    """
+    rng = random.Random(seed)
+    tags = ['t{}'.format(i) for i in range(n_tags)]
+    # few likely successors for each tag, and '</s>'.
+    successors = {t: rng.sample(tags, min(5, n_tags)) + ['</s>']
+                  for t in ['<s>'] + tags}
+    successors['<s>'].remove('</s>')
+    suffixes = ['{}{}'.format(chr(97 + i % 26), i) for i in range(n_tags)]
+    words = {t: [] for t in tags}
+    for i in range(n_words):
+        t = tags[i % n_tags]
+        stem = ''.join(rng.choice('bcdfglmnprst') + rng.choice('aeiou')
+                       for _ in range(rng.randint(1, 3)))
+        words[t].append(stem + suffixes[i % n_tags])
+    # ambiguous words: also used with the tag after their own.
+    for t, u in zip(tags, tags[1:] + tags[:1]):
+        words[u].extend(words[t][:len(words[t]) // 3])
+    for t in tags:
+        # frequency ranks.
+        rng.shuffle(words[t])
+
+    sents = []
+    for _ in range(n_sents):
+        sent, t = [], rng.choice(successors['<s>'])
+        while t != '</s>' and len(sent) < 40:
+            # Zipf-like word frequencies.
+            ws = words[t]
+            w = ws[min(int(rng.paretovariate(1.0)) - 1, len(ws) - 1)]
+            sent.append((w, t))
+            t = rng.choice(successors[t])
+        if sent:
+            sents.append(sent)
+    return sents
+
+
+def accuracy(model, tagged_sents, model_tag_sents):
+    """Accuracy of taggings, overall and on unknown words. Returns the
+    pair of accuracies (None if there are no such words).
+
+    model -- the tagger.
+    tagged_sents -- the gold tagged sentences.
+    model_tag_sents -- the taggings of the model.
+    """
+    counts = Counter()
+    for sent, tags in zip(tagged_sents, model_tag_sents):
+        for (w, gold), t in zip(sent, tags):
+            unknown = model.unknown(w)
+            counts['total'] += 1
+            counts['hits'] += gold == t
+            counts['unknown'] += unknown
+            counts['unknown hits'] += unknown and gold == t
+    acc = counts['hits'] / counts['total'] if counts['total'] else None
+    unknown = counts['unknown']
+    unknown_acc = counts['unknown hits'] / unknown if unknown else None
+    return acc, unknown_acc
+
+
+def run(name, train, test, single_sents=200):
+    """Benchmark a tagger. Returns a dictionary with the measures.
+
+    name -- the name of the tagger (see taggers).
+    train -- the training sentences.
+    test -- the test sentences.
+    single_sents -- number of test sentences tagged one at a time.
+    """
+    record = {'tagger': name, 'train_sents': len(train)}
+
+    start = time.perf_counter()
+    model = taggers[name](train)
+    record['train_time'] = time.perf_counter() - start
+
+    fd, filename = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        save_model(model, filename)
+        record['model_bytes'] = os.path.getsize(filename)
+        start = time.perf_counter()
+        model = load_model(filename)
+        record['load_time'] = time.perf_counter() - start
+
+        sents = [[w for w, _ in sent] for sent in test]
+        start = time.perf_counter()
+        model_tag_sents = model.tag_sents(sents)
+        elapsed = time.perf_counter() - start
+        tokens = sum(len(sent) for sent in sents)
+        record['batch_tokens_per_sec'] = tokens / elapsed if elapsed else None
+
+        single = sents[:single_sents]
+        start = time.perf_counter()
+        for sent in single:
+            model.tag(sent)
+        elapsed = time.perf_counter() - start
+        tokens = sum(len(sent) for sent in single)
+        record['single_tokens_per_sec'] = tokens / elapsed if elapsed else None
+
+        record['accuracy'], record['unknown_accuracy'] = accuracy(
+            model, test, model_tag_sents)
+    finally:
+        os.remove(filename)
+    return record
+
+
+def print_table(records, file=None):
+    """Print a comparison table of benchmark records.
+
+    records -- the records (see run()).
+    file -- where to print it (default: stdout).
+    """
+    def fmt(value, spec):
+        return '-' if value is None else format(value, spec)
+
+    header = '{:<10} {:>7} {:>8} {:>9} {:>8} {:>10} {:>10} {:>7} {:>7}'
+    print(header.format('tagger', 'train', 'train s', 'size KB', 'load ms',
+                        'batch t/s', 'single t/s', 'acc', 'unk'), file=file)
+    for r in records:
+        print(header.format(
+            r['tagger'], r['train_sents'], fmt(r['train_time'], '.2f'),
+            fmt(r['model_bytes'] / 1024, '.0f'),
+            fmt(r['load_time'] * 1000, '.1f'),
+            fmt(r['batch_tokens_per_sec'], '.0f'),
+            fmt(r['single_tokens_per_sec'], '.0f'),
+            fmt(r['accuracy'] and 100 * r['accuracy'], '.2f'),
+            fmt(r['unknown_accuracy'] and 100 * r['unknown_accuracy'],
+                '.2f')), file=file)
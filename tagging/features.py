@@ -1,6 +1,10 @@
 from collections import namedtuple
 
 from featureforge.feature import Feature
+from scipy.sparse import csr_matrix
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.utils import murmurhash3_32
+import numpy as np
 
 
 # sent -- the whole sentence.
@@ -9,10 +13,396 @@ from featureforge.feature import Feature
 History = namedtuple('History', 'sent prev_tags i')
 
 
+class HistoryView:
+    """A history of a tagged sentence, sharing the sentence and its padded
+    tags with the other histories of the sentence. It compares equal to the
+    History with the same fields.
+
+    The previous tags are only sliced from the tags when asked for, so
+    building the histories of a corpus allocates a small object per token
+    and no tuples.
+    """
+    __slots__ = ('sent', 'tags', 'i', 'n')
+
+    def __init__(self, sent, tags, i, n):
+        """
+        sent -- the whole sentence.
+        tags -- tuple with n - 1 '<s>' followed by the tags of the sentence.
+        i -- the position to be tagged.
+        n -- order of the model.
+        """
+        self.sent = sent
+        self.tags = tags
+        self.i = i
+        self.n = n
+
+    @property
+    def prev_tags(self):
+        i = self.i
+        return self.tags[i:i + self.n - 1]
+
+    def __iter__(self):
+        yield self.sent
+        yield self.prev_tags
+        yield self.i
+
+    def __eq__(self, other):
+        if isinstance(other, (HistoryView, History)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    # like History, that is unhashable as its sentence is a list.
+    __hash__ = None
+
+    def __repr__(self):
+        return 'HistoryView(sent={!r}, prev_tags={!r}, i={!r})'.format(
+            *self)
+
+
+def current_word(h):
+    """The current word of a history alone, preprocessed for the batch word
+    features. Each word feature is its batch version applied to it.
+
+    h -- a history.
+    """
+    return Words([h.sent[h.i]])
+
+
 def word_lower(h):
     """Feature: current lowercased word.
 
     h -- a history.
     """
-    sent, i = h.sent, h.i
-    return sent[i].lower()
+    return words_lower(current_word(h))[0]
+
+
+def word_istitle(h):
+    """Feature: current word starts with uppercase.
+
+    h -- a history.
+    """
+    return words_istitle(current_word(h))[0]
+
+
+def word_isupper(h):
+    """Feature: current word is all uppercase.
+
+    h -- a history.
+    """
+    return words_isupper(current_word(h))[0]
+
+
+def word_isdigit(h):
+    """Feature: current word is a number.
+
+    h -- a history.
+    """
+    return words_isdigit(current_word(h))[0]
+
+
+def prev_tags(h):
+    """Feature: the previous tags.
+
+    h -- a history.
+    """
+    return h.prev_tags
+
+
+class NPrevTags(Feature):
+
+    def __init__(self, n):
+        """Feature: n previous tags tuple.
+
+        n -- number of previous tags to consider.
+        """
+        self._n = n
+
+    def _evaluate(self, h):
+        """n previous tags tuple.
+
+        h -- a history.
+        """
+        return h.prev_tags[len(h.prev_tags) - self._n:]
+
+
+class PrevWord(Feature):
+
+    def __init__(self, f):
+        """Feature: the feature f applied to the previous word.
+
+        f -- the feature.
+        """
+        self._f = f
+
+    def _evaluate(self, h):
+        """Apply the feature to the previous word in the history.
+
+        h -- the history.
+        """
+        if h.i == 0:
+            return 'BOS'
+        return str(self._f(History(h.sent, h.prev_tags, h.i - 1)))
+
+
+class Words:
+    """A sentence preprocessed once for the batch word features."""
+
+    def __init__(self, sent):
+        """
+        sent -- the sentence (or any list of words).
+        """
+        self.sent = sent
+        self.lower = [w.lower() for w in sent]
+
+
+def words_lower(words):
+    """Batch feature: lowercased words.
+
+    words -- the preprocessed words (see Words).
+    """
+    return words.lower
+
+
+def words_istitle(words):
+    """Batch feature: words that start with uppercase.
+
+    words -- the preprocessed words (see Words).
+    """
+    return [w.istitle() for w in words.sent]
+
+
+def words_isupper(words):
+    """Batch feature: words that are all uppercase.
+
+    words -- the preprocessed words (see Words).
+    """
+    return [w.isupper() for w in words.sent]
+
+
+def words_isdigit(words):
+    """Batch feature: words that are numbers.
+
+    words -- the preprocessed words (see Words).
+    """
+    return [w.isdigit() for w in words.sent]
+
+
+# batch version of each word feature (see current_word()).
+batch_features = {
+    word_lower: words_lower,
+    word_istitle: words_istitle,
+    word_isupper: words_isupper,
+    word_isdigit: words_isdigit,
+}
+
+
+def word_columns(features, sent):
+    """Apply word features to all the words of a sentence at once, sharing
+    the preprocessing. Returns a column of values for each feature.
+
+    features -- the word features.
+    sent -- the sentence (or any list of words).
+    """
+    words = Words(sent)
+    columns = []
+    for f in features:
+        batch = batch_features.get(f)
+        if batch is not None:
+            columns.append(batch(words))
+        else:
+            # features without a batch version, one history at a time.
+            columns.append([f(History(sent, (), i)) for i in range(len(sent))])
+    return columns
+
+
+class HashedFeatures(BaseEstimator, TransformerMixin):
+    """Transformer of histories into hashed sparse feature vectors.
+
+    Each feature value becomes a string hashed into a feature id, so a
+    history is a row with a fixed number of ids: the word features of the
+    current and the previous word, and the context features.
+
+    Word features only look at the current word, so they are computed in
+    batches over whole sentences (see word_columns()) and cached by word,
+    and the ids of a sentence form a columnar array. Context features only
+    look at the previous tags, so they are cached by the tuple of previous
+    tags.
+    """
+
+    def __init__(self, word_features, context_features, n_features=2 ** 20,
+                 cache_size=2 ** 18):
+        """
+        word_features -- features of the current word, also applied to the
+            previous word. They must have a batch version (see
+            batch_features), since their values are cached by word.
+        context_features -- features of the previous tags.
+        n_features -- number of different feature ids.
+        cache_size -- maximum number of words to keep feature ids for.
+        """
+        for f in word_features:
+            if f not in batch_features:
+                # a feature without a batch version may look at other words
+                # of the sentence (e.g. PrevWord), so caching it by word
+                # would be wrong.
+                raise ValueError(
+                    'word feature without a batch version: {}'.format(f))
+        self.word_features = word_features
+        self.context_features = context_features
+        self.n_features = n_features
+        self.cache_size = cache_size
+        self._init_caches()
+
+    def _init_caches(self):
+        self._words = {}
+        self._contexts = {}
+        bos = ['p{}=BOS'.format(j) for j in range(len(self.word_features))]
+        self._bos = tuple(bos)
+        self._bos_ids = [self._hash(s) for s in bos]
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        for k in ['_words', '_contexts', '_bos', '_bos_ids']:
+            state.pop(k, None)
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._init_caches()
+
+    def _hash(self, s):
+        return murmurhash3_32(s, positive=True) % self.n_features
+
+    def _strings(self, values):
+        # strings of the word feature values, as current and previous word.
+        return (['w{}={}'.format(j, v) for j, v in enumerate(values)],
+                ['p{}={}'.format(j, v) for j, v in enumerate(values)])
+
+    def context_strings(self, prev_tags):
+        """Feature strings of the previous tags.
+
+        prev_tags -- the tuple of previous tags.
+        """
+        h = History([], prev_tags, 0)
+        return ['c{}={}'.format(j, f(h))
+                for j, f in enumerate(self.context_features)]
+
+    def history_strings(self, h):
+        """Feature strings of a single history.
+
+        h -- the history.
+        """
+        sent, i = h.sent, h.i
+        columns = word_columns(self.word_features, sent[max(i - 1, 0):i + 1])
+        current, _ = self._strings([c[-1] for c in columns])
+        if i > 0:
+            _, prev = self._strings([c[0] for c in columns])
+        else:
+            prev = list(self._bos)
+        return current + prev + self.context_strings(tuple(h.prev_tags))
+
+    def context_ids(self, prev_tags):
+        """Tuple of feature ids of the previous tags.
+
+        prev_tags -- the tuple of previous tags.
+        """
+        ids = self._contexts.get(prev_tags)
+        if ids is None:
+            ids = tuple(self._hash(s) for s in self.context_strings(prev_tags))
+            self._contexts[prev_tags] = ids
+        return ids
+
+    def sent_ids(self, sent):
+        """Array with a row of word feature ids for each position of a
+        sentence: the ids of the current word followed by the ids of the
+        previous one.
+
+        sent -- the sentence.
+        """
+        cache, F = self._words, len(self.word_features)
+        missing = [w for w in dict.fromkeys(sent) if w not in cache]
+        if missing:
+            if len(cache) + len(missing) > self.cache_size:
+                cache.clear()
+            columns = word_columns(self.word_features, missing)
+            for k, w in enumerate(missing):
+                current, prev = self._strings([c[k] for c in columns])
+                cache[w] = [self._hash(s) for s in current + prev]
+
+        ids = np.array([cache[w] for w in sent], dtype=np.int64)
+        ids = ids.reshape(len(sent), 2 * F)
+        result = np.empty_like(ids)
+        result[:, :F] = ids[:, :F]
+        if len(sent):
+            result[0, F:] = self._bos_ids
+            result[1:, F:] = ids[:-1, F:]
+        return result
+
+    def history_ids(self, histories):
+        """Array with a row of feature ids for each history.
+
+        histories -- the histories.
+        """
+        blocks, positions, contexts = [], [], []
+        offset, last = 0, None
+        for h in histories:
+            if h.sent is not last:
+                # a new sentence, shared by the histories that follow.
+                if blocks:
+                    offset += len(blocks[-1])
+                last = h.sent
+                blocks.append(self.sent_ids(h.sent))
+            i = h.i
+            positions.append(offset + i)
+            if type(h) is HistoryView:
+                # sliced here, as calling the property is much slower.
+                prev = h.tags[i:i + h.n - 1]
+            else:
+                prev = tuple(h.prev_tags)
+            contexts.append(self.context_ids(prev))
+
+        n_columns = 2 * len(self.word_features) + len(self.context_features)
+        if not positions:
+            return np.zeros((0, n_columns), dtype=np.int64)
+        words = np.concatenate(blocks)[positions]
+        return np.hstack([words, np.array(contexts, dtype=np.int64)])
+
+    def matrix(self, ids):
+        """Sparse matrix of rows of feature ids, with a column for each id
+        seen in training (other ids are dropped).
+
+        ids -- the array of feature ids.
+        """
+        columns = self.columns_
+        pos = np.searchsorted(columns, ids)
+        pos[pos == len(columns)] = 0
+        found = columns[pos] == ids
+        indptr = np.concatenate([[0], np.cumsum(found.sum(axis=1))])
+        return csr_matrix((np.ones(indptr[-1]), pos[found], indptr),
+                          shape=(len(ids), len(columns)))
+
+    def fit(self, histories, y=None):
+        """Learn the feature ids used by the training histories.
+
+        histories -- the training histories.
+        """
+        self.fit_transform(histories)
+        return self
+
+    def fit_transform(self, histories, y=None):
+        """Learn the feature ids used by the training histories, and return
+        their sparse matrix.
+
+        histories -- the training histories.
+        """
+        ids = self.history_ids(histories)
+        # keep only the ids seen in training, so the classifier does not
+        # carry weights for the whole hashed space.
+        self.columns_ = np.unique(ids)
+        return self.matrix(ids)
+
+    def transform(self, histories):
+        """Sparse matrix with a row for each history.
+
+        histories -- the histories.
+        """
+        return self.matrix(self.history_ids(histories))
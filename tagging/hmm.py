@@ -0,0 +1,984 @@
+from collections import defaultdict
+from math import log2
+from multiprocessing import Pool
+
+import numpy as np
+
+from tagging.model_file import (encode_strings, decode_strings, SortedMap,
+                                sorted_strings, subsections, prefixed)
+from tagging.tagdict import TagDictionary
+from tagging.unknown import UnknownWordModel
+
+
+def _log2(p):
+    return log2(p) if p > 0.0 else float('-inf')
+
+
+def _logsumexp2(a, axis):
+    # log2 of the sum of 2 ** a along an axis, without underflow.
+    top = a.max(axis=axis, keepdims=True)
+    top[~np.isfinite(top)] = 0.0
+    with np.errstate(divide='ignore'):
+        result = np.log2(np.exp2(a - top).sum(axis=axis, keepdims=True))
+    return (result + top).squeeze(axis)
+
+
+class HMMTables:
+    """Dense integer-indexed log2-probability tables of an HMM, used for
+    vectorized decoding.
+
+    Tag id 0 is the start tag '<s>', and the end tag '</s>' is the extra
+    last column of the transition table. A context (tuple of the n-1
+    previous tags) is encoded in base K = len(tags), oldest tag first, so
+    context 0 is the initial context ('<s>', ..., '<s>').
+    """
+
+    def __init__(self, n, tags, words, trans, out, unknown=None,
+                 word_ids=None):
+        """
+        n -- n-gram size.
+        tags -- list of tags, starting with '<s>'.
+        words -- list of known words.
+        trans -- array (K ** (n - 1), K + 1) of transition log-probabilities.
+        out -- array (len(words) + 1, K) of output log-probabilities. The
+            last row is used for unknown words.
+        unknown -- unknown word model (optional). If given, out has a row
+            for each of its nodes after the known words instead.
+        word_ids -- mapping from words to their index in words (default:
+            built from words).
+        """
+        self.n = n
+        self.tags = tags
+        self.tag_ids = {t: i for i, t in enumerate(tags)}
+        self.words = words
+        if word_ids is None:
+            word_ids = {w: i for i, w in enumerate(words)}
+        self.word_ids = word_ids
+        self.trans = trans
+        self.out = out
+        self.unknown = unknown
+
+    def word_rows(self, sent):
+        """Rows of the output table for the words of a sentence.
+
+        sent -- the sentence.
+        """
+        get, V = self.word_ids.get, len(self.words)
+        if isinstance(self.word_ids, SortedMap):
+            rows = self.word_ids.lookup(sent, V).astype(np.intp)
+            if self.unknown is not None:
+                node = self.unknown.node
+                for i in np.flatnonzero(rows == V):
+                    rows[i] = V + node(sent[i])
+            return rows
+        if self.unknown is None:
+            return np.array([get(w, V) for w in sent], dtype=np.intp)
+        node = self.unknown.node
+        rows = [get(w) for w in sent]
+        return np.array([V + node(w) if r is None else r
+                         for w, r in zip(sent, rows)], dtype=np.intp)
+
+    def context_id(self, context):
+        """Integer id of a context.
+
+        context -- tuple of n-1 tags.
+        """
+        K, c = len(self.tags), 0
+        for t in context:
+            c = c * K + self.tag_ids[t]
+        return c
+
+    def context(self, c):
+        """Context of an integer id.
+
+        c -- the context id.
+        """
+        K, tags = len(self.tags), self.tags
+        result = []
+        for _ in range(self.n - 1):
+            c, t = divmod(c, K)
+            result.append(tags[t])
+        return tuple(reversed(result))
+
+    def trans_prob(self, tag, prev_tags):
+        """Probability of a tag.
+
+        tag -- the tag.
+        prev_tags -- tuple with the previous n-1 tags.
+        """
+        K = len(self.tags)
+        t = K if tag == '</s>' else self.tag_ids.get(tag)
+        if t is None or any(p not in self.tag_ids for p in prev_tags):
+            return 0.0
+        return 2.0 ** self.trans[self.context_id(prev_tags), t]
+
+    def out_prob(self, word, tag):
+        """Probability of a word given a tag.
+
+        word -- the word.
+        tag -- the tag.
+        """
+        t = self.tag_ids.get(tag)
+        if t is None:
+            return 0.0
+        return 2.0 ** self.out[self.word_rows([word])[0], t]
+
+
+class HMM:
+
+    # whether the model has only its tables (see from_arrays()).
+    _tables_only = False
+
+    def __init__(self, n, tagset, trans, out):
+        """
+        n -- n-gram size.
+        tagset -- set of tags.
+        trans -- transition probabilities dictionary.
+        out -- output probabilities dictionary.
+        """
+        self.n = n
+        self._tagset = tagset
+        self._trans = trans
+        self._out = out
+        # candidate tags of each word (optional, see ViterbiTagger).
+        self.tag_dict = None
+        self._tables = None
+        self._tagger = None
+
+    def tagset(self):
+        """Returns the set of tags.
+        """
+        return self._tagset
+
+    def trans_prob(self, tag, prev_tags):
+        """Probability of a tag.
+
+        tag -- the tag.
+        prev_tags -- tuple with the previous n-1 tags (optional only if n = 1).
+        """
+        if self._tables_only:
+            return self.tables().trans_prob(tag, tuple(prev_tags))
+        return self._trans.get(tuple(prev_tags), {}).get(tag, 0.0)
+
+    def out_prob(self, word, tag):
+        """Probability of a word given a tag.
+
+        word -- the word.
+        tag -- the tag.
+        """
+        if self._tables_only:
+            return self.tables().out_prob(word, tag)
+        return self._out.get(tag, {}).get(word, 0.0)
+
+    def tag_prob(self, y):
+        """
+        Probability of a tagging.
+        Warning: subject to underflow problems.
+
+        y -- tagging.
+        """
+        n = self.n
+        y = ['<s>'] * (n - 1) + list(y) + ['</s>']
+        p = 1.0
+        for i in range(n - 1, len(y)):
+            p *= self.trans_prob(y[i], tuple(y[i - n + 1:i]))
+        return p
+
+    def prob(self, x, y):
+        """
+        Joint probability of a sentence and its tagging.
+        Warning: subject to underflow problems.
+
+        x -- sentence.
+        y -- tagging.
+        """
+        p = self.tag_prob(y)
+        for w, t in zip(x, y):
+            p *= self.out_prob(w, t)
+        return p
+
+    def tag_log_prob(self, y):
+        """
+        Log-probability of a tagging.
+
+        y -- tagging.
+        """
+        n = self.n
+        y = ['<s>'] * (n - 1) + list(y) + ['</s>']
+        lp = 0.0
+        for i in range(n - 1, len(y)):
+            lp += _log2(self.trans_prob(y[i], tuple(y[i - n + 1:i])))
+        return lp
+
+    def log_prob(self, x, y):
+        """
+        Joint log-probability of a sentence and its tagging.
+
+        x -- sentence.
+        y -- tagging.
+        """
+        lp = self.tag_log_prob(y)
+        for w, t in zip(x, y):
+            lp += _log2(self.out_prob(w, t))
+        return lp
+
+    def tag(self, sent):
+        """Returns the most probable tagging for a sentence.
+
+        sent -- the sentence.
+        """
+        if self._tagger is None:
+            self._tagger = ViterbiTagger(self)
+        return self._tagger.tag(sent)
+
+    def tag_sents(self, sents):
+        """Returns the most probable taggings for a list of sentences.
+
+        sents -- the sentences.
+        """
+        if self._tagger is None:
+            self._tagger = ViterbiTagger(self)
+        return self._tagger.tag_sents(sents)
+
+    def posteriors(self, sent):
+        """Returns the posterior probability of each tag at each position of
+        a sentence, and the log-probability of the sentence (see
+        ForwardBackward).
+
+        sent -- the sentence.
+        """
+        return ForwardBackward(self).posteriors(sent)
+
+    def tables(self):
+        """Dense log-probability tables of the model (see HMMTables). They are
+        built on first use.
+        """
+        if self._tables is None:
+            self._tables = self.build_tables()
+        return self._tables
+
+    def build_tables(self):
+        """Build the dense log-probability tables from the probability
+        dictionaries.
+        """
+        n = self.n
+        tags = ['<s>'] + sorted(self._tagset)
+        tag_ids = {t: i for i, t in enumerate(tags)}
+        tag_ids['</s>'] = K = len(tags)
+        words = sorted({w for ws in self._out.values() for w in ws})
+        word_ids = {w: i for i, w in enumerate(words)}
+
+        with np.errstate(divide='ignore'):
+            trans = np.full((K ** (n - 1), K + 1), -np.inf)
+            for prev_tags, probs in self._trans.items():
+                c = 0
+                for t in prev_tags:
+                    c = c * K + tag_ids[t]
+                for t, p in probs.items():
+                    trans[c, tag_ids[t]] = np.log2(p)
+
+            # the extra last row is for unknown words.
+            out = np.full((len(words) + 1, K), -np.inf)
+            for t, probs in self._out.items():
+                for w, p in probs.items():
+                    out[word_ids[w], tag_ids[t]] = np.log2(p)
+
+        return HMMTables(n, tags, words, trans, out)
+
+    def __getstate__(self):
+        # the tables and the tagger are rebuilt on demand, unless the model
+        # has only its tables.
+        state = self.__dict__.copy()
+        if not self._tables_only:
+            state['_tables'] = None
+        state['_tagger'] = None
+        return state
+
+    def to_arrays(self):
+        """Parameters and arrays to save the model (see tagging.model_file).
+        The model is saved as its tables.
+        """
+        tables = self.tables()
+        if isinstance(tables.word_ids, SortedMap):
+            words = tables.word_ids.keys
+        else:
+            words = sorted_strings(tables.words)
+        meta = {'n': self.n}
+        arrays = {
+            'tags': encode_strings(tables.tags),
+            'words': words,
+            'trans': tables.trans,
+            'out': tables.out,
+        }
+        if self.tag_dict is not None:
+            meta['tag_dict'], tag_dict = self.tag_dict.to_arrays()
+            arrays.update(prefixed(tag_dict, 'tag_dict'))
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """Model from saved parameters and arrays. The tables are used as
+        they are, with words looked up in the arrays.
+
+        meta -- the parameters.
+        arrays -- the arrays.
+        """
+        tags = decode_strings(arrays['tags'])
+        words = SortedMap(arrays['words'])
+        hmm = cls(meta['n'], set(tags[1:]), None, None)
+        hmm._tables_only = True
+        hmm._tables = HMMTables(meta['n'], tags, words, arrays['trans'],
+                                arrays['out'], word_ids=words)
+        if 'tag_dict' in meta:
+            hmm.tag_dict = TagDictionary.from_arrays(
+                meta['tag_dict'], subsections(arrays, 'tag_dict'))
+        return hmm
+
+
+def encode(tagged_sents):
+    """Integer-encode tagged sentences with their own tag and word
+    vocabularies. Returns the tag and word vocabularies, and the arrays of
+    sentence lengths, tag ids and word ids.
+
+    tagged_sents -- sentences, each one being a list of pairs.
+    """
+    tag_ids, word_ids = {}, {}
+    lengths, tags, words = [], [], []
+    for sent in tagged_sents:
+        lengths.append(len(sent))
+        for w, t in sent:
+            tags.append(tag_ids.setdefault(t, len(tag_ids)))
+            words.append(word_ids.setdefault(w, len(word_ids)))
+    return (list(tag_ids), list(word_ids), np.array(lengths, dtype=np.intp),
+            np.array(tags, dtype=np.intp), np.array(words, dtype=np.intp))
+
+
+def _ranges(lengths):
+    # concatenation of range(l) for each length l.
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.arange(lengths.sum()) - offsets
+
+
+class MLHMM(HMM):
+
+    def __init__(self, n, tagged_sents, addone=True, tag_dict=False,
+                 unknown_model=False, processes=None):
+        """
+        n -- order of the model.
+        tagged_sents -- training sentences, each one being a list of pairs.
+        addone -- whether to use addone smoothing (default: True).
+        tag_dict -- whether to build a tag dictionary to restrict decoding
+            (default: False).
+        unknown_model -- whether to give unknown words emission
+            probabilities by their suffix and shape (see UnknownWordModel)
+            instead of a uniform 1 / |V| (default: False).
+        processes -- number of worker processes to encode the sentences
+            with, in shards (optional).
+
+        Words and tags are integer-encoded, and the counts are kept in
+        sorted arrays of integer keys: a tag n-gram is the key
+        context * (K + 1) + tag, where the context is the n-1 previous tags
+        in base K (see HMMTables), and a word/tag pair is word * K + tag.
+        """
+        self.n = n
+        self.addone = addone
+        self._tables = None
+        self._tagger = None
+        tagged_sents = list(tagged_sents)
+
+        if processes:
+            size = max(1, -(-len(tagged_sents) // processes))
+            shards = [tagged_sents[i:i + size]
+                      for i in range(0, len(tagged_sents), size)]
+            with Pool(processes) as pool:
+                encoded = pool.map(encode, shards)
+        else:
+            encoded = [encode(tagged_sents)]
+
+        # merge the vocabularies of the shards.
+        tags = ['<s>'] + sorted({t for e in encoded for t in e[0]})
+        words = sorted({w for e in encoded for w in e[1]})
+        self._tags, self._words = tags, words
+        self._tag_ids = tag_ids = {t: i for i, t in enumerate(tags)}
+        self._word_ids = word_ids = {w: i for i, w in enumerate(words)}
+        lengths, tag_seq, word_seq = [], [], []
+        for shard_tags, shard_words, shard_lengths, ts, ws in encoded:
+            tag_map = np.array([tag_ids[t] for t in shard_tags], np.intp)
+            word_map = np.array([word_ids[w] for w in shard_words], np.intp)
+            lengths.append(shard_lengths)
+            tag_seq.append(tag_map[ts])
+            word_seq.append(word_map[ws])
+        lengths = np.concatenate(lengths).astype(np.intp)
+        tag_seq = np.concatenate(tag_seq).astype(np.intp)
+        word_seq = np.concatenate(word_seq).astype(np.intp)
+        K = len(tags)
+
+        # padded tag sequences: n-1 '<s>' (id 0) + tags + '</s>' (id K).
+        padded = lengths + n
+        starts = np.cumsum(padded) - padded
+        seq = np.zeros(padded.sum(), dtype=np.intp)
+        seq[np.repeat(starts + n - 1, lengths) + _ranges(lengths)] = tag_seq
+        seq[starts + n - 1 + lengths] = K
+
+        # one n-gram starting at each position but the last n-1.
+        windows = np.repeat(starts, lengths + 1) + _ranges(lengths + 1)
+        context = np.zeros(len(windows), dtype=np.int64)
+        for j in range(n - 1):
+            context = context * K + seq[windows + j]
+        keys = context * (K + 1) + seq[windows + n - 1]
+        self._ngram_keys, self._ngram_counts = np.unique(
+            keys, return_counts=True)
+        self._context_keys, self._context_counts = np.unique(
+            context, return_counts=True)
+
+        self._out_keys, self._out_counts = np.unique(
+            word_seq * K + tag_seq, return_counts=True)
+        self._tag_counts = np.bincount(tag_seq, minlength=K)
+
+        self.tag_dict = TagDictionary(tagged_sents) if tag_dict else None
+        self.unknown_model = None
+        if unknown_model:
+            self.unknown_model = UnknownWordModel(tagged_sents, tags)
+
+    def tagset(self):
+        """Returns the set of tags.
+        """
+        return set(self._tags[1:])
+
+    def _context_id(self, prev_tags):
+        # None if some tag is unknown.
+        K, c = len(self._tags), 0
+        for t in prev_tags:
+            if t not in self._tag_ids:
+                return None
+            c = c * K + self._tag_ids[t]
+        return c
+
+    @staticmethod
+    def _lookup(keys, counts, key):
+        i = np.searchsorted(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return int(counts[i])
+        return 0
+
+    def tcount(self, tokens):
+        """Count for an n-gram or (n-1)-gram of tags.
+
+        tokens -- the n-gram or (n-1)-gram tuple of tags.
+        """
+        n, K = self.n, len(self._tags)
+        tokens = tuple(tokens)
+        if len(tokens) == n - 1:
+            c = self._context_id(tokens)
+            if c is None:
+                return 0
+            return self._lookup(self._context_keys, self._context_counts, c)
+        assert len(tokens) == n
+        c = self._context_id(tokens[:-1])
+        tag = tokens[-1]
+        t = K if tag == '</s>' else self._tag_ids.get(tag)
+        if c is None or t is None:
+            return 0
+        key = c * (K + 1) + t
+        return self._lookup(self._ngram_keys, self._ngram_counts, key)
+
+    def unknown(self, w):
+        """Check if a word is unknown for the model.
+
+        w -- the word.
+        """
+        return w not in self._word_ids
+
+    def trans_prob(self, tag, prev_tags):
+        """Probability of a tag.
+
+        tag -- the tag.
+        prev_tags -- tuple with the previous n-1 tags (optional only if n = 1).
+        """
+        prev_tags = tuple(prev_tags)
+        count = self.tcount(prev_tags + (tag,))
+        context_count = self.tcount(prev_tags)
+        if self.addone:
+            # the next tag can be any tag or '</s>'.
+            return (count + 1.0) / (context_count + len(self._tags))
+        elif context_count == 0:
+            return 0.0
+        return float(count) / context_count
+
+    def out_prob(self, word, tag):
+        """Probability of a word given a tag.
+
+        word -- the word.
+        tag -- the tag.
+        """
+        if self.unknown(word):
+            if self.unknown_model is not None:
+                return self.unknown_model.prob(word, tag)
+            return 1.0 / len(self._words)
+        t = self._tag_ids.get(tag)
+        if t is None or self._tag_counts[t] == 0:
+            return 0.0
+        key = self._word_ids[word] * len(self._tags) + t
+        count = self._lookup(self._out_keys, self._out_counts, key)
+        return float(count) / self._tag_counts[t]
+
+    def build_tables(self):
+        """Build the dense log-probability tables from the counts, all at
+        once.
+        """
+        n, K = self.n, len(self._tags)
+        V = len(self._words)
+        C = K ** (n - 1)
+        counts = np.zeros(C * (K + 1))
+        counts[self._ngram_keys] = self._ngram_counts
+        counts = counts.reshape(C, K + 1)
+        context_counts = np.zeros(C)
+        context_counts[self._context_keys] = self._context_counts
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.addone:
+                trans = np.log2((counts + 1.0) / (context_counts[:, None] + K))
+            else:
+                trans = np.log2(counts / context_counts[:, None])
+            trans[np.isnan(trans)] = -np.inf
+            # nothing goes back to '<s>'.
+            trans[:, 0] = -np.inf
+
+            out = np.zeros((V + 1) * K)
+            out[self._out_keys] = self._out_counts
+            out = out.reshape(V + 1, K)
+            out = np.log2(out / self._tag_counts)
+            out[np.isnan(out)] = -np.inf
+            # unknown words.
+            out[V] = -np.log2(V)
+            out[:, 0] = -np.inf
+
+        unknown = self.unknown_model
+        if unknown is not None:
+            # a row for each node of the unknown word model instead.
+            out = np.vstack([out[:V], unknown.log_probs])
+            out[:, 0] = -np.inf
+        return HMMTables(n, self._tags, self._words, trans, out, unknown,
+                         self._word_ids)
+
+    def to_arrays(self):
+        """Parameters and arrays to save the model (see tagging.model_file).
+        The counts are saved, and the tables are built again on load.
+        """
+        words = self._words
+        if isinstance(self._word_ids, SortedMap):
+            words = self._word_ids.keys
+        else:
+            words = sorted_strings(words)
+        meta = {'n': self.n, 'addone': self.addone}
+        arrays = {
+            'tags': encode_strings(self._tags),
+            'words': words,
+            'ngram_keys': self._ngram_keys,
+            'ngram_counts': self._ngram_counts,
+            'context_keys': self._context_keys,
+            'context_counts': self._context_counts,
+            'out_keys': self._out_keys,
+            'out_counts': self._out_counts,
+            'tag_counts': self._tag_counts,
+        }
+        for name in ['tag_dict', 'unknown_model']:
+            component = getattr(self, name)
+            if component is not None:
+                meta[name], component_arrays = component.to_arrays()
+                arrays.update(prefixed(component_arrays, name))
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """Model from saved parameters and arrays. Words are looked up in
+        the arrays, without building a dictionary.
+
+        meta -- the parameters.
+        arrays -- the arrays.
+        """
+        hmm = cls.__new__(cls)
+        hmm.n = meta['n']
+        hmm.addone = meta['addone']
+        hmm._tables = None
+        hmm._tagger = None
+        hmm._tags = decode_strings(arrays['tags'])
+        hmm._tag_ids = {t: i for i, t in enumerate(hmm._tags)}
+        hmm._words = hmm._word_ids = SortedMap(arrays['words'])
+        for name in ['ngram_keys', 'ngram_counts', 'context_keys',
+                     'context_counts', 'out_keys', 'out_counts',
+                     'tag_counts']:
+            setattr(hmm, '_' + name, arrays[name])
+        hmm.tag_dict = None
+        if 'tag_dict' in meta:
+            hmm.tag_dict = TagDictionary.from_arrays(
+                meta['tag_dict'], subsections(arrays, 'tag_dict'))
+        hmm.unknown_model = None
+        if 'unknown_model' in meta:
+            hmm.unknown_model = UnknownWordModel.from_arrays(
+                meta['unknown_model'], subsections(arrays, 'unknown_model'))
+        return hmm
+
+
+class ViterbiTagger:
+
+    # maximum size of the score arrays of a batch (see tag_sents()).
+    batch_cells = 2 ** 22
+
+    def __init__(self, hmm, beam=None, threshold=None, tag_dict=None):
+        """
+        hmm -- the HMM.
+        beam -- keep only this many best contexts at each position
+            (optional).
+        threshold -- keep only the contexts whose log-probability is within
+            this distance of the best one at each position (optional).
+        tag_dict -- TagDictionary with the candidate tags of each word
+            (default: the one of the HMM, if any). Use False to decode
+            without one even if the HMM has it.
+
+        With beam or threshold, decoding is approximate but only the kept
+        contexts are expanded, which is much faster for high order models.
+        With a tag dictionary, each word is only tagged with its candidate
+        tags, so the cost depends on the tag ambiguity of the words.
+        """
+        self.hmm = hmm
+        self.beam = beam
+        self.threshold = threshold
+        if tag_dict is None:
+            tag_dict = getattr(hmm, 'tag_dict', None)
+        elif tag_dict is False:
+            tag_dict = None
+        self.tag_dict = tag_dict
+        # chart of the last sentence tagged with tag(), see _pi.
+        self._chart = None
+
+    def sparse(self):
+        """Whether decoding only expands some contexts at each position
+        (with pruning or a tag dictionary) instead of all of them. Never
+        for unigram models, which have a single context and restrict the
+        tags to the candidates of each word in the dense decoding.
+        """
+        sparse = (bool(self.beam) or self.threshold is not None or
+                  self.tag_dict is not None)
+        return sparse and self.hmm.n > 1
+
+    def tag(self, sent):
+        """Returns the most probable tagging for a sentence.
+
+        sent -- the sentence.
+        """
+        if self.sparse():
+            y, _ = self._sparse_viterbi(sent, chart=True)
+            return y
+        taggings, _ = self._viterbi([sent], chart=True)
+        return taggings[0]
+
+    def tag_sents(self, sents, log_probs=False):
+        """Returns the most probable taggings for a list of sentences.
+
+        The sentences are bucketed by length, and each bucket is decoded in
+        batches, running Viterbi over all the sentences of a batch at once.
+        With pruning or a tag dictionary (see sparse()) the kept contexts
+        differ from sentence to sentence, so they are decoded one at a time.
+
+        sents -- the sentences.
+        log_probs -- whether to return pairs (tagging, log-probability)
+            instead of just the taggings.
+        """
+        sents = [list(sent) for sent in sents]
+        result = [None] * len(sents)
+        if self.sparse():
+            for i, sent in enumerate(sents):
+                y, lp = self._sparse_viterbi(sent)
+                result[i] = (y, float(lp)) if log_probs else y
+            return result
+
+        tables = self.hmm.tables()
+        K = len(tables.tags)
+        batch_size = max(1, self.batch_cells // (K ** tables.n))
+
+        buckets = defaultdict(list)
+        for i, sent in enumerate(sents):
+            buckets[len(sent)].append(i)
+
+        for bucket in buckets.values():
+            for j in range(0, len(bucket), batch_size):
+                batch = bucket[j:j + batch_size]
+                taggings, lps = self._viterbi([sents[i] for i in batch])
+                for i, y, lp in zip(batch, taggings, lps):
+                    result[i] = (y, float(lp)) if log_probs else y
+        return result
+
+    def _viterbi(self, sents, chart=False):
+        # best taggings of sentences of the same length, and their
+        # log-probabilities. arrays have the batch as the first axis.
+        tables = self.hmm.tables()
+        n, tags, K = tables.n, tables.tags, len(tables.tags)
+        trans, end = tables.trans[:, :K], tables.trans[:, K]
+        B, m = len(sents), len(sents[0])
+        rows = np.array([tables.word_rows(sent) for sent in sents])
+        out = tables.out[rows.reshape(B, m)]
+
+        if n == 1:
+            # no context: each position is independent.
+            scores = trans[0] + out
+            if self.tag_dict is not None:
+                # only the candidate tags of each word.
+                allowed = np.zeros(scores.shape, dtype=bool)
+                for b, sent in enumerate(sents):
+                    for k, ts in enumerate(self.candidates(sent)):
+                        allowed[b, k, ts] = True
+                scores = np.where(allowed, scores, -np.inf)
+            best = scores.argmax(axis=2)
+            lps = np.take_along_axis(scores, best[:, :, None], axis=2)[:, :, 0]
+            if chart:
+                pis = [np.zeros(1)] + list(np.cumsum(lps[0])[:, None])
+                self._chart = (pis, list(best[0][:, None]))
+            lps = lps.sum(axis=1) + end[0]
+            taggings = [[tags[t] for t in y] if lp > -np.inf
+                        else self._no_tagging(sent)
+                        for y, lp, sent in zip(best, lps, sents)]
+            return taggings, lps
+
+        C = K ** (n - 1)
+        S = C // K
+        pi = np.full((B, C), -np.inf)
+        pi[:, 0] = 0.0
+        pis, bps = [pi[0]], []
+        for k in range(m):
+            # scores[b, a, s, t]: from context (a, *s) to context (*s, t).
+            scores = (pi[:, :, None] + trans + out[:, k, None, :])
+            scores = scores.reshape(B, K, S, K)
+            bp = scores.argmax(axis=1)
+            pi = np.take_along_axis(scores, bp[:, None], axis=1).reshape(B, C)
+            bp = bp.reshape(B, C)
+            bps.append(bp)
+            if chart:
+                pis.append(pi[0])
+        if chart:
+            self._chart = (pis, [bp[0] for bp in bps])
+
+        final = pi + end
+        c = final.argmax(axis=1)
+        lps = final[np.arange(B), c]
+        # backtrack all the batch at once.
+        ys = np.empty((B, m), dtype=np.intp)
+        for j in range(m, 0, -1):
+            s, ys[:, j - 1] = np.divmod(c, K)
+            c = bps[j - 1][np.arange(B), c] * S + s
+        taggings = [[tags[t] for t in y] if lp > -np.inf
+                    else self._no_tagging(sent)
+                    for y, lp, sent in zip(ys, lps, sents)]
+        return taggings, lps
+
+    def _no_tagging(self, sent):
+        # tagging returned when no tagging has positive probability, instead
+        # of a path through the start symbol '<s>' (tag 0).
+        return [self.hmm.tables().tags[1]] * len(sent)
+
+    def candidates(self, sent):
+        """Candidate tag ids for each word of a sentence, as arrays.
+
+        sent -- the sentence.
+        """
+        tables = self.hmm.tables()
+        alltags = np.arange(1, len(tables.tags))
+        if self.tag_dict is None:
+            return [alltags] * len(sent)
+        tag_ids = tables.tag_ids
+        result = []
+        for w in sent:
+            ids = [tag_ids[t] for t in self.tag_dict.tags(w) if t in tag_ids]
+            result.append(np.array(ids) if ids else alltags)
+        return result
+
+    def _sparse_viterbi(self, sent, chart=False):
+        # best tagging of a sentence and its log-probability, expanding only
+        # the contexts kept at each position with the candidate tags.
+        tables = self.hmm.tables()
+        K = len(tables.tags)
+        S = K ** (tables.n - 2)
+        trans, end = tables.trans[:, :K], tables.trans[:, K]
+        out = tables.out[tables.word_rows(sent)]
+        candidates = self.candidates(sent)
+
+        # the kept contexts (sorted), their scores and their previous
+        # contexts.
+        ctxs = np.zeros(1, dtype=np.intp)
+        pi = np.zeros(1)
+        positions = [(ctxs, pi, ctxs)]
+        for k, ts in enumerate(candidates):
+            scores = pi[:, None] + trans[ctxs[:, None], ts] + out[k, ts]
+            targets = (ctxs % S)[:, None] * K + ts
+            scores, targets = scores.ravel(), targets.ravel()
+            # the best score for each target context is the first one.
+            order = np.argsort(-scores, kind='stable')
+            new_ctxs, first = np.unique(targets[order], return_index=True)
+            best = order[first]
+            pi, prevs = scores[best], ctxs[best // len(ts)]
+
+            keep = pi > -np.inf
+            if self.threshold is not None and keep.any():
+                keep &= pi >= pi.max() - self.threshold
+            if self.beam and keep.sum() > self.beam:
+                keep &= pi >= np.partition(pi, -self.beam)[-self.beam]
+            ctxs, pi, prevs = new_ctxs[keep], pi[keep], prevs[keep]
+            positions.append((ctxs, pi, prevs))
+
+        if chart:
+            self._chart = positions
+        if len(ctxs) == 0:
+            # everything was pruned: no tagging has positive probability.
+            return self._no_tagging(sent), float('-inf')
+        final = pi + end[ctxs]
+        i = int(final.argmax())
+        return self._sparse_backtrack(positions, i), final[i]
+
+    def _sparse_backtrack(self, positions, i):
+        # tags of the best path to the i-th kept context of the last position.
+        tags, K = self.hmm.tables().tags, len(self.hmm.tables().tags)
+        result = []
+        for j in range(len(positions) - 1, 0, -1):
+            ctxs, _, prevs = positions[j]
+            result.append(tags[ctxs[i] % K])
+            i = np.searchsorted(positions[j - 1][0], prevs[i])
+        result.reverse()
+        return result
+
+    def _backtrack(self, c, k):
+        # tags of the best path to context c at position k of the chart.
+        tables = self.hmm.tables()
+        K, tags = len(tables.tags), tables.tags
+        S = K ** (tables.n - 2)
+        pis, bps = self._chart
+        result = []
+        for j in range(k, 0, -1):
+            s, t = divmod(c, K)
+            result.append(tags[t])
+            c = int(bps[j - 1][c]) * S + s
+        result.reverse()
+        return result
+
+    @property
+    def _pi(self):
+        """Viterbi chart of the last sentence tagged with tag(), as a
+        dictionary from positions to dictionaries from contexts to pairs
+        (log-probability, tags) of the best path, for the reachable contexts
+        only.
+        """
+        tables = self.hmm.tables()
+        tags = tables.tags
+        if self.sparse():
+            positions = self._chart
+            return {
+                k: {tables.context(c): (float(pi[i]),
+                                        self._sparse_backtrack(
+                                            positions[:k + 1], i))
+                    for i, c in enumerate(ctxs)}
+                for k, (ctxs, pi, _) in enumerate(positions)
+            }
+
+        pis, bps = self._chart
+        result = {}
+        for k, pi in enumerate(pis):
+            if tables.n == 1:
+                path = [tags[int(bp[0])] for bp in bps[:k]]
+                result[k] = {(): (float(pi[0]), path)}
+                continue
+            result[k] = {
+                tables.context(c): (float(pi[c]), self._backtrack(c, k))
+                for c in np.flatnonzero(pi > -np.inf)
+            }
+        return result
+
+
+class ForwardBackward:
+    """Posterior tag probabilities of an HMM, with the forward-backward
+    algorithm over its tables (see HMMTables).
+
+    The recursions run on log2-probabilities with a log-sum-exp in place of
+    the max of Viterbi, so they do not underflow on long sentences and take
+    the same O(m K^n) time as exact Viterbi decoding.
+    """
+
+    def __init__(self, hmm):
+        """
+        hmm -- the HMM.
+        """
+        self.hmm = hmm
+        tables = hmm.tables()
+        # the tags of the columns of the posteriors (all but '<s>').
+        self.tags = tables.tags[1:]
+
+    def posteriors(self, sent):
+        """Returns an array (len(sent), len(self.tags)) with the posterior
+        probability of each tag at each position, and the log2-probability
+        of the sentence (summed over all the taggings). The posteriors are
+        all zero if the sentence has probability 0.
+
+        sent -- the sentence.
+        """
+        tables = self.hmm.tables()
+        n, K = tables.n, len(tables.tags)
+        trans, end = tables.trans[:, :K], tables.trans[:, K]
+        out = tables.out[tables.word_rows(list(sent))]
+        m = len(out)
+
+        if n == 1:
+            # no context: each position is independent.
+            scores = trans[0] + out
+            totals = _logsumexp2(scores, axis=1)
+            log_prob = float(totals.sum() + end[0])
+        else:
+            alphas = self._forward(trans, out)
+            log_prob = float(_logsumexp2(alphas[-1] + end, axis=0))
+        if log_prob == -np.inf:
+            return np.zeros((m, K - 1)), log_prob
+
+        if n == 1:
+            gammas = scores - totals[:, None]
+        else:
+            betas = self._backward(trans, end, out)
+            S = K ** (n - 2)
+            # the tag at position k is the last tag of the context at k + 1.
+            gammas = (alphas[1:] + betas[1:] - log_prob).reshape(m, S, K)
+            gammas = _logsumexp2(gammas, axis=1)
+        return np.exp2(gammas[:, 1:]), log_prob
+
+    def marginals(self, sent):
+        """Returns a list with a dictionary from tags to their posterior
+        probability for each position of a sentence.
+
+        sent -- the sentence.
+        """
+        probs, _ = self.posteriors(sent)
+        return [dict(zip(self.tags, row.tolist())) for row in probs]
+
+    def _forward(self, trans, out):
+        # alphas[k, c]: log2-probability of the words before position k,
+        # with context c at position k.
+        K = out.shape[1]
+        C = trans.shape[0]
+        S = C // K
+        alphas = np.full((len(out) + 1, C), -np.inf)
+        alphas[0, 0] = 0.0
+        for k in range(len(out)):
+            # scores[a, s, t]: from context (a, *s) to context (*s, t).
+            scores = (alphas[k][:, None] + trans + out[k]).reshape(K, S, K)
+            alphas[k + 1] = _logsumexp2(scores, axis=0).reshape(C)
+        return alphas
+
+    def _backward(self, trans, end, out):
+        # betas[k, c]: log2-probability of the words from position k on and
+        # of the end, given context c at position k.
+        K = out.shape[1]
+        C = trans.shape[0]
+        S = C // K
+        # next context of each context and tag.
+        nexts = (np.arange(C) % S)[:, None] * K + np.arange(K)
+        betas = np.empty((len(out) + 1, C))
+        betas[-1] = end
+        for k in range(len(out) - 1, -1, -1):
+            scores = trans + out[k] + betas[k + 1][nexts]
+            betas[k] = _logsumexp2(scores, axis=1)
+        return betas
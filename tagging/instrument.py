@@ -0,0 +1,163 @@
+"""Per-stage instrumentation of the tagging scripts.
+
+Each stage (loading the corpus, training, decoding, ...) records its wall
+time, CPU time (of this process and of its finished worker processes), peak
+memory and throughput, and may also be profiled with cProfile. The records
+are written as a JSON report.
+
+The peak memory of a stage is the peak resident memory of this process
+during the stage, measured by resetting the peak at the start of the stage.
+This is only possible on Linux, elsewhere it is None. The peaks over the
+whole lifetime of this process and of its children are also recorded.
+"""
+from contextlib import contextmanager
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+
+
+def lifetime_peak_rss():
+    """Peak resident memory in kilobytes of this process and of its waited
+    for children (e.g. worker processes), over their whole lifetime (for
+    this process, only until the last reset_peak_rss() on Linux).
+    """
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if sys.platform == 'darwin':
+        # bytes instead of kilobytes.
+        self_rss, children_rss = self_rss // 1024, children_rss // 1024
+    return self_rss, children_rss
+
+
+def reset_peak_rss():
+    """Reset the peak resident memory of this process to the current one.
+    Returns whether it could be reset (only on Linux).
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss():
+    """Peak resident memory in kilobytes of this process since the last
+    reset_peak_rss() (or since it started), or None if unknown.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def children_cpu_time():
+    """User and system CPU time of the waited for children of this
+    process.
+    """
+    t = os.times()
+    return t.children_user + t.children_system
+
+
+class Instrument:
+
+    def __init__(self, enabled=True, profile=(), profile_prefix='profile'):
+        """
+        enabled -- whether to record anything at all.
+        profile -- names of the stages to profile with cProfile.
+        profile_prefix -- the profile of a stage is dumped to
+            <profile_prefix>.<stage>.prof.
+        """
+        self.enabled = enabled
+        self.profile = set(profile)
+        self.profile_prefix = profile_prefix
+        self.stages = []
+        # resetting the peak memory also resets the one of getrusage(), so
+        # the lifetime peak is kept here.
+        self._lifetime_peak_rss = 0
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager that records a stage. It gives a dictionary where
+        the number of items processed can be set as 'items', to report the
+        throughput.
+
+        name -- the name of the stage.
+        """
+        record = {'name': name}
+        if not self.enabled:
+            yield record
+            return
+
+        profiler = None
+        if name in self.profile:
+            profiler = cProfile.Profile()
+        self._lifetime_peak_rss = max(self._lifetime_peak_rss,
+                                      peak_rss() or 0)
+        reset = reset_peak_rss()
+        wall, cpu = time.perf_counter(), time.process_time()
+        children_cpu = children_cpu_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler:
+                profiler.disable()
+            record['wall'] = time.perf_counter() - wall
+            record['cpu'] = time.process_time() - cpu
+            # only the workers that finished during the stage.
+            record['children_cpu'] = children_cpu_time() - children_cpu
+            peak = peak_rss()
+            record['peak_rss_kb'] = peak if reset else None
+            self._lifetime_peak_rss = max(self._lifetime_peak_rss, peak or 0)
+            self_rss, children_rss = lifetime_peak_rss()
+            record['lifetime_peak_rss_kb'] = max(self_rss,
+                                                 self._lifetime_peak_rss)
+            record['lifetime_children_peak_rss_kb'] = children_rss
+            if record.get('items') is not None and record['wall'] > 0:
+                record['items_per_sec'] = record['items'] / record['wall']
+            if profiler:
+                filename = '{}.{}.prof'.format(self.profile_prefix,
+                                               name.replace(' ', '_'))
+                profiler.dump_stats(filename)
+                record['profile'] = filename
+            self.stages.append(record)
+
+    def report(self):
+        """The report as a dictionary."""
+        return {'argv': sys.argv, 'stages': self.stages}
+
+    def save(self, filename):
+        """Write the report as JSON.
+
+        filename -- the report file.
+        """
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def print_summary(self, file=sys.stderr):
+        """Print a table with the recorded stages.
+
+        file -- where to print it (default: stderr).
+        """
+        def fmt(value, spec):
+            return '-' if value is None else format(value, spec)
+
+        header = '{:<20} {:>9} {:>9} {:>9} {:>9} {:>12}'
+        print(header.format('stage', 'wall s', 'cpu s', 'child s', 'peak MB',
+                            'items/sec'), file=file)
+        for r in self.stages:
+            peak = r['peak_rss_kb']
+            print(header.format(
+                r['name'], fmt(r['wall'], '.2f'), fmt(r['cpu'], '.2f'),
+                fmt(r['children_cpu'], '.2f'),
+                fmt(peak and peak / 1024, '.1f'),
+                fmt(r.get('items_per_sec'), '.0f')), file=file)
@@ -0,0 +1,422 @@
+from collections import deque
+from multiprocessing import Pool
+
+from scipy.sparse import vstack
+from sklearn.pipeline import Pipeline
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.svm import LinearSVC
+import numpy as np
+
+from tagging.features import (HistoryView, word_lower, word_istitle,
+                              word_isupper, word_isdigit, prev_tags,
+                              NPrevTags, HashedFeatures)
+from tagging.model_file import (encode_strings, decode_strings, SortedMap,
+                                sorted_strings, subsections, prefixed)
+from tagging.tagdict import TagDictionary
+
+
+classifiers = {
+    'maxent': LogisticRegression,
+    'mnb': MultinomialNB,
+    'svm': LinearSVC,
+    'sgd': SGDClassifier,
+}
+
+# parameters of the classifiers other than their defaults.
+classifier_params = {
+    # logistic regression, to have probabilities for the beam search.
+    'sgd': {'loss': 'log_loss', 'random_state': 0},
+}
+
+# number of training sentences whose features are extracted at once.
+SHARD_SIZE = 2000
+
+
+# the MEMM being trained, in each worker process (see MEMM.shards()).
+_memm = None
+
+
+def init_worker(memm):
+    global _memm
+    _memm = memm
+
+
+def shard_worker(tagged_sents):
+    return _memm.shard(tagged_sents)
+
+
+def memm_features(n):
+    """Word features and context features of a MEMM.
+
+    n -- order of the model.
+    """
+    word_features = [word_lower, word_istitle, word_isupper, word_isdigit]
+    context_features = [prev_tags]
+    context_features += [NPrevTags(i) for i in range(1, n)]
+    return word_features, context_features
+
+
+class MEMM:
+
+    def __init__(self, n, tagged_sents, clf='maxent', tag_dict=True, beam=5,
+                 processes=None, epochs=None):
+        """
+        n -- order of the model.
+        tagged_sents -- list of sentences, each one being a list of pairs.
+        clf -- classifier to use: 'maxent', 'mnb', 'svm' or 'sgd'.
+        tag_dict -- whether to restrict the tags of each word to the ones
+            of a tag dictionary built from the training sentences.
+        beam -- number of hypotheses kept at each position when tagging
+            (1 is greedy tagging).
+        processes -- number of worker processes to extract the features
+            with (optional).
+        epochs -- train the classifier incrementally with this many passes
+            over the data, with its partial_fit() (only 'mnb' and 'sgd').
+            The features are extracted again for each pass, so only a few
+            shards of the feature matrix are in memory at a time: one, or
+            up to twice the number of processes (optional).
+
+        Features are extracted in shards of SHARD_SIZE sentences, each one
+        a sparse block of the feature matrix (see shard()).
+        """
+        self.n = n
+        self.beam = beam
+        tagged_sents = list(tagged_sents)
+
+        word_features, context_features = memm_features(n)
+        vect = HashedFeatures(word_features, context_features)
+        classifier = classifiers[clf](**classifier_params.get(clf, {}))
+        self.pipeline = Pipeline([('vect', vect), ('clf', classifier)])
+
+        pool = None
+        if processes:
+            pool = Pool(processes, init_worker, (self,))
+        # shards extracted but not yet used, at most.
+        max_pending = 2 * processes if processes else None
+        try:
+            if epochs:
+                self._fit_incremental(tagged_sents, epochs, pool,
+                                      max_pending)
+            else:
+                self._fit(tagged_sents, pool, max_pending)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        self.tag_dict = TagDictionary(tagged_sents) if tag_dict else None
+        self._vocab = {w for sent in tagged_sents for w, _ in sent}
+
+    def shard(self, tagged_sents):
+        """Feature ids of the histories of some training sentences (see
+        HashedFeatures.history_ids()), and the array of their tags.
+
+        tagged_sents -- the sentences.
+        """
+        vect = self.pipeline.named_steps['vect']
+        ids = vect.history_ids(self.sents_histories(tagged_sents))
+        tags = np.array(list(self.sents_tags(tagged_sents)), dtype=object)
+        return ids, tags
+
+    def shards(self, tagged_sents, pool=None, max_pending=None):
+        """Iterator over the shards of the training sentences (see shard()),
+        in order.
+
+        tagged_sents -- the sentences.
+        pool -- pool of worker processes to extract the features with
+            (optional).
+        max_pending -- maximum number of shards extracted by the pool but
+            not yet consumed (default: 2).
+        """
+        shards = (tagged_sents[i:i + SHARD_SIZE]
+                  for i in range(0, len(tagged_sents), SHARD_SIZE))
+        if not pool:
+            yield from map(self.shard, shards)
+            return
+        # Pool.imap() submits all of its input at once and keeps the
+        # results until they are consumed, so the shards are submitted by
+        # hand to keep at most max_pending of them in memory.
+        max_pending = max_pending or 2
+        pending = deque()
+        for shard in shards:
+            pending.append(pool.apply_async(shard_worker, (shard,)))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def _fit(self, tagged_sents, pool, max_pending):
+        # fit the classifier on the whole feature matrix, stacked from the
+        # sparse blocks of the shards.
+        vect = self.pipeline.named_steps['vect']
+        shards = list(self.shards(tagged_sents, pool, max_pending))
+        ids = [ids for ids, _ in shards]
+        vect.columns_ = np.unique(np.concatenate(
+            [np.unique(block) for block in ids]))
+        X = vstack([vect.matrix(block) for block in ids], format='csr')
+        y = np.concatenate([tags for _, tags in shards])
+        del shards, ids
+        self.pipeline.named_steps['clf'].fit(X, y.astype(str))
+
+    def _fit_incremental(self, tagged_sents, epochs, pool, max_pending):
+        # a first pass to find the features and tags, then the classifier
+        # learns from one shard at a time.
+        vect = self.pipeline.named_steps['vect']
+        clf = self.pipeline.named_steps['clf']
+        columns, classes = np.zeros(0, np.int64), set()
+        for ids, tags in self.shards(tagged_sents, pool, max_pending):
+            columns = np.union1d(columns, ids)
+            classes.update(tags)
+        vect.columns_ = columns
+        classes = sorted(classes)
+        for _ in range(epochs):
+            for ids, tags in self.shards(tagged_sents, pool, max_pending):
+                clf.partial_fit(vect.matrix(ids), tags.astype(str), classes)
+
+    def sents_histories(self, tagged_sents):
+        """
+        Iterator over the histories of a corpus.
+
+        tagged_sents -- the corpus (a list of sentences)
+        """
+        for tagged_sent in tagged_sents:
+            yield from self.sent_histories(tagged_sent)
+
+    def sent_histories(self, tagged_sent):
+        """
+        Iterator over the histories of a tagged sentence.
+
+        tagged_sent -- the tagged sentence (a list of pairs (word, tag)).
+        """
+        n = self.n
+        sent = [w for w, _ in tagged_sent]
+        tags = ('<s>',) * (n - 1) + tuple(t for _, t in tagged_sent)
+        for i in range(len(sent)):
+            yield HistoryView(sent, tags, i, n)
+
+    def sents_tags(self, tagged_sents):
+        """
+        Iterator over the tags of a corpus.
+
+        tagged_sents -- the corpus (a list of sentences)
+        """
+        for tagged_sent in tagged_sents:
+            yield from self.sent_tags(tagged_sent)
+
+    def sent_tags(self, tagged_sent):
+        """
+        Iterator over the tags of a tagged sentence.
+
+        tagged_sent -- the tagged sentence (a list of pairs (word, tag)).
+        """
+        for _, t in tagged_sent:
+            yield t
+
+    def tag(self, sent):
+        """Tag a sentence.
+
+        sent -- the sentence.
+        """
+        return self.tag_sents([sent])[0]
+
+    def tag_sents(self, sents):
+        """Tag sentences with beam search, all of them in lockstep so that
+        each position needs a single classifier call for all the hypotheses
+        of all the sentences.
+
+        Hypotheses ending in the same n-1 tags are recombined as in Viterbi,
+        since they get the same scores from then on.
+
+        sents -- the sentences.
+        """
+        sents = [list(sent) for sent in sents]
+        vect = self.pipeline.named_steps['vect']
+        classes = [str(c) for c in self.pipeline.classes_]
+        word_ids = [vect.sent_ids(sent) for sent in sents]
+        # hypotheses of each sentence: (log score, previous n-1 tags, tags).
+        start = ('<s>',) * (self.n - 1)
+        beams = [[(0.0, start, ())] for _ in sents]
+
+        for i in range(max((len(sent) for sent in sents), default=0)):
+            active = [k for k, sent in enumerate(sents) if i < len(sent)]
+            rows, scored = [], []
+            for k in active:
+                candidates = self._candidates(sents[k][i])
+                if candidates is not None and len(candidates) == 1:
+                    # no need to ask the classifier.
+                    t = candidates[0]
+                    beams[k] = self._prune(
+                        (score, (context + (t,))[1:], tags + (t,))
+                        for score, context, tags in beams[k])
+                    continue
+                for _, context, _ in beams[k]:
+                    rows.append(list(word_ids[k][i]) +
+                                list(vect.context_ids(context)))
+                scored.append((k, candidates))
+            if not scored:
+                continue
+
+            log_scores = self._log_scores(vect.matrix(np.array(rows)))
+            row = 0
+            for k, candidates in scored:
+                beam = beams[k]
+                scores = log_scores[row:row + len(beam)]
+                row += len(beam)
+                if candidates is not None:
+                    allowed = np.isin(classes, candidates)
+                    if allowed.any():
+                        scores = np.where(allowed, scores, -np.inf)
+                totals = np.array([h[0] for h in beam])[:, None] + scores
+                beams[k] = self._prune(self._extend(beam, totals, classes))
+
+        return [list(beam[0][2]) for beam in beams]
+
+    def _extend(self, beam, totals, classes):
+        # hypotheses extended with each tag, sorted by score.
+        order = np.argsort(-totals, axis=None, kind='stable')
+        for j in order:
+            _, context, tags = beam[j // len(classes)]
+            t = classes[j % len(classes)]
+            yield totals.flat[j], (context + (t,))[1:], tags + (t,)
+
+    def _prune(self, hypotheses):
+        # keep the best hypothesis of each state, up to the beam size
+        # (hypotheses come sorted by score).
+        beam, seen = [], set()
+        for h in hypotheses:
+            if h[1] not in seen:
+                seen.add(h[1])
+                beam.append(h)
+                if len(beam) == self.beam:
+                    break
+        return beam
+
+    def _candidates(self, w):
+        # candidate tags of a word, or None if all tags are allowed.
+        if self.tag_dict is None:
+            return None
+        return self.tag_dict.tags(w)
+
+    def tag_history(self, h):
+        """Tag a history.
+
+        h -- the history.
+        """
+        if self.tag_dict is None:
+            return str(self.pipeline.predict([h])[0])
+
+        candidates = self.tag_dict.tags(h.sent[h.i])
+        if len(candidates) == 1:
+            # no need to ask the classifier.
+            return candidates[0]
+        scores = self.scores([h])[0]
+        classes = self.pipeline.classes_
+        allowed = np.isin(classes, candidates)
+        if allowed.any():
+            scores = np.where(allowed, scores, -np.inf)
+        return str(classes[scores.argmax()])
+
+    def scores(self, histories):
+        """Classifier scores of each tag (in the order of
+        self.pipeline.classes_) for a list of histories.
+
+        histories -- the histories.
+        """
+        X = self.pipeline.named_steps['vect'].transform(histories)
+        return self._scores(X)
+
+    def _scores(self, X):
+        clf = self.pipeline.named_steps['clf']
+        if hasattr(clf, 'predict_proba'):
+            return clf.predict_proba(X)
+        scores = clf.decision_function(X)
+        if scores.ndim == 1:
+            # binary classifier: score of the second class only.
+            scores = np.stack([-scores, scores], axis=1)
+        return scores
+
+    def _log_scores(self, X):
+        # additive scores: log-probabilities, or the decision function of
+        # classifiers without probabilities.
+        scores = self._scores(X)
+        if hasattr(self.pipeline.named_steps['clf'], 'predict_proba'):
+            with np.errstate(divide='ignore'):
+                scores = np.log(scores)
+        return scores
+
+    def unknown(self, w):
+        """Check if a word is unknown for the model.
+
+        w -- the word.
+        """
+        return w not in self._vocab
+
+    def to_arrays(self):
+        """Parameters and arrays to save the model (see tagging.model_file).
+        The classifier is saved as its parameters and fitted attributes.
+        """
+        vect = self.pipeline.named_steps['vect']
+        clf = self.pipeline.named_steps['clf']
+        names = {cls: name for name, cls in classifiers.items()}
+        fitted, arrays = {}, {}
+        for k, v in vars(clf).items():
+            if not k.endswith('_') or k.startswith('_'):
+                continue
+            if k == 'classes_':
+                arrays['clf.classes_'] = encode_strings([str(c) for c in v])
+            elif isinstance(v, np.ndarray):
+                arrays['clf.' + k] = v
+            elif isinstance(v, (int, float, np.generic)):
+                fitted[k] = v.item() if isinstance(v, np.generic) else v
+            else:
+                raise ValueError('cannot save attribute {} of {}'.format(
+                    k, type(clf).__name__))
+        meta = {
+            'n': self.n,
+            'beam': self.beam,
+            'n_features': vect.n_features,
+            'cache_size': vect.cache_size,
+            'clf': names[type(clf)],
+            'clf_params': clf.get_params(),
+            'clf_fitted': fitted,
+        }
+        arrays['columns'] = vect.columns_
+        if isinstance(self._vocab, SortedMap):
+            arrays['vocab'] = self._vocab.keys
+        else:
+            arrays['vocab'] = sorted_strings(sorted(self._vocab))
+        if self.tag_dict is not None:
+            meta['tag_dict'], tag_dict = self.tag_dict.to_arrays()
+            arrays.update(prefixed(tag_dict, 'tag_dict'))
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """Model from saved parameters and arrays. The classifier weights
+        are used from the arrays, without copying them.
+
+        meta -- the parameters.
+        arrays -- the arrays.
+        """
+        memm = cls.__new__(cls)
+        n = memm.n = meta['n']
+        memm.beam = meta['beam']
+        word_features, context_features = memm_features(n)
+        vect = HashedFeatures(word_features, context_features,
+                              meta['n_features'], meta['cache_size'])
+        vect.columns_ = arrays['columns']
+        clf = classifiers[meta['clf']](**meta['clf_params'])
+        for k, v in subsections(arrays, 'clf').items():
+            setattr(clf, k, v)
+        clf.classes_ = np.array(decode_strings(arrays['clf.classes_']))
+        for k, v in meta['clf_fitted'].items():
+            setattr(clf, k, v)
+        memm.pipeline = Pipeline([('vect', vect), ('clf', clf)])
+
+        memm.tag_dict = None
+        if 'tag_dict' in meta:
+            memm.tag_dict = TagDictionary.from_arrays(
+                meta['tag_dict'], subsections(arrays, 'tag_dict'))
+        memm._vocab = SortedMap(arrays['vocab'])
+        return memm
@@ -0,0 +1,363 @@
+"""Versioned binary model files.
+
+A model file has a small JSON header followed by raw array sections:
+
+- the magic string MAGIC and the header length (uint64, little endian),
+- the JSON header: the kind of model, the format version, the scalar
+  parameters of the model (meta) and the dtype, shape and offset of every
+  section,
+- the sections, each aligned to ALIGN bytes.
+
+Loading maps the file and wraps each section in a read-only numpy array
+without copying or parsing it, so loading costs the same for any model
+size. Strings (vocabularies, tag sets) are stored as sorted arrays of utf-8
+encoded bytes, and are looked up by binary search instead of being turned
+back into dictionaries (see SortedMap).
+"""
+import json
+import mmap
+import os
+import pickle
+import struct
+
+import numpy as np
+
+
+MAGIC = b'TAGMODEL'
+# bump this whenever the layout changes.
+VERSION = 2
+ALIGN = 64
+
+
+def encode_strings(strings):
+    """Array of utf-8 encoded strings.
+
+    strings -- the strings.
+    """
+    encoded = [s.encode('utf-8') for s in strings]
+    width = max((len(b) for b in encoded), default=0)
+    return np.array(encoded, dtype='S{}'.format(max(width, 1)))
+
+
+def decode_strings(array):
+    """List of strings of an array of utf-8 encoded strings.
+
+    array -- the array.
+    """
+    return [b.decode('utf-8') for b in array.tolist()]
+
+
+def sorted_strings(strings):
+    """Check that strings are sorted as their utf-8 encodings (i.e. by code
+    point, as sorted() does), and encode them.
+
+    strings -- the strings.
+    """
+    array = encode_strings(strings)
+    if not (array[1:] > array[:-1]).all():
+        raise ValueError('strings must be sorted and unique')
+    return array
+
+
+class SortedMap:
+    """Read-only mapping over a sorted array of utf-8 encoded string keys,
+    with binary search lookups. Values are the indices of the keys, or the
+    items of a values array aligned with them.
+    """
+
+    def __init__(self, keys, values=None, key=None):
+        """
+        keys -- sorted array of utf-8 encoded keys (see sorted_strings()).
+        values -- array of values (default: the indices of the keys).
+        key -- function turning a key into its string (default: identity).
+        """
+        self.keys = keys
+        self.values = values
+        self.key = key
+
+    def index(self, k):
+        """Index of a key in the keys array, or None if not present.
+
+        k -- the key.
+        """
+        if self.key is not None:
+            k = self.key(k)
+        b = k.encode('utf-8')
+        keys = self.keys
+        i = int(np.searchsorted(keys, b))
+        if i < len(keys) and keys[i] == b:
+            return i
+        return None
+
+    def value(self, i):
+        """Value at an index.
+
+        i -- the index.
+        """
+        return i if self.values is None else self.values[i].item()
+
+    def get(self, k, default=None):
+        i = self.index(k)
+        return default if i is None else self.value(i)
+
+    def __getitem__(self, k):
+        i = self.index(k)
+        if i is None:
+            raise KeyError(k)
+        return self.value(i)
+
+    def __contains__(self, k):
+        return self.index(k) is not None
+
+    def lookup(self, ks, default):
+        """Array with the values of many keys at once, default for missing
+        ones.
+
+        ks -- list of keys.
+        default -- value of missing keys.
+        """
+        if self.key is not None:
+            ks = [self.key(k) for k in ks]
+        keys = self.keys
+        if not len(ks) or not len(keys):
+            return np.full(len(ks), default, dtype=np.int64)
+        encoded = encode_strings(ks)
+        i = np.searchsorted(keys, encoded)
+        i[i == len(keys)] = 0
+        found = keys[i] == encoded
+        values = i if self.values is None else self.values[i]
+        return np.where(found, values, default)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        for b in self.keys.tolist():
+            yield b.decode('utf-8')
+
+
+class RaggedMap(SortedMap):
+    """Read-only mapping from strings to tuples of labels, stored as sorted
+    keys, offsets into an array of label ids, and the labels.
+    """
+
+    def __init__(self, keys, offsets, ids, labels, key=None):
+        """
+        keys -- sorted array of utf-8 encoded keys.
+        offsets -- array with the start of the label ids of each key, and
+            the end of the last ones.
+        ids -- array of label ids.
+        labels -- list of labels.
+        key -- function turning a key into its string (default: identity).
+        """
+        super().__init__(keys, key=key)
+        self.offsets = offsets
+        self.ids = ids
+        self.labels = labels
+
+    def value(self, i):
+        labels = self.labels
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return tuple(labels[j] for j in self.ids[start:end].tolist())
+
+
+class RaggedList:
+    """Read-only sequence of tuples of labels, stored as offsets into an
+    array of label ids, and the labels (see RaggedMap).
+    """
+
+    def __init__(self, offsets, ids, labels):
+        """
+        offsets -- array with the start of the label ids of each item, and
+            the end of the last ones.
+        ids -- array of label ids.
+        labels -- list of labels.
+        """
+        self.offsets = offsets
+        self.ids = ids
+        self.labels = labels
+
+    def __getitem__(self, i):
+        labels = self.labels
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return tuple(labels[j] for j in self.ids[start:end].tolist())
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+def ragged_list_arrays(items, labels):
+    """Arrays of a list of tuples of labels (see RaggedList). Returns the
+    offsets and ids arrays.
+
+    items -- the list.
+    labels -- list of all the labels.
+    """
+    label_ids = {label: i for i, label in enumerate(labels)}
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(v) for v in items])
+    ids = np.array([label_ids[label] for v in items for label in v],
+                   dtype=np.int32)
+    return offsets, ids
+
+
+def ragged_arrays(mapping, labels, key=None):
+    """Arrays of a mapping from strings to tuples of labels (see
+    RaggedMap). Returns the keys, offsets and ids arrays.
+
+    mapping -- the dictionary.
+    labels -- list of all the labels.
+    key -- function turning a key into its string (default: identity).
+    """
+    label_ids = {label: i for i, label in enumerate(labels)}
+    items = sorted((key(k) if key else k, v) for k, v in mapping.items())
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(v) for _, v in items])
+    ids = np.array([label_ids[label] for _, v in items for label in v],
+                   dtype=np.int32)
+    return sorted_strings([k for k, _ in items]), offsets, ids
+
+
+def write(filename, kind, meta, arrays):
+    """Write a model file.
+
+    filename -- the model file.
+    kind -- the kind of model.
+    meta -- JSON serializable dictionary of parameters.
+    arrays -- dictionary of numpy arrays, the sections.
+    """
+    sections = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        sections[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+        }
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    header = json.dumps({
+        'kind': kind,
+        'version': VERSION,
+        'meta': meta,
+        'sections': sections,
+    }).encode('utf-8')
+    # sections start aligned after the header.
+    start = len(MAGIC) + 8 + len(header)
+    padding = -start % ALIGN
+
+    # write and rename, so readers never see a half-written model.
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header) + padding))
+        f.write(header)
+        f.write(b' ' * padding)
+        base = f.tell()
+        for name, array in arrays.items():
+            f.seek(base + sections[name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(base + offset)
+    os.replace(tmp_filename, filename)
+
+
+def is_model_file(filename):
+    """Check whether a file is a model file (and not, e.g., a pickle).
+
+    filename -- the file.
+    """
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read(filename):
+    """Map a model file. Returns the kind of model, the meta dictionary and
+    the dictionary of read-only arrays.
+
+    filename -- the model file.
+    """
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not a model file'.format(filename))
+        size, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(size).decode('utf-8'))
+        if header['version'] != VERSION:
+            raise ValueError('unsupported model version {}'.format(
+                header['version']))
+        base = f.tell()
+        f.seek(0, os.SEEK_END)
+        if f.tell() > base:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buf = b''
+
+    arrays = {}
+    for name, section in header['sections'].items():
+        dtype = np.dtype(section['dtype'])
+        shape = tuple(section['shape'])
+        count = int(np.prod(shape, dtype=np.int64))
+        if count == 0:
+            array = np.empty(shape, dtype)
+        else:
+            array = np.frombuffer(buf, dtype, count, base + section['offset'])
+        arrays[name] = array.reshape(shape)
+    return header['kind'], header['meta'], arrays
+
+
+def subsections(arrays, prefix):
+    """The sections of a component, whose names start with prefix + '.',
+    without the prefix.
+
+    arrays -- dictionary of arrays.
+    prefix -- the name of the component.
+    """
+    start = prefix + '.'
+    return {k[len(start):]: v for k, v in arrays.items()
+            if k.startswith(start)}
+
+
+def prefixed(arrays, prefix):
+    """Sections of a component, with the name of the component as a prefix.
+
+    arrays -- dictionary of arrays.
+    prefix -- the name of the component.
+    """
+    return {'{}.{}'.format(prefix, k): v for k, v in arrays.items()}
+
+
+def model_classes():
+    """The classes of each kind of model."""
+    # imported here, as the model modules use this one.
+    from tagging.baseline import BaselineTagger
+    from tagging.hmm import HMM, MLHMM
+    from tagging.memm import MEMM
+    return {
+        'baseline': BaselineTagger,
+        'hmm': HMM,
+        'mlhmm': MLHMM,
+        'memm': MEMM,
+    }
+
+
+def load_model(filename):
+    """Load a tagger from a model file, or from a pickle for older models.
+
+    filename -- the file.
+    """
+    if not is_model_file(filename):
+        with open(filename, 'rb') as f:
+            return pickle.load(f)
+    kind, meta, arrays = read(filename)
+    return model_classes()[kind].from_arrays(meta, arrays)
+
+
+def save_model(model, filename):
+    """Save a tagger to a model file.
+
+    model -- the tagger, with a to_arrays() method.
+    filename -- the file.
+    """
+    kinds = {cls: kind for kind, cls in model_classes().items()}
+    meta, arrays = model.to_arrays()
+    write(filename, kinds[type(model)], meta, arrays)
@@ -0,0 +1,71 @@
+"""Benchmark the accuracy and speed of the taggers.
+
+Usage:
+  benchmark.py [-m <taggers>] [-s <sizes>] [-t <sents>] [-y] [-o <file>]
+  benchmark.py -h | --help
+
+Trains each tagger on the first sentences of the AnCora training files
+(or of a synthetic corpus if AnCora is not available) and prints a table
+with the training time, model size, load time, tagging speed in tokens
+per second (in a batch and one sentence at a time) and accuracy.
+
+Options:
+  -m <taggers>      Comma separated taggers to compare
+                    [default: base,base-u,mlhmm2,mlhmm3-u,memm2].
+                    Also: mlhmm2-u, mlhmm3, memm3, memm2-sgd.
+  -s <sizes>        Comma separated numbers of training sentences
+                    [default: 1000,5000].
+  -t <sents>        Number of test sentences [default: 1000].
+  -y                Use a synthetic corpus even if AnCora is available.
+  -o <file>         Also write the results as JSON.
+  -h --help         Show this screen.
+"""
+from docopt import docopt
+import json
+import os
+import sys
+
+from corpus.ancora import SimpleAncoraCorpusReader
+from tagging.benchmark import taggers, synthetic_corpus, run, print_table
+
+
+ANCORA = 'ancora/ancora-2.0/'
+
+
+if __name__ == '__main__':
+    opts = docopt(__doc__)
+
+    names = opts['-m'].split(',')
+    unknown = [name for name in names if name not in taggers]
+    if unknown:
+        sys.exit('unknown taggers: {}'.format(', '.join(unknown)))
+    sizes = [int(s) for s in opts['-s'].split(',')]
+    n_test = int(opts['-t'])
+
+    if os.path.isdir(ANCORA) and not opts['-y']:
+        corpus = 'ancora'
+        files = 'CESS-CAST-(A|AA|P)/.*\\.tbf\\.xml'
+        reader = SimpleAncoraCorpusReader(ANCORA, files)
+        # only parse the sentences used.
+        train = list(reader.tagged_sents()[:max(sizes)])
+        reader = SimpleAncoraCorpusReader(ANCORA, '3LB-CAST/.*\\.tbf\\.xml')
+        test = list(reader.tagged_sents()[:n_test])
+    else:
+        corpus = 'synthetic'
+        sents = synthetic_corpus(max(sizes) + n_test)
+        train, test = sents[:max(sizes)], sents[max(sizes):]
+    print('corpus: {}, {} test sentences'.format(corpus, len(test)))
+
+    records = []
+    for size in sizes:
+        for name in names:
+            record = run(name, train[:size], test)
+            record['corpus'] = corpus
+            records.append(record)
+            print('.', end='', file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    print_table(records)
+
+    if opts['-o']:
+        with open(opts['-o'], 'w') as f:
+            json.dump({'argv': sys.argv, 'results': records}, f, indent=2)
@@ -1,18 +1,47 @@
 """Evaulate a tagger.
 
 Usage:
-  eval.py -i <file>
+  eval.py [-b <beams>] [-t <threshold>] [-j <processes>] [-c]
+          [-r <report> [-p]] -i <file>
   eval.py -h | --help
 
 Options:
-  -i <file>     Tagging model file.
-  -h --help     Show this screen.
+  -i <file>         Tagging model file.
+  -j <processes>    Split the sentences across this many worker processes.
+  -c                Show the accuracy of each tag and its most frequent
+                    confusions.
+  -r <report>       Write a JSON report with the wall time, CPU time, peak
+                    memory and throughput of each stage.
+  -p                Also profile the decoding with cProfile, dumped next to
+                    the report (only the main process is profiled).
+  -b <beams>        For HMM models, compare beam widths given as a comma
+                    separated list (0 is exact Viterbi), e.g. 0,50,10,5.
+                    Prints an accuracy versus speed report. The exact row
+                    uses neither -t nor the tag dictionary of the model.
+  -t <threshold>    For HMM models, prune contexts whose log-probability is
+                    this far from the best one (with -b 0, compared to
+                    exact Viterbi).
+  -h --help         Show this screen.
 """
+from collections import Counter, defaultdict
 from docopt import docopt
-import pickle
+from multiprocessing import Pool
+import os
 import sys
+import time
 
 from corpus.ancora import SimpleAncoraCorpusReader
+from tagging.hmm import ViterbiTagger
+from tagging.instrument import Instrument
+from tagging.model_file import load_model
+from tagging.util import tag_sents
+
+
+# number of sentences tagged at once by models that support batches.
+BATCH_SIZE = 500
+
+# minimum number of seconds between progress updates.
+PROGRESS_INTERVAL = 0.5
 
 
 def progress(msg, width=None):
@@ -23,38 +52,187 @@ def progress(msg, width=None):
     sys.stdout.flush()
 
 
+def score(model, batch):
+    """Tag a batch of tagged sentences with a model and score it.
+    Returns the number of sentences, the number of correct tags, the total
+    number of tags and a Counter of the (gold tag, model tag) pairs.
+
+    model -- the tagger.
+    batch -- the tagged sentences.
+    """
+    word_sents = [[w for w, _ in sent] for sent in batch]
+    model_tag_sents = tag_sents(model, word_sents)
+
+    hits, total = 0, 0
+    confusion = Counter()
+    for sent, model_tag_sent in zip(batch, model_tag_sents):
+        gold_tag_sent = [t for _, t in sent]
+        assert len(model_tag_sent) == len(gold_tag_sent)
+
+        confusion.update(zip(gold_tag_sent, model_tag_sent))
+        hits += sum(m == g for m, g in zip(model_tag_sent, gold_tag_sent))
+        total += len(sent)
+    return len(batch), hits, total, confusion
+
+
+# the tagger of each worker process (see evaluate()).
+_model = None
+
+
+def init_worker(model):
+    global _model
+    _model = model
+
+
+def score_worker(batch):
+    return score(_model, batch)
+
+
+def evaluate(model, sents, processes=None):
+    """Tag a list of tagged sentences with a model, printing the progress.
+    Returns the number of correct tags, the total number of tags and a
+    Counter of the (gold tag, model tag) pairs.
+
+    model -- the tagger.
+    sents -- the tagged sentences.
+    processes -- number of worker processes to split the sentences across
+        (optional).
+    """
+    n = len(sents)
+    size = BATCH_SIZE
+    if processes:
+        # several batches per worker, to balance the load.
+        size = max(1, min(size, -(-n // (processes * 4))))
+    batches = (list(sents[i:i + size]) for i in range(0, n, size))
+
+    pool = None
+    if processes:
+        pool = Pool(processes, initializer=init_worker, initargs=(model,))
+        results = pool.imap_unordered(score_worker, batches)
+    else:
+        results = (score(model, batch) for batch in batches)
+
+    done, hits, total = 0, 0, 0
+    confusion = Counter()
+    last = None
+    for batch_sents, batch_hits, batch_total, batch_confusion in results:
+        done += batch_sents
+        hits += batch_hits
+        total += batch_total
+        confusion.update(batch_confusion)
+
+        now = time.perf_counter()
+        if last is None or now - last >= PROGRESS_INTERVAL or done == n:
+            last = now
+            progress('{:3.1f}% ({:2.2f}%)'.format(
+                float(done) * 100 / n, float(hits) * 100 / max(total, 1)))
+    print('')
+
+    if pool:
+        pool.close()
+        pool.join()
+
+    return hits, total, confusion
+
+
+def print_confusion(confusion, top=3):
+    """Print the accuracy of each gold tag and its most frequent confusions.
+
+    confusion -- Counter of the (gold tag, model tag) pairs.
+    top -- number of confusions to show for each tag.
+    """
+    counts = Counter()
+    errors = defaultdict(Counter)
+    for (g, m), c in confusion.items():
+        counts[g] += c
+        if g != m:
+            errors[g][m] += c
+
+    print('{:>8} {:>8} {:>9}  {}'.format('tag', 'count', 'accuracy',
+                                         'confusions'))
+    for g, c in counts.most_common():
+        wrong = sum(errors[g].values())
+        confusions = ', '.join('{} ({})'.format(m, e)
+                               for m, e in errors[g].most_common(top))
+        print('{:>8} {:>8} {:8.2f}%  {}'.format(
+            g, c, float(c - wrong) * 100 / c, confusions).rstrip())
+
+
 if __name__ == '__main__':
     opts = docopt(__doc__)
 
+    beams = [int(b) for b in opts['-b'].split(',')] if opts['-b'] else []
+    processes = opts['-j'] and int(opts['-j'])
+    threshold = opts['-t'] and float(opts['-t'])
+    if not beams and threshold is not None:
+        beams = [0]
+
+    # decodings to compare: (name, beam, threshold), where the exact one is
+    # the reference, without any pruning or tag dictionary.
+    decoders = []
+    for beam in beams:
+        if beam:
+            decoders.append(('beam {}'.format(beam), beam, threshold))
+        else:
+            decoders.append(('exact', None, None))
+            if threshold is not None:
+                decoders.append(('threshold', None, threshold))
+
+    report = opts['-r']
+    decode_stages = ['decode {}'.format(name) for name, _, _ in decoders]
+    decode_stages = decode_stages or ['decode']
+    profile = decode_stages if opts['-p'] else []
+    prefix = report and os.path.splitext(report)[0]
+    instrument = Instrument(bool(report), profile, prefix)
+
     # load the model
-    filename = opts['-i']
-    f = open(filename, 'rb')
-    model = pickle.load(f)
-    f.close()
+    with instrument.stage('load model'):
+        model = load_model(opts['-i'])
 
     # load the data
-    files = '3LB-CAST/.*\.tbf\.xml'
-    corpus = SimpleAncoraCorpusReader('ancora/ancora-2.0/', files)
-    sents = list(corpus.tagged_sents())
+    with instrument.stage('load corpus') as stage:
+        files = '3LB-CAST/.*\.tbf\.xml'
+        corpus = SimpleAncoraCorpusReader('ancora/ancora-2.0/', files)
+        sents = corpus.tagged_sents()
+        stage['items'] = len(sents)
 
-    # tag
-    hits, total = 0, 0
-    n = len(sents)
-    for i, sent in enumerate(sents):
-        word_sent, gold_tag_sent = zip(*sent)
-
-        model_tag_sent = model.tag(word_sent)
-        assert len(model_tag_sent) == len(gold_tag_sent), i
+    if decoders:
+        results = []
+        for (name, beam, cutoff), stage_name in zip(decoders,
+                                                    decode_stages):
+            print('{}:'.format(name.capitalize()))
+            if name == 'exact':
+                tagger = ViterbiTagger(model, tag_dict=False)
+            else:
+                tagger = ViterbiTagger(model, beam=beam, threshold=cutoff)
+            start = time.perf_counter()
+            with instrument.stage(stage_name) as stage:
+                hits, total, confusion = evaluate(tagger, sents, processes)
+                stage['items'] = total
+            elapsed = time.perf_counter() - start
+            results.append((name, float(hits) / total, elapsed, total))
 
-        # global score
-        hits_sent = [m == g for m, g in zip(model_tag_sent, gold_tag_sent)]
-        hits += sum(hits_sent)
-        total += len(sent)
+        print('')
+        if getattr(model, 'tag_dict', None) is not None:
+            print('All but the exact decoding use the tag dictionary.')
+        print('{:>10} {:>9} {:>9} {:>11}'.format(
+            'decoding', 'accuracy', 'time', 'tokens/sec'))
+        for name, acc, elapsed, total in results:
+            print('{:>10} {:8.2f}% {:8.1f}s {:11.0f}'.format(
+                name, acc * 100, elapsed, total / elapsed))
+    else:
+        with instrument.stage('decode') as stage:
+            hits, total, confusion = evaluate(model, sents, processes)
+            stage['items'] = total
         acc = float(hits) / total
 
-        progress('{:3.1f}% ({:2.2f}%)'.format(float(i) * 100 / n, acc * 100))
+        print('Accuracy: {:2.2f}%'.format(acc * 100))
 
-    acc = float(hits) / total
+    if opts['-c']:
+        print('')
+        print_confusion(confusion)
 
-    print('')
-    print('Accuracy: {:2.2f}%'.format(acc * 100))
+    if report:
+        instrument.save(report)
+        print('')
+        instrument.print_summary()
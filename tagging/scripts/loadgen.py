@@ -0,0 +1,87 @@
+"""Generate load on a tagging server and report latency and throughput.
+
+Usage:
+  loadgen.py [-u <url>] [-c <clients>] [-n <requests>] [-s <sents>]
+             [-f <file>]
+  loadgen.py -h | --help
+
+Options:
+  -u <url>          URL of the tagging server
+                    [default: http://127.0.0.1:8000/tag].
+  -c <clients>      Number of concurrent clients [default: 8].
+  -n <requests>     Total number of requests [default: 1000].
+  -s <sents>        Sentences per request [default: 1].
+  -f <file>         File with a whitespace tokenized sentence per line to
+                    send (default: the AnCora evaluation sentences).
+  -h --help         Show this screen.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from docopt import docopt
+import itertools
+import json
+import time
+import urllib.request
+
+from corpus.ancora import SimpleAncoraCorpusReader
+
+
+def request(url, sents):
+    """Tag sentences with a server. Returns the tags and the latency in
+    seconds.
+
+    url -- the URL of the server.
+    sents -- the sentences.
+    """
+    data = json.dumps({'sents': sents}).encode('utf-8')
+    req = urllib.request.Request(
+        url, data, {'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req) as response:
+        tags = json.loads(response.read().decode('utf-8'))['tags']
+    return tags, time.perf_counter() - start
+
+
+def percentile(sorted_values, p):
+    """Percentile of a sorted list of values (nearest rank).
+
+    sorted_values -- the sorted values.
+    p -- the percentile, between 0 and 100.
+    """
+    i = max(0, min(len(sorted_values) - 1,
+                   int(round(p / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[i]
+
+
+if __name__ == '__main__':
+    opts = docopt(__doc__)
+
+    # load the sentences to send
+    if opts['-f']:
+        with open(opts['-f']) as f:
+            sents = [line.split() for line in f if line.strip()]
+    else:
+        files = r'3LB-CAST/.*\.tbf\.xml'
+        corpus = SimpleAncoraCorpusReader('ancora/ancora-2.0/', files)
+        sents = [list(sent) for sent in corpus.sents()]
+
+    url = opts['-u']
+    n, size = int(opts['-n']), int(opts['-s'])
+    cycle = itertools.cycle(sents)
+    requests = [[next(cycle) for _ in range(size)] for _ in range(n)]
+    tokens = sum(len(sent) for req in requests for sent in req)
+
+    # send them
+    start = time.perf_counter()
+    with ThreadPoolExecutor(int(opts['-c'])) as executor:
+        results = list(executor.map(lambda req: request(url, req), requests))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    print('requests:  {}'.format(n))
+    print('time:      {:.2f}s'.format(elapsed))
+    print('requests/sec: {:.1f}'.format(n / elapsed))
+    print('sents/sec:    {:.1f}'.format(n * size / elapsed))
+    print('tokens/sec:   {:.1f}'.format(tokens / elapsed))
+    print('latency (ms):')
+    for p in [50, 90, 99, 100]:
+        print('  p{:<4} {:8.2f}'.format(p, percentile(latencies, p) * 1000))
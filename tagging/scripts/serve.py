@@ -0,0 +1,40 @@
+"""Serve a tagger over HTTP.
+
+Usage:
+  serve.py -i <file> [-a <host>] [-p <port>] [-b <size>] [-w <ms>]
+           [-r <seconds>] [-v]
+  serve.py -h | --help
+
+Options:
+  -i <file>         Tagging model file, reloaded when it changes.
+  -a <host>         Address to listen on [default: 127.0.0.1].
+  -p <port>         Port to listen on [default: 8000].
+  -b <size>         Maximum number of sentences tagged at once [default: 256].
+  -w <ms>           Maximum milliseconds a request waits for others to be
+                    tagged with it [default: 5].
+  -r <seconds>      Seconds between checks of the model file [default: 1].
+  -v                Log every request.
+  -h --help         Show this screen.
+"""
+from docopt import docopt
+
+from tagging.server import TaggingServer
+
+
+if __name__ == '__main__':
+    opts = docopt(__doc__)
+
+    address = (opts['-a'], int(opts['-p']))
+    server = TaggingServer(address, opts['-i'],
+                           max_batch=int(opts['-b']),
+                           max_wait=float(opts['-w']) / 1000,
+                           interval=float(opts['-r']),
+                           verbose=opts['-v'])
+    print('Serving {} on http://{}:{}/tag'.format(
+        opts['-i'], *server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -17,7 +17,7 @@ if __name__ == '__main__':
 
     # load the data
     corpus = SimpleAncoraCorpusReader('ancora/ancora-2.0/')
-    sents = list(corpus.tagged_sents())
+    sents = corpus.tagged_sents()
 
     # compute the statistics
     print('sents: {}'.format(len(sents)))
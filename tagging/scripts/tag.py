@@ -0,0 +1,69 @@
+"""Tag raw text, writing the tags in CoNLL format.
+
+Usage:
+  tag.py -i <file> [-w] [-b <size>] [-j <processes>] [-o <output>]
+         [<input>...]
+  tag.py -h | --help
+
+Reads one whitespace tokenized sentence per line from the input files (or
+from the standard input if none or '-'), and writes a line with the
+position, word and tag of each token, and a blank line after each sentence.
+
+Options:
+  -i <file>         Tagging model file.
+  -w                Inputs are tweets, one per line, tokenized as
+                    TwitterCorpusReader does.
+  -b <size>         Sentences tagged at once [default: 1000].
+  -j <processes>    Tag batches in this many worker processes.
+  -o <output>       Output file [default: -].
+  -h --help         Show this screen.
+"""
+from docopt import docopt
+from itertools import chain
+import sys
+
+from corpus.twitter_corpus_reader import tweet_tokenizer
+from tagging.model_file import load_model
+from tagging.stream import read_sents, tag_stream, write_conll
+
+
+def input_sents(filename, tweets=False):
+    """Iterator over the sentences of an input file.
+
+    filename -- the file, or '-' for the standard input.
+    tweets -- whether the file has tweets, tokenized line by line as
+        TwitterCorpusReader does.
+    """
+    tokenize = tweet_tokenizer().tokenize if tweets else str.split
+    if filename == '-':
+        yield from read_sents(sys.stdin, tokenize)
+    else:
+        with open(filename, encoding='utf-8') as f:
+            yield from read_sents(f, tokenize)
+
+
+if __name__ == '__main__':
+    opts = docopt(__doc__)
+
+    filenames = opts['<input>'] or ['-']
+    sents = chain.from_iterable(input_sents(filename, opts['-w'])
+                                for filename in filenames)
+
+    processes = opts['-j'] and int(opts['-j'])
+    # with workers, each one loads the model itself.
+    model = None if processes else load_model(opts['-i'])
+    tagged_sents = tag_stream(sents, model, opts['-i'],
+                              batch_size=int(opts['-b']),
+                              processes=processes)
+
+    output = opts['-o']
+    f = sys.stdout if output == '-' else open(output, 'w', encoding='utf-8')
+    try:
+        for tagged_sent in tagged_sents:
+            write_conll(f, tagged_sent)
+    except BrokenPipeError:
+        # e.g. piped into head.
+        pass
+    finally:
+        if f is not sys.stdout:
+            f.close()
@@ -1,40 +1,89 @@
 """Train a sequence tagger.
 
 Usage:
-  train.py [-m <model>] -o <file>
+  train.py [-m <model>] [-n <n>] [-c <clf>] [-e <epochs>] [-u] [-d]
+           [-j <processes>] [-r <report> [-p]] -o <file>
   train.py -h | --help
 
 Options:
   -m <model>    Model to use [default: base]:
                   base: Baseline
-  -o <file>     Output model file.
+                  mlhmm: Maximum Likelihood Hidden Markov Model
+                  memm: Maximum Entropy Markov Model
+  -n <n>        Order of the model (for MLHMM and MEMM) [default: 3].
+  -c <clf>      Classifier (for MEMM) [default: maxent]:
+                  maxent: Logistic Regression
+                  mnb: Multinomial Naive Bayes
+                  svm: Linear Support Vector Machine
+                  sgd: Logistic Regression with Stochastic Gradient Descent
+  -e <epochs>   Train the classifier incrementally with this many passes
+                over the data, a shard at a time (for MEMM with mnb or
+                sgd).
+  -u            Model unknown words by suffix and shape (for Baseline and
+                MLHMM).
+  -d            Only tag each known word with the tags seen with it in
+                training (for MLHMM, always done by MEMM).
+  -j <processes>  Worker processes to count with (for MLHMM) or to extract
+                features with (for MEMM).
+  -o <file>     Output model file (see tagging.model_file).
+  -r <report>   Write a JSON report with the wall time, CPU time, peak memory
+                and throughput of each stage.
+  -p            Also profile the training with cProfile, dumped next to the
+                report.
   -h --help     Show this screen.
 """
 from docopt import docopt
-import pickle
+import os
 
 from corpus.ancora import SimpleAncoraCorpusReader
 from tagging.baseline import BaselineTagger
+from tagging.hmm import MLHMM
+from tagging.instrument import Instrument
+from tagging.memm import MEMM
+from tagging.model_file import save_model
 
 
 models = {
     'base': BaselineTagger,
+    'mlhmm': MLHMM,
+    'memm': MEMM,
 }
 
 
 if __name__ == '__main__':
     opts = docopt(__doc__)
 
+    report = opts['-r']
+    profile = ['train'] if opts['-p'] else []
+    prefix = report and os.path.splitext(report)[0]
+    instrument = Instrument(bool(report), profile, prefix)
+
     # load the data
-    files = 'CESS-CAST-(A|AA|P)/.*\.tbf\.xml'
-    corpus = SimpleAncoraCorpusReader('ancora/ancora-2.0/', files)
-    sents = list(corpus.tagged_sents())
+    with instrument.stage('load corpus') as stage:
+        files = 'CESS-CAST-(A|AA|P)/.*\.tbf\.xml'
+        corpus = SimpleAncoraCorpusReader('ancora/ancora-2.0/', files)
+        sents = list(corpus.tagged_sents())
+        stage['items'] = len(sents)
 
     # train the model
-    model = models[opts['-m']](sents)
+    with instrument.stage('train') as stage:
+        m = opts['-m']
+        processes = opts['-j'] and int(opts['-j'])
+        if m == 'mlhmm':
+            model = MLHMM(int(opts['-n']), sents, unknown_model=opts['-u'],
+                          tag_dict=opts['-d'], processes=processes)
+        elif m == 'memm':
+            epochs = opts['-e'] and int(opts['-e'])
+            model = MEMM(int(opts['-n']), sents, opts['-c'],
+                         processes=processes, epochs=epochs)
+        else:
+            model = models[m](sents, unknown_model=opts['-u'])
+        stage['items'] = sum(len(sent) for sent in sents)
 
     # save it
-    filename = opts['-o']
-    f = open(filename, 'wb')
-    pickle.dump(model, f)
-    f.close()
+    with instrument.stage('save'):
+        save_model(model, opts['-o'])
+
+    if report:
+        instrument.save(report)
+        instrument.print_summary()
@@ -0,0 +1,251 @@
+"""Long-running tagging service.
+
+A tagger is loaded once and serves tag requests over HTTP:
+
+  POST /tag     {"sents": [["El", "gato", ...], ...]}
+                -> {"tags": [["da0", "ncm", ...], ...]}
+  GET /status   -> the model file, number of reloads and requests.
+
+Requests are queued and tagged in micro-batches by a single decoding thread,
+so concurrent requests share one call to the batch decoder of the model
+(tag_sents()). The model file is watched, and a new model is loaded in the
+background and swapped in between batches, so no request is dropped. Write
+new models to a temporary file and rename them over the served one, so the
+server never sees a half-written file (a failed load keeps the old model).
+"""
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+from tagging.model_file import load_model
+from tagging.util import tag_sents
+
+
+class ModelWatcher:
+    """A model loaded from a file, reloaded when the file changes."""
+
+    def __init__(self, filename, interval=1.0, load=load_model):
+        """
+        filename -- the model file.
+        interval -- seconds between checks of the file (None to never
+            check, only on calls to check()).
+        load -- function to load a model from a file.
+        """
+        self.filename = filename
+        self.interval = interval
+        self.load = load
+        self.reloads = 0
+        self._stamp = self._file_stamp()
+        self.model = load(filename)
+        self._stop = threading.Event()
+        self._thread = None
+        if interval:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _file_stamp(self):
+        st = os.stat(self.filename)
+        return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def check(self):
+        """Reload the model if its file changed. Returns whether it was
+        reloaded.
+        """
+        try:
+            stamp = self._file_stamp()
+            if stamp == self._stamp:
+                return False
+            model = self.load(self.filename)
+        except Exception as e:
+            # keep serving the old model, and try again next time.
+            print('cannot reload {}: {}'.format(self.filename, e),
+                  file=sys.stderr)
+            return False
+        # a single assignment, so readers see either model.
+        self.model = model
+        self._stamp = stamp
+        self.reloads += 1
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def close(self):
+        """Stop watching the file."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+class MicroBatcher:
+    """Queue of tagging requests, tagged in batches by a single thread.
+
+    A batch is closed when it has max_batch sentences or when max_wait
+    seconds passed since its first request.
+    """
+
+    def __init__(self, tag_sents, max_batch=256, max_wait=0.005):
+        """
+        tag_sents -- function to tag a list of sentences.
+        max_batch -- maximum number of sentences of a batch.
+        max_wait -- maximum seconds to wait for more requests.
+        """
+        self.tag_sents = tag_sents
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, sents):
+        """Queue sentences to be tagged. Returns a Future of their tags.
+
+        sents -- the sentences.
+        """
+        future = Future()
+        self._queue.put((sents, future))
+        return future
+
+    def tag(self, sents, timeout=None):
+        """Tag sentences, waiting for their batch.
+
+        sents -- the sentences.
+        timeout -- maximum seconds to wait (optional).
+        """
+        return self.submit(sents).result(timeout)
+
+    def _next_batch(self):
+        # the requests of the next batch, and whether to stop after it.
+        item = self._queue.get()
+        if item is None:
+            return [], True
+        batch, size = [item], len(item[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+            size += len(item[0])
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            if not batch:
+                continue
+            sents = [sent for sents, _ in batch for sent in sents]
+            try:
+                tags = self.tag_sents(sents)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            start = 0
+            for sents, future in batch:
+                future.set_result(tags[start:start + len(sents)])
+                start += len(sents)
+
+    def close(self):
+        """Tag the queued requests and stop."""
+        self._queue.put(None)
+        self._thread.join()
+
+
+class TagRequestHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        if self.path != '/tag':
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+            sents = request['sents']
+            # sentences may also be given as whitespace tokenized strings.
+            sents = [s.split() if isinstance(s, str) else list(s)
+                     for s in sents]
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_error(400, str(e))
+            return
+        try:
+            tags = self.server.batcher.tag(sents)
+        except Exception as e:
+            self.send_error(500, str(e))
+            return
+        with self.server.lock:
+            self.server.requests += 1
+        self._send_json({'tags': tags})
+
+    def do_GET(self):
+        if self.path != '/status':
+            self.send_error(404)
+            return
+        watcher = self.server.watcher
+        self._send_json({
+            'model': watcher.filename,
+            'reloads': watcher.reloads,
+            'requests': self.server.requests,
+            'batches': self.server.batcher.batches,
+        })
+
+    def _send_json(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class TaggingServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+    # many clients connect at once, and a full backlog delays them by
+    # seconds.
+    request_queue_size = 1024
+
+    def __init__(self, address, filename, max_batch=256, max_wait=0.005,
+                 interval=1.0, verbose=False):
+        """
+        address -- pair (host, port) to listen on (port 0 for any).
+        filename -- the model file.
+        max_batch -- maximum number of sentences tagged at once.
+        max_wait -- maximum seconds a request waits for others to batch.
+        interval -- seconds between checks of the model file.
+        verbose -- whether to log every request.
+        """
+        self.watcher = ModelWatcher(filename, interval)
+        self.batcher = MicroBatcher(self._tag_sents, max_batch, max_wait)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.verbose = verbose
+        super().__init__(address, TagRequestHandler)
+
+    def _tag_sents(self, sents):
+        # the current model, read once for the whole batch.
+        return tag_sents(self.watcher.model, sents)
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+        self.watcher.close()
@@ -0,0 +1,107 @@
+"""Tagging of large inputs as a stream.
+
+Sentences are read lazily, tagged in batches and written as soon as their
+batch is done, so memory is bounded by the batch size whatever the size of
+the input. With worker processes, a bounded number of batches is in flight
+at once and the results are still written in input order.
+"""
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+from tagging.model_file import load_model
+from tagging.util import tag_sents
+
+
+def read_sents(lines, tokenize=str.split):
+    """Iterator over the sentences of text with one sentence per line.
+    Blank lines are skipped.
+
+    lines -- iterable of lines (e.g. a file).
+    tokenize -- function splitting a line into words (default: split on
+        whitespace).
+    """
+    for line in lines:
+        sent = tokenize(line)
+        if sent:
+            yield sent
+
+
+def batches(sents, size):
+    """Iterator over lists of up to size sentences.
+
+    sents -- iterable of sentences.
+    size -- the number of sentences of each batch.
+    """
+    sents = iter(sents)
+    batch = list(islice(sents, size))
+    while batch:
+        yield batch
+        batch = list(islice(sents, size))
+
+
+# the tagger of each worker process (see tag_stream()).
+_model = None
+
+
+def init_worker(filename):
+    global _model
+    # model files are memory mapped, so the workers share the pages.
+    _model = load_model(filename)
+
+
+def tag_worker(batch):
+    return tag_sents(_model, batch)
+
+
+def tag_stream(sents, model=None, filename=None, batch_size=1000,
+               processes=None, max_pending=None):
+    """Iterator over the tagged sentences (lists of pairs) of a stream of
+    sentences, in input order.
+
+    sents -- iterable of sentences.
+    model -- the tagger (required without processes).
+    filename -- the model file, loaded by each worker (required with
+        processes).
+    batch_size -- number of sentences tagged at once.
+    processes -- number of worker processes (optional).
+    max_pending -- maximum number of batches read but not yet written with
+        processes (default: twice the number of processes).
+    """
+    if not processes:
+        for batch in batches(sents, batch_size):
+            for sent, tags in zip(batch, tag_sents(model, batch)):
+                yield list(zip(sent, tags))
+        return
+
+    max_pending = max_pending or 2 * processes
+    # fail here on a bad model file, as the pool would restart workers
+    # failing to load it forever.
+    load_model(filename)
+    # Pool.imap() reads all of its input ahead, so the batches are
+    # submitted by hand to keep at most max_pending of them in memory.
+    with Pool(processes, init_worker, (filename,)) as pool:
+        pending = deque()
+        for batch in batches(sents, batch_size):
+            pending.append((batch, pool.apply_async(tag_worker, (batch,))))
+            if len(pending) >= max_pending:
+                yield from _tagged(*pending.popleft())
+        while pending:
+            yield from _tagged(*pending.popleft())
+
+
+def _tagged(batch, result):
+    for sent, tags in zip(batch, result.get()):
+        yield list(zip(sent, tags))
+
+
+def write_conll(f, tagged_sent):
+    """Write a tagged sentence in CoNLL format: a line with the position,
+    word and tag of each token, and a blank line after the sentence.
+
+    f -- the output file.
+    tagged_sent -- list of pairs (word, tag).
+    """
+    for i, (w, t) in enumerate(tagged_sent, 1):
+        f.write('{}\t{}\t{}\n'.format(i, w, t))
+    f.write('\n')
@@ -0,0 +1,96 @@
+from collections import defaultdict, Counter
+
+from tagging.model_file import (encode_strings, decode_strings, RaggedMap,
+                                ragged_arrays, RaggedList, ragged_list_arrays,
+                                subsections, prefixed)
+from tagging.unknown import MAX_SUFFIX, SuffixTrie
+
+
+class TagDictionary:
+    """Candidate tags of each word, used to restrict decoding.
+
+    Known words get the tags they were observed with in training. Unknown
+    words get the tags of the rare training words with the same shape and
+    the longest common suffix, so they only compete among plausible tags.
+    Shapes and suffixes are the nodes of a SuffixTrie, as in the unknown
+    word model (see tagging.unknown).
+    """
+
+    def __init__(self, tagged_sents, max_suffix=MAX_SUFFIX, rare=1):
+        """
+        tagged_sents -- training sentences, each one being a list of pairs.
+        max_suffix -- longest suffix used for unknown words.
+        rare -- words seen at most this many times are used to learn the
+            candidate tags of unknown words.
+        """
+        word_tags = defaultdict(set)
+        counts = Counter()
+        for sent in tagged_sents:
+            for w, t in sent:
+                word_tags[w].add(t)
+                counts[w] += 1
+        self.alltags = tuple(sorted({t for ts in word_tags.values()
+                                     for t in ts}))
+        self._tags = {w: tuple(sorted(ts)) for w, ts in word_tags.items()}
+
+        # candidate tags of each trie node of the rare words. the root, for
+        # unseen shapes, has all the tags.
+        self.trie = trie = SuffixTrie(max_suffix)
+        unknown = [set(self.alltags)]
+        for w, c in counts.items():
+            if c <= rare:
+                for node in trie.insert(w)[1:]:
+                    if node == len(unknown):
+                        unknown.append(set())
+                    unknown[node] |= word_tags[w]
+        self._unknown = [tuple(sorted(ts)) for ts in unknown]
+
+    def unknown(self, w):
+        """Check if a word is unknown for the dictionary.
+
+        w -- the word.
+        """
+        return w not in self._tags
+
+    def tags(self, w):
+        """Sorted tuple of the candidate tags of a word.
+
+        w -- the word.
+        """
+        tags = self._tags.get(w)
+        if tags is not None:
+            return tags
+        return self._unknown[self.trie.node(w)]
+
+    def to_arrays(self):
+        """Parameters and arrays to save the dictionary (see
+        tagging.model_file).
+        """
+        alltags = list(self.alltags)
+        keys, offsets, ids = ragged_arrays(self._tags, alltags)
+        arrays = {'alltags': encode_strings(alltags), 'words': keys,
+                  'offsets': offsets, 'ids': ids}
+        meta, trie = self.trie.to_arrays()
+        offsets, ids = ragged_list_arrays(self._unknown, alltags)
+        trie.update({'offsets': offsets, 'ids': ids})
+        arrays.update(prefixed(trie, 'unknown'))
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """Dictionary from saved parameters and arrays. Words are looked up
+        in the arrays, without building dictionaries.
+
+        meta -- the parameters.
+        arrays -- the arrays.
+        """
+        tag_dict = cls.__new__(cls)
+        alltags = tuple(decode_strings(arrays['alltags']))
+        tag_dict.alltags = alltags
+        tag_dict._tags = RaggedMap(arrays['words'], arrays['offsets'],
+                                   arrays['ids'], alltags)
+        unknown = subsections(arrays, 'unknown')
+        tag_dict.trie = SuffixTrie.from_arrays(meta, unknown)
+        tag_dict._unknown = RaggedList(unknown['offsets'], unknown['ids'],
+                                       alltags)
+        return tag_dict
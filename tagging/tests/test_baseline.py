@@ -42,3 +42,45 @@ class TestBaselineTagger(TestCase):
         unknown = {'perro', 'salame'}
         for w in unknown:
             self.assertTrue(baseline.unknown(w))
+
+    def test_tag_sents(self):
+        baseline = BaselineTagger(self.tagged_sents)
+
+        sents = [
+            'el gato come pescado .'.split(),
+            [],
+            'la perra come .'.split(),
+        ]
+        result = baseline.tag_sents(sents)
+
+        self.assertEqual(result, [baseline.tag(sent) for sent in sents])
+        self.assertEqual(result, [
+            'D N V N P'.split(),
+            [],
+            'D N V P'.split(),
+        ])
+
+    def test_most_frequent(self):
+        tagged_sents = self.tagged_sents + [
+            list(zip('come y calla'.split(), 'V C V'.split())),
+            list(zip('la come'.split(), 'D N'.split())),
+            list(zip('y y'.split(), 'C V'.split())),
+        ]
+        baseline = BaselineTagger(tagged_sents)
+
+        self.assertEqual(baseline.tag_word('come'), 'V')
+        # ties go to the first tag in alphabetical order.
+        self.assertEqual(baseline.tag_word('y'), 'C')
+        self.assertEqual(baseline.tag_word('calla'), 'V')
+
+    def test_unknown_model(self):
+        tagged_sents = self.tagged_sents + [
+            list(zip('el perro ladra .'.split(), 'D N V P'.split())),
+        ]
+        baseline = BaselineTagger(tagged_sents, unknown_model=True)
+
+        # most frequent tag: N, ending like ladra: V.
+        y = baseline.tag('el lobo cuadra .'.split())
+        self.assertEqual(y, 'D N V P'.split())
+        self.assertEqual(baseline.tag_word('cuadra'), 'V')
+        self.assertEqual(BaselineTagger(tagged_sents).tag_word('cuadra'), 'N')
@@ -0,0 +1,49 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase
+from io import StringIO
+
+from tagging.benchmark import synthetic_corpus, accuracy, run, print_table
+from tagging.baseline import BaselineTagger
+
+
+class TestBenchmark(TestCase):
+
+    def test_synthetic_corpus(self):
+        sents = synthetic_corpus(50, n_tags=5, n_words=100)
+
+        self.assertEqual(len(sents), 50)
+        self.assertEqual(sents, synthetic_corpus(50, n_tags=5, n_words=100))
+        tags = {t for sent in sents for _, t in sent}
+        self.assertLessEqual(tags, {'t{}'.format(i) for i in range(5)})
+        for sent in sents:
+            self.assertTrue(0 < len(sent) <= 40)
+
+    def test_accuracy(self):
+        train = [[('el', 'D'), ('gato', 'N')]]
+        test = [[('el', 'D'), ('gato', 'N'), ('perro', 'N')]]
+        model = BaselineTagger(train)
+
+        acc, unknown_acc = accuracy(model, test, [['D', 'N', 'D']])
+
+        self.assertAlmostEqual(acc, 2 / 3)
+        self.assertEqual(unknown_acc, 0.0)
+        self.assertEqual(accuracy(model, [], []), (None, None))
+
+    def test_run(self):
+        sents = synthetic_corpus(120, n_tags=5, n_words=200)
+        records = [run(name, sents[:100], sents[100:])
+                   for name in ['base', 'mlhmm2-u']]
+
+        for record in records:
+            self.assertEqual(record['train_sents'], 100)
+            self.assertGreater(record['model_bytes'], 0)
+            self.assertGreater(record['accuracy'], 0.5)
+            for k in ['train_time', 'load_time', 'batch_tokens_per_sec',
+                      'single_tokens_per_sec']:
+                self.assertGreater(record[k], 0)
+
+        f = StringIO()
+        print_table(records, f)
+        lines = f.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[2].startswith('mlhmm2-u'))
@@ -1,8 +1,12 @@
 # https://docs.python.org/3/library/unittest.html
 from unittest import TestCase
 
-from tagging.features import (History, word_lower, word_istitle, word_isupper,
-                              word_isdigit, prev_tags, NPrevTags, PrevWord)
+import pickle
+
+from tagging.features import (History, HistoryView, word_lower,
+                              word_istitle, word_isupper, word_isdigit,
+                              prev_tags, NPrevTags, PrevWord, HashedFeatures,
+                              word_columns)
 
 
 class TestHistory(TestCase):
@@ -17,6 +21,29 @@ class TestHistory(TestCase):
 
         self.assertNotEqual(h1, h3)
 
+    def test_view(self):
+        sent = 'el gato come pescado .'.split()
+        tags = ('<s>', '<s>', 'D', 'N', 'V', 'N', 'P')
+        views = [HistoryView(sent, tags, i, 3) for i in range(len(sent))]
+        histories = [History(sent, tags[i:i + 2], i)
+                     for i in range(len(sent))]
+
+        self.assertEqual(views, histories)
+        self.assertEqual(histories, views)
+        self.assertEqual(views[2].prev_tags, ('D', 'N'))
+        self.assertEqual(tuple(views[2]), histories[2])
+        self.assertNotEqual(views[0], histories[1])
+        self.assertNotEqual(views[0], 'el')
+        self.assertRaises(TypeError, hash, views[0])
+        # no per-history attributes besides the slots.
+        self.assertFalse(hasattr(views[0], '__dict__'))
+
+        features = [word_lower, word_istitle, prev_tags, NPrevTags(1),
+                    PrevWord(word_lower)]
+        for f in features:
+            self.assertEqual([f(h) for h in views],
+                             [f(h) for h in histories])
+
 
 class TestFeatures(TestCase):
 
@@ -199,3 +226,87 @@ class TestFeatures(TestCase):
         ]
         for h, v in feature_values:
             self.assertEqual(prev_word_istitle(h), v)
+
+
+class TestWordColumns(TestCase):
+
+    def test_word_columns(self):
+        sent = 'El GATO come 3 pescados .'.split()
+        features = [word_lower, word_istitle, word_isupper, word_isdigit,
+                    PrevWord(word_lower)]
+
+        columns = word_columns(features, sent)
+
+        # the same values as the features applied to each history.
+        for f, column in zip(features, columns):
+            values = [f(History(sent, (), i)) for i in range(len(sent))]
+            self.assertEqual(column, values)
+
+
+class TestHashedFeatures(TestCase):
+
+    def setUp(self):
+        self.vect = HashedFeatures([word_lower, word_istitle],
+                                   [prev_tags, NPrevTags(1)])
+        sent0 = 'El gato come pescado .'.split()
+        sent1 = 'La gata come salmón .'.split()
+        self.histories = [
+            History(sent0, ('<s>', '<s>'), 0),
+            History(sent0, ('<s>', 'D'), 1),
+            History(sent1, ('<s>', '<s>'), 0),
+            History(sent1, ('N', 'V'), 3),
+        ]
+
+    def test_unbatched_word_feature(self):
+        # cached by word, PrevWord would see the wrong neighbours.
+        with self.assertRaises(ValueError):
+            HashedFeatures([word_lower, PrevWord(word_lower)], [prev_tags])
+
+    def test_history_strings(self):
+        strings = self.vect.history_strings(self.histories[1])
+
+        self.assertEqual(set(strings), {
+            'w0=gato', 'w1=False',  # current word
+            'p0=el', 'p1=True',  # previous word
+            "c0=('<s>', 'D')", "c1=('D',)",  # previous tags
+        })
+
+        strings = self.vect.history_strings(self.histories[0])
+        self.assertIn('p0=BOS', strings)
+        self.assertIn('p1=BOS', strings)
+
+    def test_history_ids(self):
+        ids = self.vect.history_ids(self.histories)
+
+        self.assertEqual(ids.shape, (len(self.histories), 6))
+        for h, row in zip(self.histories, ids):
+            strings = self.vect.history_strings(h)
+            self.assertEqual(sorted(row),
+                             sorted(self.vect._hash(s) for s in strings))
+
+    def test_fit_transform(self):
+        X = self.vect.fit_transform(self.histories)
+
+        self.assertEqual(X.shape[0], len(self.histories))
+        self.assertEqual(X.shape[1], len(self.vect.columns_))
+        # every history has all its features.
+        self.assertTrue((X.sum(axis=1) == 6).all())
+        self.assertEqual((X != self.vect.transform(self.histories)).nnz, 0)
+
+    def test_unseen_features(self):
+        self.vect.fit(self.histories)
+
+        sent = 'perro ladra .'.split()
+        X = self.vect.transform([History(sent, ('X', 'Y'), 0)])
+
+        # only w1=False, p0=BOS and p1=BOS were seen in training.
+        self.assertEqual(X.shape, (1, len(self.vect.columns_)))
+        self.assertEqual(X.nnz, 3)
+
+    def test_pickle(self):
+        X = self.vect.fit_transform(self.histories)
+
+        vect = pickle.loads(pickle.dumps(self.vect))
+
+        self.assertEqual(vect._words, {})
+        self.assertEqual((X != vect.transform(self.histories)).nnz, 0)
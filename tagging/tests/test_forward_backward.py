@@ -0,0 +1,89 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase
+from math import log2
+from itertools import product
+import random
+
+import numpy as np
+
+from tagging.hmm import HMM, MLHMM, ForwardBackward
+
+
+class TestForwardBackward(TestCase):
+
+    def setUp(self):
+        self.tagged_sents = [
+            list(zip('el gato come pescado .'.split(),
+                 'D N V N P'.split())),
+            list(zip('la gata come salmón .'.split(),
+                 'D N V N P'.split())),
+            list(zip('el come come .'.split(),
+                 'D N V P'.split())),
+        ]
+
+    def brute_force(self, hmm, sent):
+        # posteriors and probability summing over all the taggings.
+        tags = sorted(hmm.tagset())
+        probs = np.zeros((len(sent), len(tags)))
+        for y in product(tags, repeat=len(sent)):
+            p = hmm.prob(sent, y)
+            for k, t in enumerate(y):
+                probs[k, tags.index(t)] += p
+        total = probs[0].sum() if len(sent) else 0.0
+        return probs / total, total
+
+    def test_posteriors(self):
+        sents = [
+            'el gato come pescado .'.split(),
+            'la come gato'.split(),
+            'el perro'.split(),
+        ]
+        for n in [1, 2, 3]:
+            hmm = MLHMM(n, self.tagged_sents)
+            fb = ForwardBackward(hmm)
+            self.assertEqual(fb.tags, sorted(hmm.tagset()))
+            for sent in sents:
+                probs, log_prob = fb.posteriors(sent)
+                expected, total = self.brute_force(hmm, sent)
+
+                self.assertAlmostEqual(log_prob, log2(total))
+                np.testing.assert_allclose(probs, expected, atol=1e-9)
+                np.testing.assert_allclose(probs.sum(axis=1), 1.0)
+
+    def test_marginals(self):
+        tagset = {'D', 'N', 'V'}
+        trans = {
+            ('<s>', '<s>'): {'D': 1.0},
+            ('<s>', 'D'): {'N': 1.0},
+            ('D', 'N'): {'V': 0.5, '</s>': 0.5},
+            ('N', 'V'): {'</s>': 1.0},
+        }
+        out = {
+            'D': {'the': 1.0},
+            'N': {'dog': 0.4, 'barks': 0.6},
+            'V': {'dog': 0.1, 'barks': 0.9},
+        }
+        hmm = HMM(3, tagset, trans, out)
+
+        marginals = ForwardBackward(hmm).marginals('the dog barks'.split())
+
+        self.assertEqual(marginals[0], {'D': 1.0, 'N': 0.0, 'V': 0.0})
+        self.assertEqual(marginals[1], {'D': 0.0, 'N': 1.0, 'V': 0.0})
+        self.assertEqual(marginals[2], {'D': 0.0, 'N': 0.0, 'V': 1.0})
+
+        # no tagging for this sentence.
+        probs, log_prob = hmm.posteriors('the dog the'.split())
+        self.assertEqual(log_prob, float('-inf'))
+        self.assertEqual(probs.tolist(), [[0.0] * 3] * 3)
+
+    def test_long_sentence(self):
+        random.seed(0)
+        words = [w for sent in self.tagged_sents for w, _ in sent]
+        sent = [random.choice(words) for _ in range(2000)]
+        hmm = MLHMM(3, self.tagged_sents)
+
+        probs, log_prob = hmm.posteriors(sent)
+
+        # far below the smallest float, but no underflow.
+        self.assertTrue(-np.inf < log_prob < -1100)
+        np.testing.assert_allclose(probs.sum(axis=1), 1.0)
@@ -0,0 +1,100 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase, skipUnless
+from multiprocessing import Pool
+import json
+import os
+import pstats
+import shutil
+import tempfile
+
+import numpy as np
+
+from tagging.instrument import Instrument, reset_peak_rss
+
+
+class TestInstrument(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_stage(self):
+        instrument = Instrument()
+
+        with instrument.stage('count') as stage:
+            stage['items'] = sum(1 for _ in range(10000))
+        with instrument.stage('nothing'):
+            pass
+
+        count, nothing = instrument.stages
+        self.assertEqual(count['name'], 'count')
+        self.assertEqual(count['items'], 10000)
+        self.assertGreater(count['items_per_sec'], 0)
+        for key in ['wall', 'cpu', 'children_cpu', 'peak_rss_kb',
+                    'lifetime_peak_rss_kb', 'lifetime_children_peak_rss_kb']:
+            self.assertIn(key, count)
+            self.assertIn(key, nothing)
+        self.assertNotIn('items_per_sec', nothing)
+
+    @skipUnless(reset_peak_rss(), 'the peak memory can not be reset')
+    def test_stage_peak_rss(self):
+        instrument = Instrument()
+
+        with instrument.stage('allocate'):
+            a = np.ones(2 ** 24)  # 128 MB
+            del a
+        with instrument.stage('nothing'):
+            pass
+
+        allocate, nothing = instrument.stages
+        mb = 1024
+        self.assertGreater(allocate['peak_rss_kb'] - nothing['peak_rss_kb'],
+                           100 * mb)
+        self.assertGreaterEqual(nothing['lifetime_peak_rss_kb'],
+                                allocate['peak_rss_kb'])
+
+    def test_children_cpu(self):
+        instrument = Instrument()
+
+        with instrument.stage('workers') as stage:
+            with Pool(2) as pool:
+                pool.map(busy, [10 ** 6] * 4)
+                pool.close()
+                pool.join()
+
+        stage, = instrument.stages
+        self.assertGreater(stage['children_cpu'], 0)
+
+    def test_disabled(self):
+        instrument = Instrument(enabled=False)
+
+        with instrument.stage('count') as stage:
+            stage['items'] = 10
+
+        self.assertEqual(instrument.stages, [])
+
+    def test_profile_and_save(self):
+        prefix = os.path.join(self.tempdir, 'report')
+        instrument = Instrument(profile=['decode'], profile_prefix=prefix)
+
+        with instrument.stage('load'):
+            pass
+        with instrument.stage('decode'):
+            sorted(range(1000), key=lambda x: -x)
+
+        filename = prefix + '.json'
+        instrument.save(filename)
+        with open(filename) as f:
+            report = json.load(f)
+
+        load, decode = report['stages']
+        self.assertNotIn('profile', load)
+        self.assertEqual(decode['profile'], prefix + '.decode.prof')
+        # a valid profile.
+        pstats.Stats(decode['profile'])
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
@@ -1,5 +1,8 @@
 # https://docs.python.org/3/library/unittest.html
 from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
 
 from tagging.features import History
 from tagging.memm import MEMM
@@ -111,3 +114,121 @@ class TestMEMM(TestCase):
 
         for model in models:
             self.assertEqual(model.tag(sent), result)
+
+    def test_tag_without_tag_dict(self):
+        models = [MEMM(i, self.tagged_sents, tag_dict=False)
+                  for i in [2, 3]]
+
+        sent = 'el gato come pescado .'.split()
+        result = 'D N V N P'.split()
+
+        for model in models:
+            self.assertEqual(model.tag(sent), result)
+
+    def test_tag_dict(self):
+        model = MEMM(3, self.tagged_sents)
+
+        self.assertEqual(model.tag_dict.tags('come'), ('V',))
+        # unknown words ending like gato and pescado.
+        sent = 'el perro come salmonado .'.split()
+        self.assertEqual(model.tag(sent), 'D N V N P'.split())
+
+    def test_tag_sents(self):
+        model = MEMM(3, self.tagged_sents)
+
+        sents = [
+            'el gato come pescado .'.split(),
+            'la gata'.split(),
+            [],
+            'el perro come salmonado .'.split(),
+        ]
+        result = model.tag_sents(sents)
+
+        self.assertEqual(result, [model.tag(sent) for sent in sents])
+        self.assertEqual(result[0], 'D N V N P'.split())
+        self.assertEqual(result[2], [])
+
+    def test_greedy(self):
+        model = MEMM(2, self.tagged_sents, tag_dict=False, beam=1)
+
+        sent = 'la gato come pescado salmón'.split()
+        prev_tags = ('<s>',)
+        result = []
+        for i in range(len(sent)):
+            t = model.tag_history(History(sent, prev_tags, i))
+            result.append(t)
+            prev_tags = (t,)
+
+        self.assertEqual(model.tag(sent), result)
+
+    def test_shards(self):
+        model = MEMM(3, self.tagged_sents)
+
+        ids, tags = model.shard(self.tagged_sents)
+
+        vect = model.pipeline.named_steps['vect']
+        histories = list(model.sents_histories(self.tagged_sents))
+        self.assertEqual(ids.tolist(), vect.history_ids(histories).tolist())
+        self.assertEqual(tags.tolist(),
+                         list(model.sents_tags(self.tagged_sents)))
+
+    def test_shards_pending(self):
+        model = MEMM(3, self.tagged_sents)
+        pool = CountingPool(model)
+
+        with patch('tagging.memm.SHARD_SIZE', 1):
+            shards = model.shards(self.tagged_sents * 5, pool, max_pending=3)
+            for (ids, tags), sent in zip(shards, self.tagged_sents * 5):
+                expected_ids, expected_tags = model.shard([sent])
+                self.assertEqual(ids.tolist(), expected_ids.tolist())
+                self.assertEqual(tags.tolist(), expected_tags.tolist())
+
+        self.assertEqual(pool.submitted, 10)
+        self.assertEqual(pool.max_pending, 3)
+
+    def test_processes(self):
+        sents = [[w for w, _ in sent] for sent in self.tagged_sents]
+        model = MEMM(3, self.tagged_sents)
+
+        with patch('tagging.memm.SHARD_SIZE', 1):
+            sharded = MEMM(3, self.tagged_sents, processes=2)
+
+        self.assertEqual(sharded.tag_sents(sents), model.tag_sents(sents))
+        np.testing.assert_allclose(
+            sharded.pipeline.named_steps['clf'].coef_,
+            model.pipeline.named_steps['clf'].coef_)
+
+    def test_incremental(self):
+        sents = [[w for w, _ in sent] for sent in self.tagged_sents]
+        for clf in ['sgd', 'mnb']:
+            with patch('tagging.memm.SHARD_SIZE', 1):
+                model = MEMM(3, self.tagged_sents, clf, epochs=20)
+
+            self.assertEqual(model.tag_sents(sents),
+                             [list(model.sents_tags([sent]))
+                              for sent in self.tagged_sents])
+
+
+class CountingPool:
+    """Pool running tasks in this process, counting the pending ones."""
+
+    def __init__(self, memm):
+        self.memm = memm
+        self.submitted = self.pending = self.max_pending = 0
+
+    def apply_async(self, func, args):
+        self.submitted += 1
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        return CountingResult(self, self.memm.shard(*args))
+
+
+class CountingResult:
+
+    def __init__(self, pool, value):
+        self.pool = pool
+        self.value = value
+
+    def get(self):
+        self.pool.pending -= 1
+        return self.value
@@ -169,3 +169,16 @@ class TestMLHMM(TestCase):
 
         for k in pi1.keys():
             self.assertEqual(pi1[k], pi2[k], k)
+
+    def test_no_tagging(self):
+        # the trigram (V, N, N) was never seen, so no tagging has positive
+        # probability.
+        hmm = MLHMM(3, self.tagged_sents, addone=False)
+        sent = 'el gato come pescado salmón .'.split()
+
+        for tagger in [ViterbiTagger(hmm), ViterbiTagger(hmm, beam=2)]:
+            [(y, lp)] = tagger.tag_sents([sent], log_probs=True)
+            self.assertEqual(lp, float('-inf'))
+            self.assertNotIn('<s>', y)
+            self.assertEqual(y, tagger.tag(sent))
+        self.assertNotIn('<s>', hmm.tag(sent))
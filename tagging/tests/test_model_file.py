@@ -0,0 +1,193 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+
+from tagging import model_file
+from tagging.model_file import (SortedMap, RaggedMap, ragged_arrays,
+                                RaggedList, ragged_list_arrays,
+                                sorted_strings, load_model, save_model)
+from tagging.baseline import BaselineTagger
+from tagging.hmm import HMM, MLHMM
+from tagging.memm import MEMM
+
+
+class TestSortedMap(TestCase):
+
+    def test_lookup(self):
+        words = sorted(['el', 'gato', 'come', 'salmón', 'ñandú'])
+        m = SortedMap(sorted_strings(words))
+
+        for i, w in enumerate(words):
+            self.assertIn(w, m)
+            self.assertEqual(m[w], i)
+        self.assertNotIn('perro', m)
+        self.assertNotIn('', m)
+        self.assertEqual(m.get('perro', -1), -1)
+        self.assertRaises(KeyError, lambda: m['perro'])
+        self.assertEqual(list(m), words)
+
+        rows = m.lookup(['gato', 'perro', 'ñandú', 'zzz'], len(words))
+        self.assertEqual(rows.tolist(), [m['gato'], 5, m['ñandú'], 5])
+
+    def test_unsorted(self):
+        self.assertRaises(ValueError, sorted_strings, ['b', 'a'])
+        self.assertRaises(ValueError, sorted_strings, ['a', 'a'])
+
+    def test_ragged(self):
+        mapping = {('x', 'o'): ('N', 'V'), ('X', ''): ('N',)}
+        labels = ['N', 'V']
+        key = '/'.join
+        keys, offsets, ids = ragged_arrays(mapping, labels, key)
+        m = RaggedMap(keys, offsets, ids, labels, key)
+
+        self.assertEqual(m[('x', 'o')], ('N', 'V'))
+        self.assertEqual(m[('X', '')], ('N',))
+        self.assertIsNone(m.get(('x', 'a')))
+
+        items = [('N', 'V'), (), ('V',)]
+        offsets, ids = ragged_list_arrays(items, labels)
+        self.assertEqual(list(RaggedList(offsets, ids, labels)), items)
+
+
+class TestModelFile(TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dirname, 'model')
+        self.tagged_sents = [
+            list(zip('el gato come pescado .'.split(),
+                 'D N V N P'.split())),
+            list(zip('la gata come salmón .'.split(),
+                 'D N V N P'.split())),
+            list(zip('el perro ladra .'.split(),
+                 'D N V P'.split())),
+        ]
+        self.sents = [
+            'el gato come pescado .'.split(),
+            'la perra come salame .'.split(),
+            'el ñandú corre .'.split(),
+            [],
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def round_trip(self, model):
+        save_model(model, self.filename)
+        self.assertTrue(model_file.is_model_file(self.filename))
+        loaded = load_model(self.filename)
+        self.assertIs(type(loaded), type(model))
+        self.assertEqual(loaded.tag_sents(self.sents),
+                         model.tag_sents(self.sents))
+        for sent in self.sents:
+            self.assertEqual(loaded.tag(sent), model.tag(sent))
+            for w in sent:
+                self.assertEqual(loaded.unknown(w), model.unknown(w))
+        return loaded
+
+    def test_write_read(self):
+        arrays = {
+            'a': np.arange(10, dtype=np.int32),
+            'b': np.ones((3, 4)),
+            'empty': np.zeros(0),
+        }
+        model_file.write(self.filename, 'test', {'x': 1}, dict(arrays))
+
+        kind, meta, loaded = model_file.read(self.filename)
+
+        self.assertEqual(kind, 'test')
+        self.assertEqual(meta, {'x': 1})
+        self.assertEqual(set(loaded), set(arrays))
+        for name, array in arrays.items():
+            self.assertEqual(loaded[name].dtype, array.dtype)
+            np.testing.assert_array_equal(loaded[name], array)
+        # mapped, not copied.
+        self.assertFalse(loaded['b'].flags.writeable)
+
+    def test_baseline(self):
+        model = BaselineTagger(self.tagged_sents)
+        self.round_trip(model)
+
+        model = BaselineTagger(self.tagged_sents, unknown_model=True)
+        loaded = self.round_trip(model)
+        self.assertEqual(loaded.tag_word('ñandú'), model.tag_word('ñandú'))
+
+    def test_hmm(self):
+        tagset = {'D', 'N', 'V'}
+        trans = {
+            ('<s>', '<s>'): {'D': 1.0},
+            ('<s>', 'D'): {'N': 1.0},
+            ('D', 'N'): {'V': 1.0},
+            ('N', 'V'): {'N': 1.0},
+            ('V', 'N'): {'</s>': 1.0},
+        }
+        out = {
+            'D': {'el': 1.0},
+            'N': {'gato': 0.5, 'pescado': 0.5},
+            'V': {'come': 1.0},
+        }
+        model = HMM(3, tagset, trans, out)
+        save_model(model, self.filename)
+        loaded = load_model(self.filename)
+
+        x = 'el gato come pescado'.split()
+        y = 'D N V N'.split()
+        self.assertEqual(loaded.tag(x), model.tag(x))
+        self.assertEqual(loaded.tagset(), tagset)
+        self.assertAlmostEqual(loaded.prob(x, y), model.prob(x, y))
+        self.assertAlmostEqual(loaded.trans_prob('N', ('<s>', 'D')), 1.0)
+        self.assertAlmostEqual(loaded.out_prob('gato', 'N'), 0.5)
+        self.assertEqual(loaded.out_prob('perro', 'N'), 0.0)
+
+        # and again, from the loaded model.
+        save_model(loaded, self.filename)
+        self.assertEqual(load_model(self.filename).tag(x), model.tag(x))
+
+    def test_mlhmm(self):
+        for addone in [True, False]:
+            model = MLHMM(2, self.tagged_sents, addone=addone)
+            loaded = self.round_trip(model)
+            for prev in ['<s>', 'D', 'N', 'V']:
+                for t in ['D', 'N', 'V', '</s>']:
+                    self.assertAlmostEqual(loaded.trans_prob(t, (prev,)),
+                                           model.trans_prob(t, (prev,)))
+
+        model = MLHMM(3, self.tagged_sents, tag_dict=True,
+                      unknown_model=True)
+        loaded = self.round_trip(model)
+        self.assertAlmostEqual(loaded.out_prob('perra', 'N'),
+                               model.out_prob('perra', 'N'))
+        self.assertEqual(loaded.tag_dict.tags('perra'),
+                         model.tag_dict.tags('perra'))
+
+    def test_memm(self):
+        for clf in ['maxent', 'mnb', 'svm']:
+            model = MEMM(2, self.tagged_sents, clf)
+            self.round_trip(model)
+
+        model = MEMM(3, self.tagged_sents, tag_dict=False, beam=1)
+        loaded = self.round_trip(model)
+        self.assertEqual(loaded.beam, 1)
+        self.assertIsNone(loaded.tag_dict)
+
+    def test_pickle(self):
+        # older models were pickled.
+        model = BaselineTagger(self.tagged_sents)
+        with open(self.filename, 'wb') as f:
+            pickle.dump(model, f)
+
+        self.assertFalse(model_file.is_model_file(self.filename))
+        loaded = load_model(self.filename)
+        self.assertEqual(loaded.tag_sents(self.sents),
+                         model.tag_sents(self.sents))
+
+        # loaded models can be pickled too.
+        save_model(MLHMM(2, self.tagged_sents), self.filename)
+        loaded = pickle.loads(pickle.dumps(load_model(self.filename)))
+        self.assertEqual(loaded.tag_sents(self.sents)[0],
+                         'D N V N P'.split())
@@ -0,0 +1,100 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+
+from tagging.baseline import BaselineTagger
+from tagging.server import ModelWatcher, MicroBatcher, TaggingServer
+
+
+class TestServer(TestCase):
+
+    def setUp(self):
+        self.tagged_sents = [
+            list(zip('el gato come pescado .'.split(),
+                 'D N V N P'.split())),
+            list(zip('la gata come salmón .'.split(),
+                 'D N V N P'.split())),
+        ]
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, 'model.pkl')
+        self.save(BaselineTagger(self.tagged_sents))
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def save(self, model):
+        # write and rename, as the server expects.
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            pickle.dump(model, f)
+        os.replace(tmp_filename, self.filename)
+
+    def test_model_watcher(self):
+        watcher = ModelWatcher(self.filename, interval=None)
+        self.assertFalse(watcher.check())
+        self.assertEqual(watcher.model.tag_word('gato'), 'N')
+
+        tagged_sents = [[('gato', 'X')]]
+        self.save(BaselineTagger(tagged_sents))
+        self.assertTrue(watcher.check())
+        self.assertEqual(watcher.model.tag_word('gato'), 'X')
+        self.assertEqual(watcher.reloads, 1)
+
+        # a broken file keeps the old model.
+        with open(self.filename, 'wb') as f:
+            f.write(b'broken')
+        self.assertFalse(watcher.check())
+        self.assertEqual(watcher.model.tag_word('gato'), 'X')
+
+    def test_micro_batcher(self):
+        calls = []
+
+        def tag_sents(sents):
+            calls.append(len(sents))
+            return [[len(w) for w in sent] for sent in sents]
+
+        # wait long enough to get all the requests in one batch.
+        batcher = MicroBatcher(tag_sents, max_batch=6, max_wait=1.0)
+        futures = [batcher.submit([['a', 'bb']] * 2) for _ in range(3)]
+        results = [future.result() for future in futures]
+        batcher.close()
+
+        self.assertEqual(results, [[[1, 2], [1, 2]]] * 3)
+        self.assertEqual(calls, [6])
+
+    def test_server(self):
+        server = TaggingServer(('127.0.0.1', 0), self.filename,
+                               max_wait=0.001, interval=None)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+        def post(data):
+            req = urllib.request.Request(url + '/tag', json.dumps(data)
+                                         .encode('utf-8'))
+            with urllib.request.urlopen(req) as response:
+                return json.loads(response.read().decode('utf-8'))
+
+        try:
+            result = post({'sents': [['el', 'gato'], 'la gata come']})
+            self.assertEqual(result, {'tags': [['D', 'N'], ['D', 'N', 'V']]})
+
+            with urllib.request.urlopen(url + '/status') as response:
+                status = json.loads(response.read().decode('utf-8'))
+            self.assertEqual(status['requests'], 1)
+            self.assertEqual(status['reloads'], 0)
+
+            with self.assertRaises(urllib.error.HTTPError) as cm:
+                post({'words': []})
+            self.assertEqual(cm.exception.code, 400)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
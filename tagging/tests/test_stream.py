@@ -0,0 +1,77 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase
+from io import StringIO
+import os
+import shutil
+import tempfile
+
+from corpus.twitter_corpus_reader import tweet_tokenizer
+from tagging.baseline import BaselineTagger
+from tagging.model_file import save_model
+from tagging.stream import read_sents, batches, tag_stream, write_conll
+
+
+class TestStream(TestCase):
+
+    def setUp(self):
+        self.tagged_sents = [
+            list(zip('el gato come pescado .'.split(),
+                 'D N V N P'.split())),
+            list(zip('la gata come salmón .'.split(),
+                 'D N V N P'.split())),
+        ]
+        self.model = BaselineTagger(self.tagged_sents)
+        self.sents = ['el gato come pescado .'.split(),
+                      'la gata come salmón .'.split()] * 10
+
+    def test_read_sents(self):
+        lines = StringIO('el gato  come\n\n  \nla gata .\n')
+
+        sents = list(read_sents(lines))
+
+        self.assertEqual(sents, [['el', 'gato', 'come'], ['la', 'gata', '.']])
+
+    def test_read_tweets(self):
+        lines = StringIO('Hola @juan, mirá #esto...\n\nhttp://t.co/x1 !!\n')
+
+        sents = list(read_sents(lines, tweet_tokenizer().tokenize))
+
+        self.assertEqual(sents, [
+            ['Hola', '@juan', ',', 'mirá', '#esto', '...'],
+            ['http://t.co/x1'],
+        ])
+
+    def test_batches(self):
+        result = list(batches(iter(range(7)), 3))
+
+        self.assertEqual(result, [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(list(batches([], 3)), [])
+
+    def test_tag_stream(self):
+        tagged_sents = list(tag_stream(iter(self.sents), self.model,
+                                       batch_size=3))
+
+        self.assertEqual(tagged_sents, self.tagged_sents * 10)
+
+    def test_tag_stream_processes(self):
+        dirname = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(dirname, 'model')
+            save_model(self.model, filename)
+
+            tagged_sents = list(tag_stream(iter(self.sents),
+                                           filename=filename, batch_size=3,
+                                           processes=2, max_pending=2))
+        finally:
+            shutil.rmtree(dirname)
+
+        # in input order.
+        self.assertEqual(tagged_sents, self.tagged_sents * 10)
+
+    def test_write_conll(self):
+        f = StringIO()
+
+        write_conll(f, [('el', 'D'), ('gato', 'N')])
+        write_conll(f, [('.', 'P')])
+
+        self.assertEqual(f.getvalue(), '1\tel\tD\n2\tgato\tN\n\n1\t.\tP\n\n')
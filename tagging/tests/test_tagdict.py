@@ -0,0 +1,49 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase
+
+from tagging.tagdict import TagDictionary
+from tagging.unknown import UnknownWordModel
+
+
+class TestTagDictionary(TestCase):
+
+    def setUp(self):
+        self.tagged_sents = [
+            list(zip('el gato come pescado .'.split(),
+                 'D N V N P'.split())),
+            list(zip('la gata come salmón .'.split(),
+                 'D N V N P'.split())),
+            list(zip('Juan come 3 pescados .'.split(),
+                 'NP V Z N P'.split())),
+            list(zip('el salmón , come .'.split(),
+                 'D N P N P'.split())),
+        ]
+
+    def test_known(self):
+        tag_dict = TagDictionary(self.tagged_sents)
+
+        self.assertEqual(tag_dict.tags('el'), ('D',))
+        self.assertEqual(tag_dict.tags('come'), ('N', 'V'))
+        self.assertEqual(tag_dict.tags('.'), ('P',))
+        self.assertFalse(tag_dict.unknown('come'))
+
+    def test_unknown(self):
+        tag_dict = TagDictionary(self.tagged_sents)
+
+        self.assertTrue(tag_dict.unknown('perro'))
+        # like the rare words gato, pescado.
+        self.assertEqual(tag_dict.tags('perro'), ('N',))
+        # like the rare word Juan.
+        self.assertEqual(tag_dict.tags('Pedro'), ('NP',))
+        # like the rare number 3.
+        self.assertEqual(tag_dict.tags('42'), ('Z',))
+        # no rare word has this shape.
+        self.assertEqual(tag_dict.tags('ONU'), ('D', 'N', 'NP', 'P', 'V', 'Z'))
+
+    def test_unknown_nodes(self):
+        # the same shapes and suffixes as the unknown word model.
+        tag_dict = TagDictionary(self.tagged_sents)
+        model = UnknownWordModel(self.tagged_sents)
+
+        for w in ['perro', 'Pedro', '42', 'ONU', 'pescados', 'x']:
+            self.assertEqual(tag_dict.trie.node(w), model.node(w), w)
@@ -0,0 +1,90 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase
+from math import log2
+
+from tagging.unknown import SuffixTrie, UnknownWordModel, word_shape
+from tagging.hmm import MLHMM
+
+
+class TestSuffixTrie(TestCase):
+
+    def test_word_shape(self):
+        shapes = {
+            'gato': 'lower',
+            'Juan': 'title',
+            'ONU': 'upper',
+            '1984': 'digit',
+            '3er': 'hasdigit',
+            '.': 'other',
+        }
+        for w, s in shapes.items():
+            self.assertEqual(word_shape(w), s, w)
+
+    def test_insert(self):
+        trie = SuffixTrie(max_suffix=2)
+
+        path = trie.insert('gato')
+
+        # root, shape, 'o', 'to'.
+        self.assertEqual(path, [0, 1, 2, 3])
+        self.assertEqual(trie.insert('pato'), path)
+        self.assertEqual(trie.insert('gata'), [0, 1, 4, 5])
+        self.assertEqual(trie.parents, [None, 0, 1, 2, 1, 4])
+
+    def test_node(self):
+        trie = SuffixTrie(max_suffix=2)
+        trie.insert('gato')
+        trie.insert('Gata')
+
+        self.assertEqual(trie.node('pato'), 3)  # 'to'
+        self.assertEqual(trie.node('perro'), 2)  # 'o'
+        self.assertEqual(trie.node('perra'), 1)  # lowercase
+        self.assertEqual(trie.node('Perra'), trie.insert('Gata')[2])
+        self.assertEqual(trie.node('1990'), 0)  # unseen shape
+
+
+class TestUnknownWordModel(TestCase):
+
+    def setUp(self):
+        self.tagged_sents = [
+            list(zip('el gato come pescado .'.split(),
+                 'D N V N P'.split())),
+            list(zip('la gata come salmón .'.split(),
+                 'D N V N P'.split())),
+            list(zip('el perro ladra .'.split(),
+                 'D N V P'.split())),
+        ]
+
+    def test_log_prob(self):
+        model = UnknownWordModel(self.tagged_sents)
+
+        self.assertEqual(model.tags, ['D', 'N', 'P', 'V'])
+        # ending like gato, pescado and perro.
+        lps = {t: model.log_prob('lobo', t) for t in model.tags}
+        self.assertEqual(max(lps, key=lps.get), 'N')
+        # ending like ladra (but not like la).
+        lps = {t: model.log_prob('cuadra', t) for t in model.tags}
+        self.assertEqual(max(lps, key=lps.get), 'V')
+        # never seen in a rare word.
+        self.assertEqual(model.prob('lobo', 'P'), 0.0)
+        self.assertEqual(model.log_prob('lobo', 'X'), float('-inf'))
+
+    def test_tag_order(self):
+        tags = ['<s>', 'V', 'N', 'D', 'P']
+        model = UnknownWordModel(self.tagged_sents, tags)
+
+        self.assertEqual(model.log_probs.shape, (len(model.trie), 5))
+        self.assertEqual(model.log_prob('lobo', '<s>'), float('-inf'))
+        self.assertAlmostEqual(log2(model.prob('lobo', 'N')),
+                               model.log_probs[model.node('lobo'), 2])
+
+    def test_mlhmm(self):
+        hmm = MLHMM(2, self.tagged_sents, unknown_model=True)
+
+        self.assertEqual(hmm.tag('el lobo cuadra .'.split()),
+                         'D N V P'.split())
+        tables = hmm.tables()
+        row = tables.word_rows(['lobo'])[0]
+        for t in hmm.tagset():
+            self.assertAlmostEqual(2 ** tables.out[row, tables.tag_ids[t]],
+                                   hmm.out_prob('lobo', t))
@@ -1,8 +1,11 @@
 # https://docs.python.org/3/library/unittest.html
 from unittest import TestCase
 from math import log2
+from itertools import product
+import random
 
 from tagging.hmm import HMM, ViterbiTagger
+from tagging.tagdict import TagDictionary
 
 
 class TestViterbiTagger(TestCase):
@@ -94,3 +97,186 @@ class TestViterbiTagger(TestCase):
                 prob2, tags2 = d2[k2]
                 self.assertAlmostEqual(prob1, prob2)
                 self.assertEqual(tags1, tags2)
+
+    def test_tag_is_most_probable(self):
+        # compare against brute force for random models of several orders.
+        tagset = ['D', 'N', 'V']
+        words = 'the dog barks'.split()
+        rng = random.Random(0)
+        for n in [1, 2, 3, 4]:
+            contexts = product(['<s>'] + tagset, repeat=n - 1)
+            trans = {c: random_dist(rng, tagset + ['</s>'])
+                     for c in contexts}
+            out = {t: random_dist(rng, words) for t in tagset}
+            hmm = HMM(n, set(tagset), trans, out)
+            tagger = ViterbiTagger(hmm)
+
+            for m in range(4):
+                x = [rng.choice(words) for _ in range(m)]
+                y = max(product(tagset, repeat=m),
+                        key=lambda y: hmm.log_prob(x, y))
+                self.assertEqual(tagger.tag(x), list(y), (n, x))
+
+    def test_tag_sents(self):
+        tagset = ['D', 'N', 'V']
+        words = 'the dog barks'.split()
+        rng = random.Random(0)
+        for n in [1, 2, 3]:
+            contexts = product(['<s>'] + tagset, repeat=n - 1)
+            trans = {c: random_dist(rng, tagset + ['</s>'])
+                     for c in contexts}
+            out = {t: random_dist(rng, words) for t in tagset}
+            hmm = HMM(n, set(tagset), trans, out)
+            tagger = ViterbiTagger(hmm)
+
+            sents = [[rng.choice(words) for _ in range(rng.randrange(5))]
+                     for _ in range(20)]
+            result = tagger.tag_sents(sents, log_probs=True)
+
+            self.assertEqual(len(result), len(sents))
+            for x, (y, lp) in zip(sents, result):
+                self.assertEqual(y, tagger.tag(x))
+                self.assertAlmostEqual(lp, hmm.log_prob(x, y))
+
+            tagger.batch_cells = 1  # one sentence per batch
+            self.assertEqual(tagger.tag_sents(sents), [y for y, _ in result])
+
+    def test_beam(self):
+        tagset = ['D', 'N', 'V']
+        words = 'the dog barks'.split()
+        rng = random.Random(0)
+        for n in [2, 3, 4]:
+            contexts = product(['<s>'] + tagset, repeat=n - 1)
+            trans = {c: random_dist(rng, tagset + ['</s>'])
+                     for c in contexts}
+            out = {t: random_dist(rng, words) for t in tagset}
+            hmm = HMM(n, set(tagset), trans, out)
+            exact = ViterbiTagger(hmm)
+            # these beams keep every context, so they are exact too.
+            wide = ViterbiTagger(hmm, beam=len(tagset) ** (n - 1))
+            loose = ViterbiTagger(hmm, threshold=1000.0)
+            narrow = ViterbiTagger(hmm, beam=1)
+
+            sents = [[rng.choice(words) for _ in range(rng.randrange(6))]
+                     for _ in range(20)]
+            result = exact.tag_sents(sents, log_probs=True)
+            self.assertEqual(wide.tag_sents(sents, log_probs=True), result)
+            self.assertEqual(loose.tag_sents(sents, log_probs=True), result)
+            for x, (y, lp) in zip(sents, result):
+                y2, lp2 = narrow.tag_sents([x], log_probs=True)[0]
+                self.assertAlmostEqual(lp2, hmm.log_prob(x, y2))
+                self.assertLessEqual(lp2, lp + 1e-9)
+
+    def test_beam_pi(self):
+        tagset = {'D', 'N', 'V'}
+        trans = {
+            ('<s>', '<s>'): {'D': 1.0},
+            ('<s>', 'D'): {'N': 1.0},
+            ('D', 'N'): {'V': 0.8, 'N': 0.2},
+            ('N', 'N'): {'V': 1.0},
+            ('N', 'V'): {'</s>': 1.0},
+        }
+        out = {
+            'D': {'the': 1.0},
+            'N': {'dog': 0.4, 'barks': 0.6},
+            'V': {'dog': 0.1, 'barks': 0.9},
+        }
+        hmm = HMM(3, tagset, trans, out)
+        x = 'the dog barks'.split()
+
+        tagger = ViterbiTagger(hmm)
+        tagger.tag(x)
+        pi = tagger._pi
+
+        tagger = ViterbiTagger(hmm, beam=10)
+        self.assertEqual(tagger.tag(x), 'D N V'.split())
+        self.assertEqualPi(tagger._pi, pi)
+
+        tagger = ViterbiTagger(hmm, beam=1)
+        self.assertEqual(tagger.tag(x), 'D N V'.split())
+        self.assertEqual(set(tagger._pi[3].keys()), {('N', 'V')})
+
+    def test_tag_dict(self):
+        tagset = ['D', 'N', 'V']
+        words = 'the dog barks'.split()
+        rng = random.Random(0)
+        for n in [2, 3, 4]:
+            contexts = product(['<s>'] + tagset, repeat=n - 1)
+            trans = {c: random_dist(rng, tagset + ['</s>'])
+                     for c in contexts}
+            # 'the' can only be D, 'dog' can't be V.
+            out = {t: random_dist(rng, words) for t in tagset}
+            out['N']['the'] = out['V']['the'] = out['V']['dog'] = 0.0
+            hmm = HMM(n, set(tagset), trans, out)
+            tag_dict = TagDictionary([
+                [('the', 'D'), ('dog', 'D'), ('dog', 'N')],
+                [('barks', 'D'), ('barks', 'N'), ('barks', 'V')],
+            ])
+            exact = ViterbiTagger(hmm)
+            tagger = ViterbiTagger(hmm, tag_dict=tag_dict)
+            self.assertTrue(tagger.sparse())
+
+            sents = [[rng.choice(words) for _ in range(rng.randrange(6))]
+                     for _ in range(20)]
+            result = exact.tag_sents(sents, log_probs=True)
+            for x, (y, lp) in zip(sents, tagger.tag_sents(sents, True)):
+                self.assertTrue(all(t in tag_dict.tags(w)
+                                    for w, t in zip(x, y)))
+                self.assertAlmostEqual(lp, hmm.log_prob(x, y))
+            self.assertEqual([y for y, _ in result], tagger.tag_sents(sents))
+
+            # the HMM tag dictionary is used by default, unless disabled.
+            hmm.tag_dict = tag_dict
+            self.assertIs(ViterbiTagger(hmm).tag_dict, tag_dict)
+            self.assertIsNone(ViterbiTagger(hmm, tag_dict=False).tag_dict)
+
+    def test_tag_dict_unigram(self):
+        tagset = {'D', 'N', 'V'}
+        trans = {(): {'D': 0.2, 'N': 0.5, 'V': 0.2, '</s>': 0.1}}
+        out = {
+            'D': {'the': 0.5, 'dog': 0.5},
+            'N': {'the': 0.5, 'dog': 0.5},
+            'V': {'the': 0.5, 'dog': 0.5},
+        }
+        hmm = HMM(1, tagset, trans, out)
+        tag_dict = TagDictionary([[('the', 'D'), ('dog', 'V')]])
+        tagger = ViterbiTagger(hmm, tag_dict=tag_dict)
+
+        x = 'the dog'.split()
+        self.assertEqual(ViterbiTagger(hmm).tag(x), ['N', 'N'])
+        self.assertEqual(tagger.tag(x), ['D', 'V'])
+        [(y, lp)] = tagger.tag_sents([x], log_probs=True)
+        self.assertEqual(y, ['D', 'V'])
+        self.assertAlmostEqual(lp, hmm.log_prob(x, y))
+
+    def test_no_tagging(self):
+        # 'cat' is not emitted by any tag.
+        tagset = {'D', 'N', 'V'}
+        out = {
+            'D': {'the': 1.0},
+            'N': {'dog': 0.4, 'barks': 0.6},
+            'V': {'dog': 0.1, 'barks': 0.9},
+        }
+        hmms = [
+            HMM(3, tagset, {
+                ('<s>', '<s>'): {'D': 1.0},
+                ('<s>', 'D'): {'N': 1.0},
+                ('D', 'N'): {'V': 1.0},
+                ('N', 'V'): {'</s>': 1.0},
+            }, out),
+            HMM(1, tagset, {(): {'D': 0.3, 'N': 0.3, 'V': 0.3, '</s>': 0.1}},
+                out),
+        ]
+        x = 'the cat barks'.split()
+        for hmm in hmms:
+            taggers = [ViterbiTagger(hmm), ViterbiTagger(hmm, beam=2)]
+            ys = [tagger.tag(x) for tagger in taggers]
+            ys += [tagger.tag_sents([x])[0] for tagger in taggers]
+            for y in ys:
+                self.assertNotIn('<s>', y)
+                self.assertEqual(y, ys[0])
+
+
+def random_dist(rng, values):
+    ps = [rng.random() for _ in values]
+    return {v: p / sum(ps) for v, p in zip(values, ps)}
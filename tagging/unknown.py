@@ -0,0 +1,255 @@
+from collections import Counter
+
+import numpy as np
+
+from tagging.model_file import (encode_strings, decode_strings, SortedMap,
+                                sorted_strings)
+
+
+# longest suffix used for unknown words, by default.
+MAX_SUFFIX = 4
+
+
+def word_shape(w):
+    """Coarse shape of a word, used to guess the tags of unknown words.
+
+    w -- the word.
+    """
+    if w.isdigit():
+        return 'digit'
+    elif any(c.isdigit() for c in w):
+        return 'hasdigit'
+    elif w.isupper():
+        return 'upper'
+    elif w.istitle():
+        return 'title'
+    elif w.islower():
+        return 'lower'
+    else:
+        return 'other'
+
+
+def _child_key(key):
+    # string of a (node, key) pair of the trie, for SortedMap.
+    node, key = key
+    return '{}\x01{}'.format(node, key)
+
+
+class SuffixTrie:
+    """Trie over the suffixes of words, read from the last character, below
+    one branch for each word shape.
+
+    Node 0 is the root, its children are the shapes, and the descendants of
+    a shape are its suffixes of increasing length. Nodes are numbered in
+    creation order, so parents come before their children.
+    """
+
+    def __init__(self, max_suffix=MAX_SUFFIX):
+        """
+        max_suffix -- longest suffix to store.
+        """
+        self.max_suffix = max_suffix
+        self.parents = [None]
+        self._children = {}
+
+    def __len__(self):
+        return len(self.parents)
+
+    def _keys(self, w):
+        lower = w.lower()
+        yield word_shape(w)
+        for c in reversed(lower[max(len(lower) - self.max_suffix, 0):]):
+            yield c
+
+    def insert(self, w):
+        """Add the shape and suffixes of a word. Returns the list of nodes
+        from the root to the longest suffix.
+
+        w -- the word.
+        """
+        node, path = 0, [0]
+        for key in self._keys(w):
+            child = self._children.get((node, key))
+            if child is None:
+                child = len(self.parents)
+                self.parents.append(node)
+                self._children[node, key] = child
+            node = child
+            path.append(node)
+        return path
+
+    def node(self, w):
+        """The node of the longest stored suffix of a word with its shape, or
+        the root if the shape was never seen.
+
+        w -- the word.
+        """
+        node, children = 0, self._children
+        for key in self._keys(w):
+            child = children.get((node, key))
+            if child is None:
+                break
+            node = child
+        return node
+
+    def to_arrays(self):
+        """Parameters and arrays to save the trie (see tagging.model_file).
+        """
+        items = sorted((_child_key(k), v) for k, v in self._children.items())
+        parents = [-1] + list(self.parents[1:])
+        return {'max_suffix': self.max_suffix}, {
+            'parents': np.array(parents, dtype=np.int32),
+            'keys': sorted_strings([k for k, _ in items]),
+            'children': np.array([v for _, v in items], dtype=np.int32),
+        }
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """Trie from saved parameters and arrays, looked up in the arrays.
+
+        meta -- the parameters.
+        arrays -- the arrays.
+        """
+        trie = cls.__new__(cls)
+        trie.max_suffix = meta['max_suffix']
+        trie.parents = arrays['parents']
+        trie._children = SortedMap(arrays['keys'], arrays['children'],
+                                   _child_key)
+        return trie
+
+
+class UnknownWordModel:
+    """Emission model of unknown words, learned from the rare words of the
+    training data, grouped by word shape and suffix.
+
+    The tag distribution of each trie node is estimated once with the
+    successive abstraction of TnT (Brants, 2000): a node backs off to the
+    node of the next shorter suffix. The distributions are turned into a
+    table of log2 emission probabilities by Bayes' rule, so that tagging an
+    unknown word is a trie lookup and a table row.
+    """
+
+    def __init__(self, tagged_sents, tags=None, max_suffix=MAX_SUFFIX,
+                 rare=1):
+        """
+        tagged_sents -- training sentences, each one being a list of pairs.
+        tags -- list of tags giving the order of the columns of the table
+            (default: the sorted training tags). Tags not in training get
+            probability 0.
+        max_suffix -- longest suffix used.
+        rare -- words seen at most this many times are used to learn the
+            model.
+        """
+        word_tags = Counter()
+        for sent in tagged_sents:
+            word_tags.update(sent)
+        word_counts = Counter()
+        tag_counts = Counter()
+        for (w, t), c in word_tags.items():
+            word_counts[w] += c
+            tag_counts[t] += c
+
+        if tags is None:
+            tags = sorted(tag_counts)
+        self.tags = tags
+        self.tag_ids = tag_ids = {t: i for i, t in enumerate(tags)}
+        self.trie = trie = SuffixTrie(max_suffix)
+
+        node_tags = []
+        for (w, t), c in word_tags.items():
+            if word_counts[w] <= rare and t in tag_ids:
+                for node in trie.insert(w):
+                    if node == len(node_tags):
+                        node_tags.append(Counter())
+                    node_tags[node][tag_ids[t]] += c
+
+        K = len(tags)
+        counts = np.zeros((len(trie), K))
+        for node, c in enumerate(node_tags):
+            counts[node, list(c)] = list(c.values())
+
+        tag_probs = np.zeros(K)
+        for t, c in tag_counts.items():
+            if t in tag_ids:
+                tag_probs[tag_ids[t]] = c
+        tag_probs /= max(tag_probs.sum(), 1)
+        # TnT's weight of the shorter suffixes.
+        known = tag_probs[tag_probs > 0]
+        theta = known.std() if len(known) else 0.0
+
+        probs = np.empty_like(counts)
+        root = counts[0].sum()
+        probs[0] = counts[0] / root if root else tag_probs
+        for node in range(1, len(trie)):
+            parent = probs[trie.parents[node]]
+            total = counts[node].sum()
+            probs[node] = (counts[node] / total + theta * parent) / (1 + theta)
+        # most probable tag of each node.
+        self._best = probs.argmax(axis=1)
+
+        # P(w | t) = P(t | suffix) P(w) / P(t), with P(w) = 1 / |V|, so
+        # that a suffix that says nothing gives the uniform 1 / |V|.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_probs = (np.log2(probs) - np.log2(tag_probs) -
+                         np.log2(max(len(word_counts), 1)))
+        log_probs[np.isnan(log_probs)] = -np.inf
+        self.log_probs = log_probs
+
+    def node(self, w):
+        """Row of the table of a word (see SuffixTrie.node()).
+
+        w -- the word.
+        """
+        return self.trie.node(w)
+
+    def best_tag_id(self, w):
+        """Index in self.tags of the most probable tag of an unknown word.
+
+        w -- the word.
+        """
+        return int(self._best[self.node(w)])
+
+    def log_prob(self, w, tag):
+        """Log2 emission probability of an unknown word.
+
+        w -- the word.
+        tag -- the tag.
+        """
+        t = self.tag_ids.get(tag)
+        if t is None:
+            return float('-inf')
+        return float(self.log_probs[self.node(w), t])
+
+    def prob(self, w, tag):
+        """Emission probability of an unknown word.
+
+        w -- the word.
+        tag -- the tag.
+        """
+        return 2.0 ** self.log_prob(w, tag)
+
+    def to_arrays(self):
+        """Parameters and arrays to save the model (see tagging.model_file).
+        """
+        meta, arrays = self.trie.to_arrays()
+        arrays.update({
+            'tags': encode_strings(self.tags),
+            'log_probs': self.log_probs,
+            'best': self._best,
+        })
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """Model from saved parameters and arrays.
+
+        meta -- the parameters.
+        arrays -- the arrays.
+        """
+        model = cls.__new__(cls)
+        model.tags = decode_strings(arrays['tags'])
+        model.tag_ids = {t: i for i, t in enumerate(model.tags)}
+        model.trie = SuffixTrie.from_arrays(meta, arrays)
+        model.log_probs = arrays['log_probs']
+        model._best = arrays['best']
+        return model
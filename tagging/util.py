@@ -0,0 +1,9 @@
+def tag_sents(model, sents):
+    """Tag a list of sentences, all at once if the model supports it.
+
+    model -- the tagger.
+    sents -- the sentences.
+    """
+    if hasattr(model, 'tag_sents'):
+        return model.tag_sents(sents)
+    return [model.tag(sent) for sent in sents]